@@ -0,0 +1,120 @@
+import asyncio
+import base64
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from omuserver.codec import json
+from omuserver.extension.asset.asset_extension import AssetExtension
+
+SIZES = [1024 * 1024, 16 * 1024 * 1024, 64 * 1024 * 1024]
+UPLOAD_CHUNK = 256 * 1024
+
+
+class BenchSecurity:
+    async def get_permissions(self, token):
+        return object()
+
+
+class BenchEndpoints:
+    def bind_endpoint(self, type, callback) -> None:
+        pass
+
+
+class BenchNetwork:
+    def __init__(self) -> None:
+        self.app = web.Application()
+
+    def add_http_route(self, path, handle, methods=("GET",)) -> None:
+        for method in methods:
+            self.app.router.add_route(method, path, handle)
+
+
+class BenchDirectories:
+    def __init__(self, assets: Path) -> None:
+        self.assets = assets
+
+    def get(self, name: str) -> Path:
+        path = self.assets.parent / name
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+
+class BenchServer:
+    def __init__(self, assets: Path) -> None:
+        self.security = BenchSecurity()
+        self.endpoints = BenchEndpoints()
+        self.network = BenchNetwork()
+        self.directories = BenchDirectories(assets)
+
+    def add_listener(self, listener) -> None:
+        pass
+
+
+async def upload_endpoint(root: Path, data: bytes) -> None:
+    """The previous path: base64 inside a JSON endpoint frame, decoded and
+    written in one blocking call."""
+    frame = json.dumps(
+        {"type": "asset:upload", "data": {"file.bin": base64.b64encode(data).decode()}}
+    )
+    files = json.loads(frame)["data"]
+    for key, value in files.items():
+        path = root / key
+        path.write_bytes(base64.b64decode(value.encode("utf-8")))
+
+
+async def upload_http(client: TestClient, path: Path) -> None:
+    async def body():
+        with path.open("rb") as file:
+            while chunk := file.read(UPLOAD_CHUNK):
+                yield chunk
+
+    resp = await client.put(
+        "/assets", params={"path": "file.bin", "token": "bench"}, data=body()
+    )
+    assert resp.status == 200, resp.status
+
+
+async def main() -> None:
+    root = Path(tempfile.mkdtemp())
+    source = root / "source.bin"
+    server = BenchServer(root / "assets")
+    (root / "assets").mkdir()
+    AssetExtension(server)  # type: ignore
+
+    async with TestClient(TestServer(server.network.app)) as client:
+        for size in SIZES:
+            data = os.urandom(size)
+            source.write_bytes(data)
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            await upload_endpoint(root / "assets", data)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{size // 1024 // 1024:>3}MiB endpoint: "
+                f"{size / elapsed / 1e6:8.1f}MB/s peak {peak / 1e6:8.1f}MB"
+            )
+            del data
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            await upload_http(client, source)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{size // 1024 // 1024:>3}MiB http:     "
+                f"{size / elapsed / 1e6:8.1f}MB/s peak {peak / 1e6:8.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from omu.extension.table.model import TableInfo
+from omu.extension.table.table_extension import TableItemAddEvent, TableItemsEventData
+from omu.interface import Serializer
+
+from omuserver.extension.table.session_table_handler import SessionTableListener
+from omuserver.session import EventFrame, Session
+
+INFO = TableInfo(owner="bench", name="chat")
+ITEMS: Dict[str, Any] = {
+    f"message-{i}": {
+        "id": f"message-{i}",
+        "room_id": "youtube:UC000000000000000000",
+        "author_id": f"author-{i % 17}",
+        "content": {"type": "text", "text": "こんにちは! nice stream " * 3},
+        "created_at": "2024-01-01T00:00:00.000Z",
+        "paid": None,
+    }
+    for i in range(8)
+}
+
+
+class BenchSession(Session):
+    def __init__(self) -> None:
+        self.written: List[str] = []
+
+    @property
+    def app(self):
+        raise NotImplementedError
+
+    @property
+    def closed(self) -> bool:
+        return False
+
+    @property
+    def permissions(self):
+        raise NotImplementedError
+
+    async def disconnect(self) -> None:
+        pass
+
+    async def listen(self) -> None:
+        pass
+
+    async def send(self, type, data) -> None:
+        await self.send_frame(EventFrame(type, data))
+
+    async def send_frame(self, frame: EventFrame) -> None:
+        self.written.append(frame.text)
+        self.written.clear()
+
+    def add_listener(self, listener) -> None:
+        pass
+
+    def remove_listener(self, listener) -> None:
+        pass
+
+
+async def per_session(sessions: List[BenchSession], serializer) -> None:
+    for session in sessions:
+        await session.send(
+            TableItemAddEvent,
+            TableItemsEventData(
+                items={key: serializer.serialize(v) for key, v in ITEMS.items()},
+                type=INFO.key(),
+            ),
+        )
+
+
+async def bench(listeners: int, rounds: int) -> None:
+    serializer = Serializer.noop()
+    sessions = [BenchSession() for _ in range(listeners)]
+    listener = SessionTableListener(INFO, serializer)
+    for session in sessions:
+        listener.add_session(session)
+
+    start = time.process_time()
+    for _ in range(rounds):
+        await per_session(sessions, serializer)
+    before = (time.process_time() - start) / rounds
+
+    start = time.process_time()
+    for _ in range(rounds):
+        await listener.on_add(ITEMS)
+    after = (time.process_time() - start) / rounds
+
+    print(
+        f"{listeners:>5} listeners "
+        f"per-session {before * 1e6:9.1f}us "
+        f"serialize-once {after * 1e6:9.1f}us "
+        f"({before / after:5.1f}x)"
+    )
+
+
+async def main() -> None:
+    print(f"payload {len(json.dumps(ITEMS))} bytes")
+    for listeners in (1, 10, 50, 200, 1000):
+        await bench(listeners, max(20, 20000 // listeners))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
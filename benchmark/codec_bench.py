@@ -0,0 +1,76 @@
+import time
+from typing import Any, Callable, Dict, List
+
+from omuserver.codec.json_codec import CODECS, JsonCodec
+
+
+def chat_message(index: int) -> Dict[str, Any]:
+    return {
+        "id": f"youtube:UC000000000000000000:message-{index}",
+        "room_id": "youtube:UC000000000000000000",
+        "author_id": f"youtube:author-{index % 97}",
+        "content": {
+            "type": "root",
+            "siblings": [
+                {"type": "text", "text": "こんにちは！ 今日も配信ありがとう "},
+                {
+                    "type": "image",
+                    "url": "https://yt3.ggpht.com/emoji/abcdefghijklmnop=w48-h48-c-k-nd",
+                    "id": "UCkszU2WH9gy1mb0dV-11UJg/xyz",
+                    "name": ":_heart:",
+                },
+                {"type": "text", "text": " lol www"},
+            ],
+        },
+        "paid": {"amount": 500, "currency": "¥"} if index % 50 == 0 else None,
+        "gift": None,
+        "created_at": "2024-01-01T12:34:56.789000+00:00",
+    }
+
+
+PAYLOADS: Dict[str, Any] = {
+    "single message": {
+        "type": "table:item_add",
+        "data": {"type": "chat:messages", "items": {"m": chat_message(0)}},
+    },
+    "100 message batch": {
+        "type": "table:item_add",
+        "data": {
+            "type": "chat:messages",
+            "items": {f"m{i}": chat_message(i) for i in range(100)},
+        },
+    },
+    "10k row table": {f"m{i}": chat_message(i) for i in range(10_000)},
+}
+
+
+def measure(fn: Callable[[], Any], budget: float = 0.5) -> float:
+    runs = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < budget:
+        fn()
+        runs += 1
+    return (time.perf_counter() - start) / runs
+
+
+def main() -> None:
+    codecs: List[JsonCodec] = []
+    for codec_type in CODECS.values():
+        try:
+            codecs.append(codec_type())
+        except ImportError as e:
+            print(f"skipping {codec_type.__name__}: {e}")
+    for name, payload in PAYLOADS.items():
+        encoded = codecs[-1].dumps_bytes(payload)
+        print(f"{name} ({len(encoded)} bytes)")
+        for codec in codecs:
+            dumps = measure(lambda codec=codec, payload=payload: codec.dumps(payload))
+            loads = measure(lambda codec=codec, encoded=encoded: codec.loads(encoded))
+            print(
+                f"  {codec.name:>8} dumps {dumps * 1e6:10.1f}us "
+                f"loads {loads * 1e6:10.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import asyncio
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from omu.extension.table.model import TableInfo
+from omu.interface import Serializer
+
+from omuserver.codec import json
+from omuserver.extension.table.adapters import SqliteTableAdapter
+from omuserver.extension.table.cached_table import CachedTable
+from omuserver.session import EventFrame, Session
+
+SESSIONS = 50
+BATCHES = 200
+BATCH_SIZE = 50
+
+
+class InlineSqliteAdapter(SqliteTableAdapter):
+    """The previous adapter: sqlite calls made directly on the event loop."""
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self._conn = sqlite3.connect(str(path / "data.db"))
+
+    async def set_all(self, items: Dict[str, Any]) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO data (key, value) VALUES (?, ?)",
+            ((key, json.dumps(value)) for key, value in items.items()),
+        )
+
+    async def store(self) -> None:
+        self._conn.commit()
+
+
+class StreamingSession(Session):
+    def __init__(self) -> None:
+        self.received = 0
+        self.received_bytes = 0
+
+    @property
+    def app(self):
+        raise NotImplementedError
+
+    @property
+    def closed(self) -> bool:
+        return False
+
+    @property
+    def permissions(self):
+        raise NotImplementedError
+
+    async def disconnect(self) -> None:
+        pass
+
+    async def listen(self) -> None:
+        pass
+
+    async def send(self, type, data) -> None:
+        await self.send_frame(EventFrame(type, data))
+
+    async def send_frame(self, frame: EventFrame) -> None:
+        # Encoded as a websocket session would before sending it.
+        self.received_bytes += len(frame.text)
+        self.received += 1
+
+    def add_listener(self, listener) -> None:
+        pass
+
+    def remove_listener(self, listener) -> None:
+        pass
+
+
+async def measure_lag(stop: asyncio.Event, lags: List[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def run(adapter_type: type[SqliteTableAdapter]) -> None:
+    path = Path(tempfile.mkdtemp())
+    table = CachedTable(
+        None,  # type: ignore
+        TableInfo(owner="bench", name="chat"),
+        Serializer.noop(),
+        adapter_type(path),
+    )
+    await table.load()
+    for _ in range(SESSIONS):
+        table.attach_session(StreamingSession())
+
+    stop = asyncio.Event()
+    lags: List[float] = []
+    lag_task = asyncio.create_task(measure_lag(stop, lags))
+    writes: List[float] = []
+    for batch in range(BATCHES):
+        items = {
+            f"{batch}-{i}": {"author": f"user{i}", "text": "hello " * 20}
+            for i in range(BATCH_SIZE)
+        }
+        start = time.perf_counter()
+        await table.add(items)
+        writes.append(time.perf_counter() - start)
+        if batch % 50 == 0:
+            await table._table.store()
+        await asyncio.sleep(0)
+    stop.set()
+    await lag_task
+    await table.close()
+
+    lags.sort()
+    print(
+        f"{adapter_type.__name__:>22}: "
+        f"write p50 {statistics.median(writes) * 1e3:6.2f}ms "
+        f"loop lag p50 {statistics.median(lags) * 1e3:6.2f}ms "
+        f"p99 {lags[int(len(lags) * 0.99)] * 1e3:6.2f}ms "
+        f"max {lags[-1] * 1e3:6.2f}ms"
+    )
+
+
+async def main() -> None:
+    print(f"{SESSIONS} sessions, {BATCHES} batches of {BATCH_SIZE} rows")
+    await run(InlineSqliteAdapter)
+    await run(SqliteTableAdapter)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
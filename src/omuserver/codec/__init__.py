@@ -0,0 +1,31 @@
+from .frame_codec import (
+    JSON_FRAME_CODEC,
+    FrameCodec,
+    JsonFrameCodec,
+    MsgpackFrameCodec,
+    get_frame_codec,
+)
+from .json_codec import (
+    Json,
+    JsonCodec,
+    MsgspecCodec,
+    OrjsonCodec,
+    StdJsonCodec,
+    create_json_codec,
+    json,
+)
+
+__all__ = [
+    "JSON_FRAME_CODEC",
+    "FrameCodec",
+    "JsonFrameCodec",
+    "MsgpackFrameCodec",
+    "get_frame_codec",
+    "Json",
+    "JsonCodec",
+    "MsgspecCodec",
+    "OrjsonCodec",
+    "StdJsonCodec",
+    "create_json_codec",
+    "json",
+]
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import abc
+from typing import Dict
+
+from .json_codec import Json, json
+
+
+class FrameCodec(abc.ABC):
+    @property
+    @abc.abstractmethod
+    def name(self) -> str:
+        ...
+
+    @property
+    @abc.abstractmethod
+    def binary(self) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def encode(self, data: Json) -> str | bytes:
+        ...
+
+    @abc.abstractmethod
+    def decode(self, data: str | bytes) -> Json:
+        ...
+
+    def __repr__(self) -> str:
+        return f"FrameCodec({self.name})"
+
+
+class JsonFrameCodec(FrameCodec):
+    @property
+    def name(self) -> str:
+        return "json"
+
+    @property
+    def binary(self) -> bool:
+        return False
+
+    def encode(self, data: Json) -> str:
+        return json.dumps(data)
+
+    def decode(self, data: str | bytes) -> Json:
+        return json.loads(data)
+
+
+class MsgpackFrameCodec(FrameCodec):
+    def __init__(self) -> None:
+        import msgpack
+
+        self._msgpack = msgpack
+
+    @property
+    def name(self) -> str:
+        return "msgpack"
+
+    @property
+    def binary(self) -> bool:
+        return True
+
+    def encode(self, data: Json) -> bytes:
+        return self._msgpack.packb(data, use_bin_type=True)
+
+    def decode(self, data: str | bytes) -> Json:
+        if isinstance(data, str):
+            return json.loads(data)
+        return self._msgpack.unpackb(data, raw=False)
+
+
+FRAME_CODECS: Dict[str, type[FrameCodec]] = {
+    "json": JsonFrameCodec,
+    "msgpack": MsgpackFrameCodec,
+}
+_frame_codecs: Dict[str, FrameCodec] = {}
+
+
+def get_frame_codec(name: str) -> FrameCodec | None:
+    if name in _frame_codecs:
+        return _frame_codecs[name]
+    if name not in FRAME_CODECS:
+        return None
+    try:
+        codec = FRAME_CODECS[name]()
+    except ImportError:
+        return None
+    _frame_codecs[name] = codec
+    return codec
+
+
+JSON_FRAME_CODEC = JsonFrameCodec()
+_frame_codecs[JSON_FRAME_CODEC.name] = JSON_FRAME_CODEC
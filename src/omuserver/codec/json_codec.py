@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import abc
+import json as _json
+import os
+from typing import Dict, List
+
+type Json = str | int | float | bool | None | Dict[str, Json] | List[Json]
+
+
+class JsonCodec(abc.ABC):
+    @property
+    @abc.abstractmethod
+    def name(self) -> str:
+        ...
+
+    @abc.abstractmethod
+    def dumps(self, data: Json) -> str:
+        ...
+
+    @abc.abstractmethod
+    def dumps_bytes(self, data: Json) -> bytes:
+        ...
+
+    @abc.abstractmethod
+    def loads(self, data: str | bytes) -> Json:
+        ...
+
+    def __repr__(self) -> str:
+        return f"JsonCodec({self.name})"
+
+
+class StdJsonCodec(JsonCodec):
+    @property
+    def name(self) -> str:
+        return "json"
+
+    def dumps(self, data: Json) -> str:
+        return _json.dumps(data, ensure_ascii=False)
+
+    def dumps_bytes(self, data: Json) -> bytes:
+        return self.dumps(data).encode("utf-8")
+
+    def loads(self, data: str | bytes) -> Json:
+        return _json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    def __init__(self) -> None:
+        import orjson
+
+        self._orjson = orjson
+        self._option = orjson.OPT_NON_STR_KEYS
+        self._fallback = StdJsonCodec()
+
+    @property
+    def name(self) -> str:
+        return "orjson"
+
+    def dumps(self, data: Json) -> str:
+        return self.dumps_bytes(data).decode("utf-8")
+
+    def dumps_bytes(self, data: Json) -> bytes:
+        try:
+            return self._orjson.dumps(data, option=self._option)
+        except TypeError:
+            # orjson rejects integers wider than 64 bits and a few other
+            # values the standard library accepts.
+            return self._fallback.dumps_bytes(data)
+
+    def loads(self, data: str | bytes) -> Json:
+        return self._orjson.loads(data)
+
+
+class MsgspecCodec(JsonCodec):
+    def __init__(self) -> None:
+        import msgspec
+
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+        self._error = msgspec.EncodeError
+        self._fallback = StdJsonCodec()
+
+    @property
+    def name(self) -> str:
+        return "msgspec"
+
+    def dumps(self, data: Json) -> str:
+        return self.dumps_bytes(data).decode("utf-8")
+
+    def dumps_bytes(self, data: Json) -> bytes:
+        try:
+            return self._encoder.encode(data)
+        except (self._error, TypeError, OverflowError):
+            return self._fallback.dumps_bytes(data)
+
+    def loads(self, data: str | bytes) -> Json:
+        return self._decoder.decode(data)
+
+
+CODECS: Dict[str, type[JsonCodec]] = {
+    "orjson": OrjsonCodec,
+    "msgspec": MsgspecCodec,
+    "json": StdJsonCodec,
+}
+
+
+def create_json_codec(name: str | None = None) -> JsonCodec:
+    if name is not None:
+        if name not in CODECS:
+            raise ValueError(f"Unknown json codec {name}")
+        return CODECS[name]()
+    for codec in CODECS.values():
+        try:
+            return codec()
+        except ImportError:
+            continue
+    return StdJsonCodec()
+
+
+json = create_json_codec(os.environ.get("OMU_JSON_CODEC") or None)
@@ -1,6 +1,7 @@
+from .event_dispatcher import DispatchConfig
 from .event_registry import EventRegistry
 
 __all__ = [
-    "EventRegistry",
+    "DispatchConfig",
     "EventRegistry",
 ]
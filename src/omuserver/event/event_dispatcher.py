@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Literal, Set, Tuple
+
+from loguru import logger
+
+type DispatchMode = Literal["sequential", "concurrent"]
+type EventOrdering = Literal["ordered", "unordered", "causal", "strict"]
+type Handler = Callable[[], Awaitable[None]]
+
+
+@dataclass
+class DispatchConfig:
+    mode: DispatchMode = "concurrent"
+    max_in_flight: int = 32
+
+
+class SessionDispatcher:
+    def __init__(self, config: DispatchConfig) -> None:
+        self._config = config
+        self._slots = asyncio.Semaphore(config.max_in_flight)
+        self._lanes: Dict[str, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        # Ordered handlers may write, so they are finished on close. Reads
+        # that have not started yet are dropped instead.
+        self._writes: Set[asyncio.Task] = set()
+        self._unstarted: Set[asyncio.Task] = set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def dispatch(
+        self, lane: str, ordering: EventOrdering, handler: Handler
+    ) -> None:
+        if self._config.mode == "sequential":
+            await handler()
+            return
+        if ordering == "strict":
+            # Strict events act as a barrier: nothing dispatched before them
+            # is still running, and the reader does not pick up the next
+            # event until they are done.
+            await self.join()
+            await handler()
+            return
+        await self._slots.acquire()
+        previous: Tuple[asyncio.Task, ...] = ()
+        if ordering == "ordered" and lane in self._lanes:
+            previous = (self._lanes[lane],)
+        elif ordering == "causal":
+            # Causal events wait for every ordered event dispatched before
+            # them, so a read sees the writes sent ahead of it, but they do
+            # not hold up the events that follow.
+            previous = tuple(self._lanes.values())
+        task = asyncio.create_task(self._run(previous, handler))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if ordering == "ordered":
+            self._lanes[lane] = task
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+            task.add_done_callback(lambda _: self._release_lane(lane, task))
+        else:
+            self._unstarted.add(task)
+            task.add_done_callback(self._unstarted.discard)
+
+    def _release_lane(self, lane: str, task: asyncio.Task) -> None:
+        if self._lanes.get(lane) is task:
+            del self._lanes[lane]
+
+    async def _run(self, previous: Tuple[asyncio.Task, ...], handler: Handler) -> None:
+        try:
+            if previous:
+                await asyncio.wait(previous)
+            self._unstarted.discard(asyncio.current_task())  # type: ignore
+            await handler()
+        except Exception as e:
+            logger.opt(exception=e).error("Error while handling event")
+        finally:
+            self._slots.release()
+
+    async def close(self) -> None:
+        # Writes the client sent before it went away are still applied, and
+        # a handler is never cancelled halfway through. A handler that
+        # disconnects its own session does not wait for itself.
+        for task in tuple(self._unstarted):
+            task.cancel()
+        current = asyncio.current_task()
+        writes = [task for task in self._writes if task is not current]
+        if writes:
+            await asyncio.wait(writes)
+
+    async def join(self) -> None:
+        while self._tasks:
+            await asyncio.wait(tuple(self._tasks))
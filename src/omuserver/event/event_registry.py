@@ -7,6 +7,8 @@ from loguru import logger
 from omuserver.network.network import NetworkListener
 from omuserver.session.session import Session, SessionListener
 
+from .event_dispatcher import DispatchConfig, EventOrdering, SessionDispatcher
+
 if TYPE_CHECKING:
     from omu.event import EventJson, EventType
 
@@ -21,36 +23,66 @@ class EventEntry[T, D]:
         self,
         event_type: EventType[T, D],
         listeners: List[EventCallback[T]],
+        lane: str,
+        ordering: EventOrdering,
     ):
         self.event_type = event_type
         self.listeners = listeners
+        self.lane = lane
+        self.ordering = ordering
 
 
 class EventRegistry(NetworkListener, SessionListener):
-    def __init__(self, server: Server):
+    def __init__(self, server: Server, config: DispatchConfig | None = None):
         self._server = server
+        self._config = config or DispatchConfig()
         self._events: Dict[str, EventEntry] = {}
+        self._dispatchers: Dict[Session, SessionDispatcher] = {}
         server.network.add_listener(self)
 
     async def on_connected(self, session: Session) -> None:
+        self._dispatchers[session] = SessionDispatcher(self._config)
         session.add_listener(self)
 
+    async def on_disconnected(self, session: Session) -> None:
+        dispatcher = self._dispatchers.pop(session, None)
+        if dispatcher is not None:
+            await dispatcher.close()
+
     async def on_event(self, session: Session, event_json: EventJson) -> None:
         event = self._events.get(event_json.type)
         if not event:
             logger.warning(f"Received unknown event type {event_json.type}")
             return
         data = event.event_type.serializer.deserialize(event_json.data)
+        dispatcher = self._dispatchers.get(session)
+        if dispatcher is None:
+            await self._handle(event, session, data)
+            return
+        await dispatcher.dispatch(
+            event.lane, event.ordering, lambda: self._handle(event, session, data)
+        )
+
+    async def _handle(self, event: EventEntry, session: Session, data: Any) -> None:
         for listener in event.listeners:
             await listener(session, data)
 
-    def register(self, *types: EventType) -> None:
+    def register(
+        self,
+        *types: EventType,
+        lane: str | None = None,
+        ordering: EventOrdering = "ordered",
+    ) -> None:
         for type in types:
             if self._events.get(type.type):
                 raise ValueError(f"Event type {type.type} already registered")
-            self._events[type.type] = EventEntry(type, [])
+            self._events[type.type] = EventEntry(
+                type, [], lane=lane or type.type, ordering=ordering
+            )
 
-    def add_listener[T](
+    def add_listener[
+        T
+    ](
         self,
         event_type: EventType[T, Any],
         listener: EventCallback[T] | None = None,
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TypedDict
+
+from omuserver.extension.table.table_cache import ByteBudgetCache
+
+MAX_CACHED_FILE_SIZE = 256 * 1024
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+MAX_CACHE_FILES = 4096
+# Cached files are re-checked against the disk at most this often, so hot
+# assets are served without a stat on every request.
+REVALIDATE_INTERVAL = 1.0
+
+
+class AssetCacheStatsJson(TypedDict):
+    files: int
+    bytes: int
+    hits: int
+    misses: int
+    hit_rate: float
+    bytes_from_memory: int
+    bytes_from_disk: int
+
+
+@dataclass
+class AssetEntry:
+    path: Path
+    data: bytes
+    etag: str
+    content_type: str
+    mtime: int
+    size: int
+    checked: float
+
+
+class AssetCache:
+    def __init__(
+        self,
+        max_file_size: int = MAX_CACHED_FILE_SIZE,
+        max_bytes: int = MAX_CACHE_BYTES,
+        capacity: int = MAX_CACHE_FILES,
+    ) -> None:
+        self.max_file_size = max_file_size
+        self._entries = ByteBudgetCache[AssetEntry](
+            capacity, max_bytes, lambda entry: len(entry.data)
+        )
+        # Resolving a key walks the filesystem, so the result is kept as well.
+        self._paths: OrderedDict[str, Path] = OrderedDict()
+        self._capacity = capacity
+        self.bytes_from_memory = 0
+        self.bytes_from_disk = 0
+
+    def resolve(self, key: str) -> Path | None:
+        path = self._paths.get(key)
+        if path is not None:
+            self._paths.move_to_end(key)
+        return path
+
+    def remember(self, key: str, path: Path) -> None:
+        self._paths[key] = path
+        self._paths.move_to_end(key)
+        while len(self._paths) > self._capacity:
+            self._paths.popitem(last=False)
+
+    def get(self, path: Path) -> AssetEntry | None:
+        entry = self._entries.get(str(path))
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if now - entry.checked < REVALIDATE_INTERVAL:
+            return entry
+        try:
+            stat = path.stat()
+        except OSError:
+            self.invalidate(path)
+            return None
+        if stat.st_mtime_ns != entry.mtime or stat.st_size != entry.size:
+            self.invalidate(path)
+            return None
+        entry.checked = now
+        return entry
+
+    def put(self, entry: AssetEntry) -> None:
+        if len(entry.data) > self.max_file_size:
+            return
+        self._entries.put(str(entry.path), entry)
+
+    def invalidate(self, path: Path) -> None:
+        self._entries.remove(str(path))
+
+    def to_json(self) -> AssetCacheStatsJson:
+        return AssetCacheStatsJson(
+            files=len(self._entries),
+            bytes=self._entries.bytes,
+            hits=self._entries.stats.hits,
+            misses=self._entries.stats.misses,
+            hit_rate=self._entries.stats.hit_rate,
+            bytes_from_memory=self.bytes_from_memory,
+            bytes_from_disk=self.bytes_from_disk,
+        )
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Tuple
+
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_ETAGS = 4096
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AssetETags:
+    """Content hashes of assets, computed once per (mtime, size) of a file."""
+
+    def __init__(self, capacity: int = MAX_ETAGS) -> None:
+        self._capacity = capacity
+        self._hashes: OrderedDict[Path, Tuple[int, int, str]] = OrderedDict()
+
+    async def get(self, path: Path, stat: os.stat_result) -> str:
+        cached = self._hashes.get(path)
+        if cached is not None:
+            mtime, size, digest = cached
+            if mtime == stat.st_mtime_ns and size == stat.st_size:
+                self._hashes.move_to_end(path)
+                return digest
+        digest = await asyncio.to_thread(hash_file, path)
+        self._hashes[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        self._hashes.move_to_end(path)
+        while len(self._hashes) > self._capacity:
+            self._hashes.popitem(last=False)
+        return digest
+
+    def invalidate(self, path: Path) -> None:
+        self._hashes.pop(path, None)
@@ -1,33 +1,362 @@
 from __future__ import annotations
 
+import asyncio
 import base64
-from typing import TYPE_CHECKING, Dict, List
+import mimetypes
+import os
+import tempfile
+import time
+from pathlib import Path
+from stat import S_ISREG
+from typing import TYPE_CHECKING, AsyncIterator, BinaryIO, Dict, List
 
+from aiohttp import hdrs, web
+from aiohttp.helpers import ETAG_ANY, ETag
+from loguru import logger
 from omu.extension.asset.asset_extension import AssetUploadEndpoint
 
 from omuserver.extension import Extension
+from omuserver.server import ServerListener
 from omuserver.utils.helper import safe_path_join
 
+from .asset_cache import AssetCache, AssetCacheStatsJson, AssetEntry
+from .asset_etag import AssetETags, hash_bytes
+from .asset_types import AssetCacheStatsEndpoint
+from .image_transform import ImageTransform, ImageVariants
+
 if TYPE_CHECKING:
     from omuserver.server import Server
     from omuserver.session import Session
 
+UPLOAD_CHUNK_SIZE = 256 * 1024
+MAX_UPLOAD_SIZE = 1024 * 1024 * 1024
+# Assets without a version are revalidated on every use, which costs a 304.
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# /assets?path=...&v=<etag> never changes, so it can be cached for good.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class AssetFileResponse(web.FileResponse):
+    """FileResponse that keeps the content-hash ETag.
+
+    FileResponse assigns its own mtime-size ETag while preparing, which
+    changes whenever a file is rewritten even if its content does not. It
+    also checks If-Match against that tag and only understands date-form
+    If-Range, so callers check both against the content hash with
+    precondition_failed and range_allowed and the headers are removed
+    before FileResponse sees them.
+    """
+
+    def __init__(self, path: Path, etag: str, ranged: bool = True, **kwargs) -> None:
+        self._content_etag = etag
+        self._ranged = ranged
+        super().__init__(path, **kwargs)
+
+    async def prepare(self, request: web.BaseRequest):
+        headers = request.headers.copy()
+        headers.popall(hdrs.IF_MATCH, None)
+        if not self._ranged:
+            headers.popall(hdrs.RANGE, None)
+            headers.popall(hdrs.IF_RANGE, None)
+        return await super().prepare(request.clone(headers=headers))
+
+    @property
+    def etag(self) -> ETag | None:
+        return super().etag
+
+    @etag.setter
+    def etag(self, value: ETag | str | None) -> None:
+        web.StreamResponse.etag.fset(self, self._content_etag)  # type: ignore
+
+
+def precondition_failed(request: web.BaseRequest, etag: str) -> web.Response | None:
+    if_match = request.if_match
+    if if_match is None or any(
+        tag.value == ETAG_ANY or (tag.value == etag and not tag.is_weak)
+        for tag in if_match
+    ):
+        return None
+    return web.Response(status=412)
+
+
+def range_allowed(request: web.BaseRequest, etag: str) -> bool:
+    # An entity-tag If-Range must match the current content exactly, or the
+    # whole representation is sent. Dates are left to FileResponse, which
+    # compares them with the modification time.
+    if_range = request.headers.get(hdrs.IF_RANGE)
+    if if_range is None or not if_range.startswith(('"', "W/")):
+        return True
+    return if_range == f'"{etag}"'
+
+
+class AssetExtension(Extension, ServerListener):
+    startup_stage = "assets"
 
-class AssetExtension(Extension):
     def __init__(self, server: Server) -> None:
         self._server = server
+        self._etags = AssetETags()
+        self._cache = AssetCache()
+        self.images = ImageVariants(server.directories.get("images"))
+        server.add_listener(self)
         server.endpoints.bind_endpoint(AssetUploadEndpoint, self._on_upload)
+        server.endpoints.bind_endpoint(AssetCacheStatsEndpoint, self._on_cache_stats)
+        server.network.add_http_route("/assets", self._handle_download)
+        server.network.add_http_route(
+            "/assets", self._handle_upload, methods=("PUT", "POST")
+        )
+
+    async def on_shutdown(self) -> None:
+        self.images.close()
+
+    async def _handle_download(self, request: web.Request) -> web.StreamResponse:
+        key = request.query.get("path")
+        if not key:
+            return web.Response(status=400)
+        try:
+            transform = ImageTransform.parse(request.query)
+        except ValueError as e:
+            return web.Response(status=400, text=str(e))
+        path = self._cache.resolve(key)
+        if path is None:
+            try:
+                path = safe_path_join(self._server.directories.assets, key)
+            except ValueError:
+                return web.Response(status=400)
+            self._cache.remember(key, path)
+        entry = self._cache.get(path)
+        if entry is not None:
+            if transform is not None:
+                return await self._respond_image(request, path, entry.etag, transform)
+            return self._respond(request, entry)
+        try:
+            stat = await asyncio.to_thread(path.stat)
+        except (FileNotFoundError, NotADirectoryError):
+            return web.Response(status=404)
+        if not S_ISREG(stat.st_mode):
+            return web.Response(status=404)
+        if stat.st_size <= self._cache.max_file_size and transform is None:
+            try:
+                entry = await asyncio.to_thread(read_entry, path, stat)
+            except FileNotFoundError:
+                return web.Response(status=404)
+            if entry is not None:
+                self._cache.put(entry)
+                return self._respond(request, entry)
+        try:
+            etag = await self._etags.get(path, stat)
+        except Exception as e:
+            logger.opt(exception=e).error(f"Failed to hash asset {key}")
+            return web.Response(status=500)
+        if transform is not None:
+            return await self._respond_image(request, path, etag, transform)
+        failed = precondition_failed(request, etag)
+        if failed is not None:
+            return failed
+        not_modified = self._not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+        self._cache.bytes_from_disk += stat.st_size
+        # Large files go through FileResponse, which serves ranges and uses
+        # sendfile.
+        return AssetFileResponse(
+            path,
+            etag,
+            ranged=range_allowed(request, etag),
+            headers=self._headers(request, etag),
+        )
 
-    async def _on_upload(self, session: Session, files: Dict[str, str]) -> List[str]:
+    def _respond(self, request: web.Request, entry: AssetEntry) -> web.StreamResponse:
+        failed = precondition_failed(request, entry.etag)
+        if failed is not None:
+            return failed
+        not_modified = self._not_modified(request, entry.etag)
+        if not_modified is not None:
+            return not_modified
+        headers = self._headers(request, entry.etag)
+        if hdrs.RANGE in request.headers and range_allowed(request, entry.etag):
+            return AssetFileResponse(entry.path, entry.etag, headers=headers)
+        self._cache.bytes_from_memory += len(entry.data)
+        response = web.Response(
+            body=entry.data, content_type=entry.content_type, headers=headers
+        )
+        response.etag = entry.etag
+        return response
+
+    async def _respond_image(
+        self, request: web.Request, path: Path, etag: str, transform: ImageTransform
+    ) -> web.StreamResponse:
+        variant = await self.images.get(path, etag, transform)
+        if variant is None:
+            # Without Pillow, or for files that are not images, the original
+            # is served as is.
+            failed = precondition_failed(request, etag)
+            if failed is not None:
+                return failed
+            return AssetFileResponse(
+                path,
+                etag,
+                ranged=range_allowed(request, etag),
+                headers=self._headers(request, etag),
+            )
+        variant_path, content_type = variant
+        # The version parameter refers to the source, so it is checked against
+        # the source hash while the variant carries its own ETag.
+        headers = self._headers(request, etag)
+        variant_etag = variant_path.stem
+        failed = precondition_failed(request, variant_etag)
+        if failed is not None:
+            return failed
+        not_modified = self._not_modified(request, variant_etag)
+        if not_modified is not None:
+            not_modified.headers.update(headers)
+            return not_modified
+        headers["Content-Type"] = content_type
+        return AssetFileResponse(
+            variant_path,
+            variant_etag,
+            ranged=range_allowed(request, variant_etag),
+            headers=headers,
+        )
+
+    def _headers(self, request: web.Request, etag: str) -> Dict[str, str]:
+        version = request.query.get("v")
+        cache_control = (
+            IMMUTABLE_CACHE_CONTROL if version == etag else REVALIDATE_CACHE_CONTROL
+        )
+        return {"Cache-Control": cache_control}
+
+    def _not_modified(self, request: web.Request, etag: str) -> web.Response | None:
+        if_none_match = request.if_none_match
+        if not if_none_match or not any(
+            tag.value in (etag, ETAG_ANY) for tag in if_none_match
+        ):
+            return None
+        response = web.Response(status=304, headers=self._headers(request, etag))
+        response.etag = etag
+        return response
+
+    async def _on_cache_stats(self, session: Session, req: None) -> AssetCacheStatsJson:
+        return self._cache.to_json()
+
+    async def _on_upload(
+        self, session: Session, files: Dict[str, str | bytes]
+    ) -> List[str]:
         for key, data in files.items():
             path = safe_path_join(self._server.directories.assets, key)
-            path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_bytes(self._decode(data))
+            # Decoding and writing happen off the loop so large files do not
+            # stall every other session.
+            content = await asyncio.to_thread(self._decode, data)
+            await self.write(path, iterate_bytes(content))
         return list(files.keys())
 
-    def _decode(self, data: str) -> bytes:
+    def _decode(self, data: str | bytes) -> bytes:
+        if isinstance(data, bytes):
+            return data
         return base64.b64decode(data.encode("utf-8"))
 
+    async def _handle_upload(self, request: web.Request) -> web.StreamResponse:
+        if not await self._authorize(request):
+            return web.Response(status=401)
+        key = request.query.get("path")
+        if not key:
+            return web.Response(status=400)
+        try:
+            path = safe_path_join(self._server.directories.assets, key)
+        except ValueError:
+            return web.Response(status=400)
+        if request.content_length and request.content_length > MAX_UPLOAD_SIZE:
+            return web.Response(status=413)
+        try:
+            size = await self.write(
+                path, request.content.iter_chunked(UPLOAD_CHUNK_SIZE)
+            )
+        except UploadTooLarge:
+            return web.Response(status=413)
+        except Exception as e:
+            logger.opt(exception=e).error(f"Failed to upload asset {key}")
+            return web.Response(status=500)
+        return web.json_response({"path": key, "size": size})
+
+    async def _authorize(self, request: web.Request) -> bool:
+        # Only the header is accepted, a token in the URL would end up in
+        # access logs, proxies and browser history.
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        token = token.strip()
+        if scheme != "Bearer" or not token:
+            return False
+        try:
+            await self._server.security.get_permissions(token)
+        except KeyError:
+            return False
+        return True
+
+    async def write(self, path: Path, chunks: AsyncIterator[bytes | memoryview]) -> int:
+        """Write chunks to a temporary file next to path, then rename it into
+        place so readers never see a partially written asset."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file = await asyncio.to_thread(
+            tempfile.NamedTemporaryFile,
+            dir=path.parent,
+            prefix=f".{path.name}.",
+            suffix=".upload",
+            delete=False,
+        )
+        size = 0
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise UploadTooLarge
+                await asyncio.to_thread(file.write, chunk)
+            await asyncio.to_thread(close_file, file)
+            await asyncio.to_thread(os.replace, file.name, path)
+        except BaseException:
+            await asyncio.to_thread(discard_file, file)
+            raise
+        finally:
+            self._etags.invalidate(path)
+            self._cache.invalidate(path)
+        return size
+
     @classmethod
     def create(cls, server: Server) -> AssetExtension:
         return cls(server)
+
+
+def read_entry(path: Path, stat: os.stat_result) -> AssetEntry | None:
+    data = path.read_bytes()
+    # A file rewritten while it was read is served from disk this time.
+    after = path.stat()
+    if after.st_mtime_ns != stat.st_mtime_ns or after.st_size != len(data):
+        return None
+    content_type, _ = mimetypes.guess_type(path.name)
+    return AssetEntry(
+        path=path,
+        data=data,
+        etag=hash_bytes(data),
+        content_type=content_type or "application/octet-stream",
+        mtime=stat.st_mtime_ns,
+        size=len(data),
+        checked=time.monotonic(),
+    )
+
+
+async def iterate_bytes(data: bytes) -> AsyncIterator[memoryview]:
+    view = memoryview(data)
+    for offset in range(0, len(view), UPLOAD_CHUNK_SIZE):
+        yield view[offset : offset + UPLOAD_CHUNK_SIZE]
+
+
+def close_file(file: BinaryIO) -> None:
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+
+
+def discard_file(file: BinaryIO) -> None:
+    file.close()
+    Path(file.name).unlink(missing_ok=True)
@@ -0,0 +1,8 @@
+from omu.extension.asset.asset_extension import AssetExtensionType
+from omu.extension.endpoint.endpoint import JsonEndpointType
+
+from .asset_cache import AssetCacheStatsJson
+
+AssetCacheStatsEndpoint = JsonEndpointType[None, AssetCacheStatsJson].of_extension(
+    AssetExtensionType, "cache_stats"
+)
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Literal, Mapping, Tuple
+
+from loguru import logger
+
+type ImageFormat = Literal["png", "jpeg", "webp", "gif"]
+
+IMAGE_FORMATS: Dict[ImageFormat, str] = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "gif": "image/gif",
+}
+MAX_DIMENSION = 4096
+# Limits checked from the header before anything is decoded, animated
+# frames are all held in memory while they are resized.
+MAX_SOURCE_PIXELS = 4096 * 4096
+MAX_FRAMES = 500
+MAX_VARIANT_BYTES = 256 * 1024 * 1024
+TRANSFORM_TIMEOUT = 30
+MAX_FAILED_VARIANTS = 1024
+
+
+@dataclass(frozen=True)
+class ImageTransform:
+    width: int | None = None
+    height: int | None = None
+    format: ImageFormat | None = None
+
+    @classmethod
+    def parse(cls, query: Mapping[str, str]) -> ImageTransform | None:
+        width = parse_dimension(query.get("width"))
+        height = parse_dimension(query.get("height"))
+        format = query.get("format")
+        if format is not None:
+            format = format.lower()
+            if format == "jpg":
+                format = "jpeg"
+            if format not in IMAGE_FORMATS:
+                raise ValueError(f"Unsupported image format {format}")
+        if width is None and height is None and format is None:
+            return None
+        return cls(width, height, format)  # type: ignore
+
+    def key(self) -> str:
+        return f"{self.width or 0}x{self.height or 0}.{self.format or 'src'}"
+
+
+def parse_dimension(value: str | None) -> int | None:
+    if value is None:
+        return None
+    dimension = int(value)
+    if not 0 < dimension <= MAX_DIMENSION:
+        raise ValueError(f"Image dimension must be between 1 and {MAX_DIMENSION}")
+    return dimension
+
+
+def fit(
+    size: Tuple[int, int], width: int | None, height: int | None
+) -> Tuple[int, int]:
+    # Scale into the requested box keeping the aspect ratio, never upscaling.
+    source_width, source_height = size
+    scale = 1.0
+    if width is not None:
+        scale = min(scale, width / source_width)
+    if height is not None:
+        scale = min(scale, height / source_height)
+    return max(1, round(source_width * scale)), max(1, round(source_height * scale))
+
+
+def transform_image(source: str, target: str, transform: ImageTransform) -> ImageFormat:
+    """Runs in a worker process. Writes the variant to target and returns
+    its format."""
+    from PIL import Image, ImageSequence
+
+    with Image.open(source) as image:
+        width, height = image.size
+        if width * height > MAX_SOURCE_PIXELS:
+            raise ValueError(f"Image of {width}x{height} pixels is too large")
+        frame_count = getattr(image, "n_frames", 1)
+        if frame_count > MAX_FRAMES:
+            raise ValueError(f"Image with {frame_count} frames has too many frames")
+        source_format = (image.format or "png").lower()
+        format: ImageFormat = transform.format or (
+            source_format if source_format in IMAGE_FORMATS else "png"  # type: ignore
+        )
+        size = fit(image.size, transform.width, transform.height)
+        animated = getattr(image, "is_animated", False) and format in ("gif", "webp")
+        if animated:
+            frames = [
+                frame.convert("RGBA").resize(size, Image.Resampling.LANCZOS)
+                for frame in ImageSequence.Iterator(image)
+            ]
+            frames[0].save(
+                target,
+                format=format,
+                save_all=True,
+                append_images=frames[1:],
+                duration=image.info.get("duration", 100),
+                loop=image.info.get("loop", 0),
+                disposal=2,
+            )
+            return format
+        frame = image.convert("RGBA") if image.mode not in ("RGB", "RGBA") else image
+        if frame.size != size:
+            frame = frame.resize(size, Image.Resampling.LANCZOS)
+        if format == "jpeg":
+            frame = frame.convert("RGB")
+        frame.save(target, format=format)
+        return format
+
+
+def is_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ImageVariants:
+    """Content-keyed disk cache of resized and transcoded images.
+
+    Transforms run in a process pool so decoding large images never holds
+    the event loop or the GIL of the server process. Pillow is optional;
+    without it requests for variants are served the original image.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = MAX_VARIANT_BYTES,
+        workers: int | None = None,
+    ) -> None:
+        self._path = path
+        self._max_bytes = max_bytes
+        self._workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self._pool: ProcessPoolExecutor | None = None
+        self._available: bool | None = None
+        self._variants: OrderedDict[str, Tuple[ImageFormat, int]] = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._inflight: Dict[str, asyncio.Future[Tuple[Path, str]]] = {}
+        # Sources that could not be transformed, so they are not retried on
+        # every request.
+        self._failed: OrderedDict[str, None] = OrderedDict()
+
+    @property
+    def available(self) -> bool:
+        if self._available is None:
+            self._available = is_available()
+            if not self._available:
+                logger.warning("Pillow is not installed, image transforms disabled")
+        return self._available
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Forked workers would inherit the loop, sockets and sqlite
+            # connections of the server process.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def _kill_pool(self) -> None:
+        # A worker stuck in a transform is not stopped by cancelling its
+        # future, so the pool is replaced and its processes killed.
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        # ProcessPoolExecutor has no public way to reach its workers, this
+        # relies on the private _processes map of pid to process.
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.kill()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def get(
+        self, source: Path, digest: str, transform: ImageTransform
+    ) -> Tuple[Path, str] | None:
+        """Returns the variant file and its content type, or None if the
+        source cannot be transformed."""
+        if not self.available:
+            return None
+        await self._load()
+        key = hashlib.blake2b(
+            f"{digest}:{transform.key()}".encode(), digest_size=16
+        ).hexdigest()
+        if key in self._failed:
+            return None
+        variant = self._variants.get(key)
+        if variant is not None:
+            format, _ = variant
+            path = self._path / f"{key}.{format}"
+            if path.exists():
+                self._variants.move_to_end(key)
+                return path, IMAGE_FORMATS[format]
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except Exception:
+                return None
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._transform(source, key, transform)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            logger.warning(f"Failed to transform image {source}: {e!r}")
+            if not isinstance(e, BrokenProcessPool):
+                self._failed[key] = None
+                if len(self._failed) > MAX_FAILED_VARIANTS:
+                    self._failed.popitem(last=False)
+            future.set_exception(e)
+            # Retrieved here so that an unawaited failure is not reported.
+            future.exception()
+            return None
+        finally:
+            del self._inflight[key]
+
+    async def _transform(
+        self, source: Path, key: str, transform: ImageTransform
+    ) -> Tuple[Path, str]:
+        temp = self._path / f".{key}.tmp"
+        loop = asyncio.get_running_loop()
+        try:
+            format = await asyncio.wait_for(
+                loop.run_in_executor(
+                    self._get_pool(), transform_image, str(source), str(temp), transform
+                ),
+                TRANSFORM_TIMEOUT,
+            )
+            path = self._path / f"{key}.{format}"
+            await asyncio.to_thread(os.replace, temp, path)
+        except BaseException as e:
+            if isinstance(e, TimeoutError):
+                self._kill_pool()
+            await asyncio.to_thread(temp.unlink, True)
+            raise
+        size = path.stat().st_size
+        old = self._variants.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._variants[key] = (format, size)
+        self._bytes += size
+        await self._evict()
+        return path, IMAGE_FORMATS[format]
+
+    async def _evict(self) -> None:
+        victims: List[str] = []
+        while self._bytes > self._max_bytes and len(self._variants) > 1:
+            key, (_, size) = self._variants.popitem(last=False)
+            self._bytes -= size
+            victims.append(key)
+        if victims:
+            await asyncio.to_thread(self._remove, victims)
+
+    def _remove(self, keys: List[str]) -> None:
+        for key in keys:
+            for format in IMAGE_FORMATS:
+                (self._path / f"{key}.{format}").unlink(missing_ok=True)
+
+    async def _load(self) -> None:
+        if self._loaded:
+            return
+        # Requests wait for the scan, an empty index would let them evict or
+        # overwrite variants that are already on disk.
+        async with self._load_lock:
+            if self._loaded:
+                return
+            for key, format, size in await asyncio.to_thread(self._scan):
+                self._variants[key] = (format, size)
+                self._bytes += size
+            await self._evict()
+            self._loaded = True
+
+    def _scan(self) -> List[Tuple[str, ImageFormat, int]]:
+        self._path.mkdir(parents=True, exist_ok=True)
+        found: List[Tuple[float, str, ImageFormat, int]] = []
+        for file in self._path.iterdir():
+            format = file.suffix.removeprefix(".")
+            if file.name.startswith(".") or format not in IMAGE_FORMATS:
+                file.unlink(missing_ok=True)
+                continue
+            stat = file.stat()
+            found.append((stat.st_mtime, file.stem, format, stat.st_size))  # type: ignore
+        found.sort()
+        return [(key, format, size) for _, key, format, size in found]
@@ -99,17 +99,16 @@ class EndpointCall:
 
 
 class EndpointExtension(Extension, ServerListener):
+    startup_stage = "endpoints"
+
     def __init__(self, server: Server) -> None:
         self._server = server
         self._server.add_listener(self)
         self._endpoints: Dict[str, Endpoint] = {}
         self._calls: Dict[str, EndpointCall] = {}
-        server.events.register(
-            EndpointRegisterEvent,
-            EndpointCallEvent,
-            EndpointReceiveEvent,
-            EndpointErrorEvent,
-        )
+        server.events.register(EndpointRegisterEvent, ordering="strict")
+        server.events.register(EndpointCallEvent, ordering="causal")
+        server.events.register(EndpointReceiveEvent, EndpointErrorEvent)
         server.events.add_listener(EndpointRegisterEvent, self._on_endpoint_register)
         server.events.add_listener(EndpointCallEvent, self._on_endpoint_call)
         server.events.add_listener(EndpointReceiveEvent, self._on_endpoint_receive)
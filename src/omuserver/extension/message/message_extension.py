@@ -10,6 +10,7 @@ from omu.extension.message.message_extension import (
 )
 
 from omuserver.extension import Extension
+from omuserver.session import EventFrame
 from omuserver.session.session import SessionListener
 
 if TYPE_CHECKING:
@@ -41,8 +42,9 @@ class MessageExtension(Extension):
         self._server = server
         self._keys: Dict[str, Message] = {}
         server.events.register(
-            MessageRegisterEvent, MessageListenEvent, MessageBroadcastEvent
+            MessageRegisterEvent, MessageListenEvent, ordering="strict"
         )
+        server.events.register(MessageBroadcastEvent)
         server.events.add_listener(MessageRegisterEvent, self._on_register)
         server.events.add_listener(MessageListenEvent, self._on_listen)
         server.events.add_listener(MessageBroadcastEvent, self._on_broadcast)
@@ -72,5 +74,8 @@ class MessageExtension(Extension):
         message = self._keys[key]
         if message.session != session:
             raise Exception("Unauthorized broadcast")
-        for listener in message.listeners:
-            await listener.send(MessageBroadcastEvent, data)
+        frame = EventFrame(MessageBroadcastEvent, data)
+        for listener in tuple(message.listeners):
+            if listener.closed:
+                continue
+            await listener.send_frame(frame)
@@ -1,4 +1,5 @@
+from .appplugin import AppPlugin
 from .plugin import Plugin
 from .serverplugin import ServerPlugin
 
-__all__ = ["Plugin", "ServerPlugin"]
+__all__ = ["AppPlugin", "Plugin", "ServerPlugin"]
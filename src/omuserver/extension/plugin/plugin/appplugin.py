@@ -1,59 +1,126 @@
 from __future__ import annotations
 
-import abc
-import importlib.util
-import inspect
-import subprocess
+import asyncio
+import os
+import secrets
 import sys
 from pathlib import Path
-from types import ModuleType
+from typing import TYPE_CHECKING, Dict
 
-from omuserver.server import Server
+from loguru import logger
+
+from omuserver.security.permission import AdminPermissions
 
 from .plugin import Plugin
 
+if TYPE_CHECKING:
+    from omuserver.server import Server
+
+TERMINATE_TIMEOUT = 5
+
+
+class PluginProcessError(Exception):
+    pass
+
 
-class ServerModule(abc.ABC):
-    @abc.abstractmethod
-    async def main(self) -> None:
-        ...
+class AppPlugin(Plugin):
+    """Runs a plugin's main.py in its own Python process.
 
+    The process connects back to the server as a regular client, using the
+    address and token passed in its environment, so CPU-heavy plugins run on
+    their own core instead of the server's event loop.
+    """
 
-class ServerPlugin(Plugin):
     def __init__(self, path: Path, server: Server) -> None:
         self._path = path
         self._server = server
-        self._process: subprocess.Popen[bytes] | None = None
+        self._process: asyncio.subprocess.Process | None = None
+        self._token: str | None = None
 
     @classmethod
-    async def create(cls, path: Path, server: Server) -> ServerPlugin:
+    async def create(cls, path: Path, server: Server) -> AppPlugin:
+        if not (path / "main.py").is_file():
+            raise ValueError(f"{path} does not have a main.py file")
         return cls(path, server)
 
-    def _validate_module(self, module: ModuleType) -> ServerModule:
-        if not hasattr(module, "main") or not inspect.iscoroutinefunction(module.main):
-            raise ValueError(f"{module} does not have a main function")
-        return module  # type: ignore
-
-    def _load_module(self) -> ServerModule:
-        path = self._path / "server.py"
-        spec = importlib.util.spec_from_file_location(path.stem, path)
-        assert spec
-        module = importlib.util.module_from_spec(spec)
-        loader = spec.loader
-        if not loader:
-            raise AssertionError
-        loader.exec_module(module)
-        self._module = self._validate_module(module)
-        return self._module
+    @property
+    def name(self) -> str:
+        return self._path.name
+
+    async def load(self) -> None:
+        if self._token is not None:
+            return
+        # Out-of-process plugins get the same trust as in-process ones, which
+        # can reach every server extension directly. The token only lives in
+        # memory so a crash cannot leave it valid.
+        self._token = secrets.token_urlsafe(24)
+        await self._server.security.add_temporary_permissions(
+            self._token, AdminPermissions(f"plugin:{self.name}")
+        )
+
+    def _environment(self) -> Dict[str, str]:
+        address = self._server.address
+        host = address.host
+        if host in ("0.0.0.0", "::", ""):
+            host = "127.0.0.1"
+        assert self._token
+        return {
+            **os.environ,
+            "OMU_SERVER_HOST": host,
+            "OMU_SERVER_PORT": str(address.port),
+            "OMU_SERVER_SECURE": "1" if address.secure else "0",
+            "OMU_TOKEN": self._token,
+            "OMU_PLUGIN_NAME": self.name,
+            "PYTHONUNBUFFERED": "1",
+            "PYTHONIOENCODING": "utf-8",
+        }
 
     async def start(self) -> None:
-        self._process = subprocess.Popen(
-            [sys.executable, str(self._path / "main.py")],
+        await self.load()
+        self._process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            str(self._path / "main.py"),
             cwd=self._path,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            env=self._environment(),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
         )
+        process = self._process
+        logger.info(f"Started plugin process {self.name} (pid {process.pid})")
+        forwarders = [
+            asyncio.create_task(self._forward(process.stdout, "INFO")),
+            asyncio.create_task(self._forward(process.stderr, "WARNING")),
+        ]
+        try:
+            code = await process.wait()
+            await asyncio.gather(*forwarders)
+        finally:
+            for forwarder in forwarders:
+                forwarder.cancel()
+            await self.unload()
+        if code != 0:
+            raise PluginProcessError(f"Plugin {self.name} exited with code {code}")
+
+    async def _forward(self, stream: asyncio.StreamReader | None, level: str) -> None:
+        if stream is None:
+            return
+        while line := await stream.readline():
+            text = line.decode("utf-8", errors="replace").rstrip()
+            if text:
+                logger.log(level, f"[{self.name}] {text}")
 
     async def unload(self) -> None:
-        raise NotImplementedError
+        token, self._token = self._token, None
+        if token is not None:
+            await self._server.security.remove_permissions(token)
+        process, self._process = self._process, None
+        if process is None or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), TERMINATE_TIMEOUT)
+        except TimeoutError:
+            logger.warning(f"Plugin {self.name} did not exit, killing it")
+            process.kill()
+            await process.wait()
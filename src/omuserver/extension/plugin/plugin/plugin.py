@@ -15,6 +15,10 @@ class Plugin(abc.ABC):
     async def create(cls, path: Path, server: Server) -> Plugin:
         ...
 
+    @abc.abstractmethod
+    async def load(self) -> None:
+        ...
+
     @abc.abstractmethod
     async def start(self) -> None:
         ...
@@ -48,6 +48,13 @@ class ServerPlugin(Plugin):
         self._module = self._validate_module(module)
         return self._module
 
+    async def load(self) -> None:
+        # Modules are executed on the loop thread, since plugins may create
+        # clients or other loop-bound objects at import time.
+        self._load_module()
+
     async def start(self) -> None:
-        module = self._load_module()
-        await module.main()
+        if self._module is None:
+            await self.load()
+        assert self._module
+        await self._module.main()
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import asyncio
 from pathlib import Path
 from typing import TYPE_CHECKING, Dict
 
+from loguru import logger
+
 from omuserver.extension import Extension
 from omuserver.server import ServerListener
 
-from .plugin import Plugin, ServerPlugin
+from .plugin import AppPlugin, Plugin, ServerPlugin
+from .plugin_supervisor import PluginBudget, PluginSupervisor
 
 if TYPE_CHECKING:
     from omuserver.server import Server
@@ -22,14 +26,25 @@ class PluginLoader:
 
     async def load(self, path: Path) -> Plugin:
         self._validate(path)
+        # main.py runs in its own process, run.py on the server's loop.
+        if (path / "main.py").is_file():
+            return await AppPlugin.create(path, self._server)
         return await ServerPlugin.create(path, self._server)
 
 
 class PluginExtension(Extension, ServerListener):
+    startup_stage = "plugins"
+    # Plugins connect back to the server as clients.
+    startup_after = ("network",)
+    # Plugins are supervised and restarted on their own.
+    startup_required = False
+
     def __init__(self, server: Server) -> None:
         self._server = server
         self.plugins: Dict[str, Plugin] = {}
+        self.supervisors: Dict[str, PluginSupervisor] = {}
         self.loader = PluginLoader(server)
+        self.budget = PluginBudget()
         server.add_listener(self)
 
     @classmethod
@@ -39,13 +54,45 @@ class PluginExtension(Extension, ServerListener):
     async def on_start(self) -> None:
         await self._load_plugins()
 
+    async def on_shutdown(self) -> None:
+        await asyncio.gather(
+            *(supervisor.stop() for supervisor in self.supervisors.values())
+        )
+
     async def _load_plugins(self) -> None:
+        # Every plugin is started as its own supervised task, so a slow or
+        # crashing plugin cannot hold back the others.
         for plugin in self._server.directories.plugins.iterdir():
             if plugin.name.startswith("."):
                 continue
-            await self._load_plugin(plugin)
+            self._load_plugin(plugin)
+        await asyncio.gather(
+            *(supervisor.wait_started() for supervisor in self.supervisors.values())
+        )
+        for supervisor in self.supervisors.values():
+            logger.info(
+                f"Plugin {supervisor.name} {supervisor.state}: "
+                f"import {format_time(supervisor.import_time)}, "
+                f"init {format_time(supervisor.init_time)}"
+            )
+        await self._server.registry.store(
+            "server:plugins",
+            [supervisor.to_json() for supervisor in self.supervisors.values()],
+        )
 
-    async def _load_plugin(self, path: Path) -> None:
+    def _load_plugin(self, path: Path) -> PluginSupervisor:
+        supervisor = PluginSupervisor(path, self._create_plugin, self.budget)
+        self.supervisors[path.name] = supervisor
+        supervisor.start()
+        return supervisor
+
+    async def _create_plugin(self, path: Path) -> Plugin:
         plugin = await self.loader.load(path)
         self.plugins[path.name] = plugin
-        await plugin.start()
+        return plugin
+
+
+def format_time(seconds: float | None) -> str:
+    if seconds is None:
+        return "-"
+    return f"{seconds * 1000:.1f}ms"
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable, Callable, Literal, TypedDict
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from .plugin import Plugin
+
+type PluginState = Literal[
+    "pending", "loading", "starting", "running", "stopped", "failed"
+]
+
+
+class PluginStatusJson(TypedDict):
+    name: str
+    state: PluginState
+    import_time: float | None
+    init_time: float | None
+    restarts: int
+    error: str | None
+
+
+@dataclass
+class PluginBudget:
+    # Seconds allowed for loading the plugin. In-process plugins are imported
+    # synchronously on the loop, so this only bounds out-of-process ones.
+    import_timeout: float = 30
+    # Seconds main() may run before startup stops waiting for it. A plugin
+    # still running after this is treated as a long-lived service.
+    init_timeout: float = 10
+    max_restarts: int = 5
+    backoff: float = 1
+    max_backoff: float = 60
+    # A run lasting this long resets the restart counter.
+    stable_after: float = 60
+
+
+class PluginSupervisor:
+    def __init__(
+        self,
+        path: Path,
+        load: Callable[[Path], Awaitable[Plugin]],
+        budget: PluginBudget | None = None,
+    ) -> None:
+        self._path = path
+        self._load = load
+        self._budget = budget or PluginBudget()
+        self._task: asyncio.Task | None = None
+        self._started = asyncio.Event()
+        self.plugin: Plugin | None = None
+        self.state: PluginState = "pending"
+        self.import_time: float | None = None
+        self.init_time: float | None = None
+        self.restarts = 0
+        self.error: BaseException | None = None
+
+    @property
+    def name(self) -> str:
+        return self._path.name
+
+    def start(self) -> None:
+        if self._task is not None:
+            raise Exception(f"Plugin {self.name} already started")
+        self._task = asyncio.create_task(self._supervise())
+
+    async def wait_started(self) -> None:
+        await self._started.wait()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.state != "failed":
+            self.state = "stopped"
+
+    async def _supervise(self) -> None:
+        failures = 0
+        while True:
+            started = time.monotonic()
+            try:
+                await self._run()
+                self.state = "stopped"
+                logger.info(f"Plugin {self.name} finished")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.error = e
+                logger.opt(exception=e).error(f"Plugin {self.name} crashed")
+            finally:
+                self._started.set()
+            if time.monotonic() - started >= self._budget.stable_after:
+                failures = 0
+            failures += 1
+            if failures > self._budget.max_restarts:
+                self.state = "failed"
+                logger.error(f"Plugin {self.name} failed {failures} times, giving up")
+                return
+            delay = min(
+                self._budget.backoff * 2 ** (failures - 1), self._budget.max_backoff
+            )
+            logger.warning(f"Restarting plugin {self.name} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            self.restarts += 1
+
+    async def _run(self) -> None:
+        self.state = "loading"
+        started = time.perf_counter()
+        plugin = await self._load(self._path)
+        await asyncio.wait_for(plugin.load(), self._budget.import_timeout)
+        self.plugin = plugin
+        self.import_time = time.perf_counter() - started
+
+        self.state = "starting"
+        started = time.perf_counter()
+        main = asyncio.create_task(plugin.start())
+        try:
+            done, _ = await asyncio.wait({main}, timeout=self._budget.init_timeout)
+            self.init_time = time.perf_counter() - started
+            if done:
+                main.result()
+            else:
+                logger.info(
+                    f"Plugin {self.name} still running after "
+                    f"{self._budget.init_timeout}s, continuing in the background"
+                )
+            self.state = "running"
+            self._started.set()
+            await main
+        finally:
+            main.cancel()
+
+    def to_json(self) -> PluginStatusJson:
+        return PluginStatusJson(
+            name=self.name,
+            state=self.state,
+            import_time=self.import_time,
+            init_time=self.init_time,
+            restarts=self.restarts,
+            error=repr(self.error) if self.error else None,
+        )
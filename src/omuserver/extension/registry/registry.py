@@ -1,4 +1,3 @@
-import json
 from typing import Any
 
 from omu.extension.registry.registry_extension import (
@@ -6,8 +5,9 @@ from omu.extension.registry.registry_extension import (
     RegistryUpdateEvent,
 )
 
+from omuserver.codec import json
 from omuserver.server import Server
-from omuserver.session import Session
+from omuserver.session import EventFrame, Session
 from omuserver.session.session import SessionListener
 
 
@@ -23,7 +23,7 @@ class Registry(SessionListener):
     async def load(self) -> Any:
         if self.data is None:
             if self._path.exists():
-                self.data = json.loads(self._path.read_text())
+                self.data = json.loads(self._path.read_bytes())
             else:
                 self.data = None
         return self.data
@@ -31,14 +31,17 @@ class Registry(SessionListener):
     async def store(self, value: Any) -> None:
         self.data = value
         self._path.parent.mkdir(parents=True, exist_ok=True)
-        self._path.write_text(json.dumps(value))
+        self._path.write_bytes(json.dumps_bytes(value))
         await self._notify()
 
     async def _notify(self) -> None:
-        for listener in self._listeners:
-            await listener.send(
-                RegistryUpdateEvent, RegistryEventData(key=self._key, value=self.data)
-            )
+        frame = EventFrame(
+            RegistryUpdateEvent, RegistryEventData(key=self._key, value=self.data)
+        )
+        for listener in tuple(self._listeners):
+            if listener.closed:
+                continue
+            await listener.send_frame(frame)
 
     async def attach(self, session: Session) -> None:
         if session in self._listeners:
@@ -21,7 +21,9 @@ if TYPE_CHECKING:
 class RegistryExtension(Extension):
     def __init__(self, server: Server) -> None:
         self._server = server
-        server.events.register(RegistryListenEvent, RegistryUpdateEvent)
+        server.events.register(
+            RegistryListenEvent, RegistryUpdateEvent, lane="registry"
+        )
         server.events.add_listener(RegistryListenEvent, self._on_listen)
         server.events.add_listener(RegistryUpdateEvent, self._on_update)
         server.endpoints.bind_endpoint(RegistryGetEndpoint, self._on_get)
@@ -18,6 +18,8 @@ if TYPE_CHECKING:
 
 
 class ServerExtension(Extension, NetworkListener, ServerListener):
+    startup_stage = "server"
+
     def __init__(self, server: Server) -> None:
         self._server = server
         table = server.extensions.get(TableExtension)
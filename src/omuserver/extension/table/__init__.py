@@ -1,9 +1,11 @@
 from .adapters import DictTableAdapter, SqliteTableAdapter, TableAdapter
+from .table_config import TableConfig
 from .table_extension import TableExtension
 
 __all__ = [
     "DictTableAdapter",
     "SqliteTableAdapter",
     "TableAdapter",
+    "TableConfig",
     "TableExtension",
 ]
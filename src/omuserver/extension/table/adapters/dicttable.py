@@ -1,30 +1,178 @@
+import time
+from bisect import bisect_left
 from pathlib import Path
-from typing import Dict, List
+from typing import AsyncIterator, Dict, Iterable, List, Tuple
 
-from .tableadapter import Json, TableAdapter, json
+from omuserver.codec import json
+
+from ..table_config import TableConfig
+from .journal import TableJournal
+from .query import TableFilter, check_filters, check_limit, matches, parse_indexes
+from .search import SearchFields, TableSearchResult, check_page, search_terms
+from .tableadapter import Json, TableAdapter
+
+COMPACT_MIN_TOMBSTONES = 1024
+
+
+class OrderedIndex:
+    """Insertion-ordered keys with O(1) position lookup.
+
+    Removed keys leave a tombstone behind so positions stay valid; the list
+    is compacted once tombstones outnumber live keys. Every key also gets a
+    sequence number that survives compaction, so iterators can resume.
+    """
+
+    def __init__(self, keys: Iterable[str] = ()) -> None:
+        self._keys: List[str | None] = list(keys)
+        self._positions: Dict[str, int] = {
+            key: index for index, key in enumerate(self._keys)  # type: ignore
+        }
+        self._seqs: List[int] = list(range(len(self._keys)))
+        self._next_seq = len(self._keys)
+        self._tombstones = 0
+        self._head = 0
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._positions
+
+    def add(self, key: str) -> None:
+        if key in self._positions:
+            return
+        self._positions[key] = len(self._keys)
+        self._keys.append(key)
+        self._seqs.append(self._next_seq)
+        self._next_seq += 1
+
+    def remove(self, key: str) -> None:
+        index = self._positions.pop(key, None)
+        if index is None:
+            return
+        self._keys[index] = None
+        self._tombstones += 1
+        while self._keys and self._keys[-1] is None:
+            self._keys.pop()
+            self._seqs.pop()
+            self._tombstones -= 1
+        self._head = min(self._head, len(self._keys))
+        if self._tombstones >= COMPACT_MIN_TOMBSTONES and self._tombstones > len(
+            self._positions
+        ):
+            self._compact()
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._seqs.clear()
+        self._positions.clear()
+        self._tombstones = 0
+        self._head = 0
+
+    def _compact(self) -> None:
+        live = [index for index, key in enumerate(self._keys) if key is not None]
+        self._keys = [self._keys[index] for index in live]
+        self._seqs = [self._seqs[index] for index in live]
+        self._positions = {key: index for index, key in enumerate(self._keys)}
+        self._tombstones = 0
+        self._head = 0
+
+    @property
+    def end(self) -> int:
+        return len(self._keys)
+
+    def position(self, key: str) -> int:
+        return self._positions[key]
+
+    def seq(self, key: str) -> int:
+        return self._seqs[self._positions[key]]
+
+    def locate(self, seq: int) -> int:
+        return bisect_left(self._seqs, seq)
+
+    def first(self) -> str | None:
+        while self._head < len(self._keys) and self._keys[self._head] is None:
+            self._head += 1
+        if self._head >= len(self._keys):
+            return None
+        return self._keys[self._head]
+
+    def last(self) -> str | None:
+        if not self._keys:
+            return None
+        return self._keys[-1]
+
+    def before(self, index: int, limit: int) -> List[str]:
+        keys: List[str] = []
+        while index >= 0 and len(keys) < limit:
+            key = self._keys[index]
+            if key is not None:
+                keys.append(key)
+            index -= 1
+        return keys
+
+    def after(self, index: int, limit: int) -> List[str]:
+        keys: List[str] = []
+        while index < len(self._keys) and len(keys) < limit:
+            key = self._keys[index]
+            if key is not None:
+                keys.append(key)
+            index += 1
+        return keys
 
 
 class DictTableAdapter(TableAdapter):
-    def __init__(self, path: Path) -> None:
+    def __init__(self, path: Path, config: TableConfig | None = None) -> None:
         self._path = path / "data.json"
+        self._journal = TableJournal(self._path, path / "data.journal")
         self._data: Dict[str, Json] = {}
+        self._index = OrderedIndex()
+        self._indexes = parse_indexes((config or {}).get("indexes"))
+        search = (config or {}).get("search")
+        self._search = SearchFields(search) if search else None
+        self._retention = (config or {}).get("retention")
+        # Insertion times are kept in memory only, so after a restart loaded
+        # items start aging from the load time.
+        self._times: Dict[str, float] = {}
+        self._sizes: Dict[str, int] | None = None
+        if self._retention and self._retention.get("max_bytes") is not None:
+            self._sizes = {}
+        self._bytes = 0
 
     @classmethod
-    def create(cls, path: Path) -> TableAdapter:
-        return cls(path)
+    def create(cls, path: Path, config: TableConfig | None = None) -> TableAdapter:
+        return cls(path, config)
 
     async def store(self) -> None:
-        self._path.write_text(json.dumps(self._data), encoding="utf-8")
+        await self._journal.flush(self._data)
 
     async def load(self) -> None:
-        if not self._path.exists():
-            self._data = {}
+        self._data = await self._journal.load()
+        self._index = OrderedIndex(self._data.keys())
+        now = time.time()
+        self._times = dict.fromkeys(self._data, now)
+        if self._sizes is not None:
+            self._sizes = {}
+            self._bytes = 0
+            self._track_sizes(self._data)
+
+    def _track_sizes(self, items: Dict[str, Json]) -> None:
+        if self._sizes is None:
             return
-        data = self._path.read_text(encoding="utf-8")
-        items = json.loads(data)
-        if not isinstance(items, dict):
-            raise ValueError("Invalid data")
-        self._data = {key: value for key, value in items.items()}
+        for key, value in items.items():
+            size = len(json.dumps_bytes(value))
+            self._bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+
+    async def close(self) -> None:
+        # Callers store before closing, so the data can be dropped and read
+        # back from the snapshot and journal on the next load.
+        self._data = {}
+        self._index = OrderedIndex()
+        self._times.clear()
+        if self._sizes is not None:
+            self._sizes.clear()
+            self._bytes = 0
 
     async def get(self, key: str) -> Json | None:
         return self._data.get(key, None)
@@ -33,48 +181,167 @@ class DictTableAdapter(TableAdapter):
         return {key: self._data[key] for key in keys if key in self._data}
 
     async def set(self, key: str, value: Json) -> None:
-        self._data[key] = value
+        await self.set_all({key: value})
 
     async def set_all(self, items: Dict[str, Json]) -> None:
         self._data.update(items)
+        now = time.time()
+        for key in items:
+            self._index.add(key)
+            self._times.setdefault(key, now)
+        self._track_sizes(items)
+        self._journal.set(items)
 
     async def remove(self, key: str) -> None:
-        del self._data[key]
+        await self.remove_all([key])
 
     async def remove_all(self, keys: List[str]) -> None:
         for key in keys:
             if key in self._data:
                 del self._data[key]
+                self._index.remove(key)
+                self._times.pop(key, None)
+                if self._sizes is not None:
+                    self._bytes -= self._sizes.pop(key, 0)
+        self._journal.remove(keys)
 
     async def fetch(
         self, before: int | None, after: int | None, cursor: str | None
     ) -> Dict[str, Json]:
-        keys = list(self._data.keys())
-        if cursor is None:
-            cursor = await self.first() if before is not None else await self.last()
-        if cursor is None:
-            return {}
-        if cursor not in keys:
-            raise ValueError("Invalid cursor")
-        index = keys.index(cursor)
+        # Same window as the SQLite adapter: newest first, with `before`
+        # counting back from the cursor (or the end) and `after` counting
+        # forward from the cursor (or the start).
+        if cursor is not None and cursor not in self._index:
+            raise ValueError(f"Cursor {cursor} not found")
+        keys: Dict[int, str] = {}
         if before is not None:
-            keys = keys[max(0, index - before) :]
+            start = (
+                self._index.position(cursor)
+                if cursor is not None
+                else self._index.end - 1
+            )
+            for key in self._index.before(start, before):
+                keys[self._index.position(key)] = key
         if after is not None:
-            keys = keys[: min(len(keys), index + after + 1)]
-        return {key: self._data[key] for key in keys}
+            start = self._index.position(cursor) if cursor is not None else 0
+            for key in self._index.after(start, after):
+                keys[self._index.position(key)] = key
+        return {key: self._data[key] for _, key in sorted(keys.items(), reverse=True)}
+
+    async def iterate(self, batch_size: int = 256) -> AsyncIterator[Tuple[str, Json]]:
+        seq = 0
+        while True:
+            keys = self._index.after(self._index.locate(seq), batch_size)
+            if len(keys) == 0:
+                break
+            seq = self._index.seq(keys[-1]) + 1
+            for key in keys:
+                if key in self._data:
+                    yield key, self._data[key]
+
+    async def query(
+        self, filters: List[TableFilter], limit: int | None, cursor: str | None
+    ) -> Dict[str, Json]:
+        # Nothing to push down to in memory, so this is a filtered scan in
+        # insertion order with the same semantics as the SQLite adapter.
+        check_filters(self._indexes, filters)
+        limit = check_limit(limit)
+        position = 0
+        if cursor is not None:
+            if cursor not in self._index:
+                raise ValueError(f"Cursor {cursor} not found")
+            position = self._index.position(cursor) + 1
+        items: Dict[str, Json] = {}
+        while len(items) < limit:
+            keys = self._index.after(position, limit)
+            if len(keys) == 0:
+                break
+            position = self._index.position(keys[-1]) + 1
+            for key in keys:
+                value = self._data[key]
+                if matches(self._indexes, filters, value):
+                    items[key] = value
+                    if len(items) >= limit:
+                        break
+        return items
+
+    async def search(
+        self, query: str, limit: int | None, offset: int | None
+    ) -> TableSearchResult:
+        # Without FTS5 this is a newest-first scan for items whose search
+        # fields contain every term; use_database tables get ranked results.
+        if self._search is None:
+            raise ValueError("Table has no search fields configured")
+        terms = [term.casefold() for term in search_terms(query)]
+        limit, offset = check_page(limit, offset)
+        if len(terms) == 0:
+            return TableSearchResult(items={}, offset=None)
+        items: Dict[str, Json] = {}
+        skipped = 0
+        position = self._index.end - 1
+        while position >= 0:
+            keys = self._index.before(position, limit)
+            if len(keys) == 0:
+                break
+            position = self._index.position(keys[-1]) - 1
+            for key in keys:
+                value = self._data[key]
+                text = self._search.text(value).casefold()
+                if not all(term in text for term in terms):
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                if len(items) == limit:
+                    return TableSearchResult(items=items, offset=offset + limit)
+                items[key] = value
+        return TableSearchResult(items=items, offset=None)
+
+    async def expired(self, limit: int) -> List[str]:
+        retention = self._retention
+        if not retention:
+            return []
+        count = 0
+        max_rows = retention.get("max_rows")
+        if max_rows is not None:
+            count = len(self._data) - max_rows
+        excess = 0
+        max_bytes = retention.get("max_bytes")
+        if max_bytes is not None and self._sizes is not None:
+            excess = self._bytes - max_bytes
+        max_age = retention.get("max_age")
+        cutoff = time.time() - max_age if max_age is not None else None
+        keys: List[str] = []
+        for key in self._index.after(0, limit):
+            if len(keys) < count or excess > 0:
+                keys.append(key)
+                if self._sizes is not None:
+                    excess -= self._sizes.get(key, 0)
+            elif cutoff is not None and self._times.get(key, cutoff) < cutoff:
+                keys.append(key)
+            else:
+                break
+        return keys
+
+    async def compact(self) -> None:
+        # Removed items are already gone from memory; the journal folds the
+        # deletions into the snapshot on its next compaction.
+        pass
 
     async def first(self) -> str | None:
-        if not self._data:
-            return None
-        return tuple(self._data.keys())[0]
+        return self._index.first()
 
     async def last(self) -> str | None:
-        if not self._data:
-            return None
-        return tuple(self._data.keys())[-1]
+        return self._index.last()
 
     async def clear(self) -> None:
         self._data.clear()
+        self._index.clear()
+        self._times.clear()
+        if self._sizes is not None:
+            self._sizes.clear()
+            self._bytes = 0
+        self._journal.clear()
 
     async def size(self) -> int:
         return len(self._data)
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+from typing import Dict, List, Literal, Tuple
+
+from loguru import logger
+
+from omuserver.codec import Json, json
+
+type JournalOp = Literal["set", "remove", "clear"]
+type JournalRecord = Tuple[JournalOp, Json]
+
+COMPACT_MIN_BYTES = 1024 * 1024
+
+
+class TableJournal:
+    def __init__(self, snapshot: Path, journal: Path) -> None:
+        self._snapshot = snapshot
+        self._journal = journal
+        self._pending: List[bytes] = []
+        self._snapshot_size = 0
+        self._journal_size = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def set(self, items: Dict[str, Json]) -> None:
+        self._append_record(("set", items))
+
+    def remove(self, keys: List[str]) -> None:
+        self._append_record(("remove", keys))
+
+    def clear(self) -> None:
+        self._pending = []
+        self._append_record(("clear", None))
+
+    def _append_record(self, record: JournalRecord) -> None:
+        # Records are encoded when the change is made, so values mutated
+        # before the next flush are journaled as they were at the time.
+        self._pending.append(json.dumps_bytes(record) + b"\n")  # type: ignore
+
+    async def load(self) -> Dict[str, Json]:
+        # Sizes read here are what appends truncate to, so a flush must not
+        # append while the journal is being read.
+        async with self._lock:
+            return await asyncio.to_thread(self._load)
+
+    def _load(self) -> Dict[str, Json]:
+        data: Dict[str, Json] = {}
+        if self._snapshot.exists():
+            snapshot = self._snapshot.read_bytes()
+            items = json.loads(snapshot)
+            if not isinstance(items, dict):
+                raise ValueError("Invalid data")
+            data = items
+            self._snapshot_size = len(snapshot)
+        if self._journal.exists():
+            lines = self._journal.read_bytes().splitlines(keepends=True)
+            size = 0
+            for index, line in enumerate(lines):
+                try:
+                    op, arg = json.loads(line)  # type: ignore
+                except ValueError:
+                    if index != len(lines) - 1:
+                        raise
+                    # A crash while appending can leave the last record
+                    # partially written; everything before it is intact.
+                    logger.warning(f"Dropping truncated record in {self._journal}")
+                    with self._journal.open("r+b") as file:
+                        file.truncate(size)
+                    break
+                self._apply(data, op, arg)
+                size += len(line)
+            self._journal_size = size
+        return data
+
+    @staticmethod
+    def _apply(data: Dict[str, Json], op: JournalOp, arg: Json) -> None:
+        if op == "set":
+            assert isinstance(arg, dict)
+            data.update(arg)
+        elif op == "remove":
+            assert isinstance(arg, list)
+            for key in arg:
+                data.pop(key, None)  # type: ignore
+        elif op == "clear":
+            data.clear()
+        else:
+            raise ValueError(f"Unknown journal record {op}")
+
+    async def flush(self, data: Dict[str, Json]) -> None:
+        async with self._lock:
+            records, self._pending = self._pending, []
+            if records:
+                lines = b"".join(records)
+                try:
+                    await asyncio.to_thread(self._append, lines, self._journal_size)
+                except BaseException:
+                    # Kept for the next flush, ahead of the changes made since.
+                    self._pending = records + self._pending
+                    raise
+                self._journal_size += len(lines)
+            if self._journal_size >= max(self._snapshot_size, COMPACT_MIN_BYTES):
+                await self._compact(dict(data))
+
+    def _append(self, lines: bytes, size: int) -> None:
+        with self._journal.open("ab") as file:
+            # Cuts off whatever an earlier failed append left behind, so that
+            # a torn record never ends up in front of intact ones.
+            file.truncate(size)
+            file.write(lines)
+
+    async def _compact(self, snapshot: Dict[str, Json]) -> None:
+        self._snapshot_size = await asyncio.to_thread(self._write_snapshot, snapshot)
+        self._journal_size = 0
+
+    def _write_snapshot(self, snapshot: Dict[str, Json]) -> int:
+        data = json.dumps_bytes(snapshot)
+        temp = self._snapshot.with_suffix(".tmp")
+        temp.write_bytes(data)
+        os.replace(temp, self._snapshot)
+        # Replaying records that are already part of the snapshot yields the
+        # same table, so a crash before truncating the journal is harmless.
+        self._journal.write_bytes(b"")
+        return len(data)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import re
+import zlib
+from typing import Dict, List, Literal, Mapping, TypedDict
+
+from omuserver.codec import Json
+
+type FilterOp = Literal["eq", "ne", "lt", "lte", "gt", "gte"]
+
+SQL_OPERATORS: Dict[FilterOp, str] = {
+    "eq": "IS",
+    "ne": "IS NOT",
+    "lt": "<",
+    "lte": "<=",
+    "gt": ">",
+    "gte": ">=",
+}
+DEFAULT_QUERY_LIMIT = 100
+MAX_QUERY_LIMIT = 1000
+
+INDEX_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+JSON_PATH = re.compile(r"^\$(\.[A-Za-z_][A-Za-z0-9_]*|\[\d+\])+$")
+JSON_PATH_PART = re.compile(r"\.([A-Za-z_][A-Za-z0-9_]*)|\[(\d+)\]")
+
+
+class TableFilter(TypedDict):
+    index: str
+    op: FilterOp
+    value: Json
+
+
+def parse_path(path: str) -> List[str | int]:
+    if not JSON_PATH.match(path):
+        raise ValueError(f"Invalid JSON path {path!r}")
+    return [key if key else int(index) for key, index in JSON_PATH_PART.findall(path)]
+
+
+def extract(parts: List[str | int], value: Json) -> Json:
+    for part in parts:
+        if isinstance(part, int):
+            if not isinstance(value, list) or part >= len(value):
+                return None
+            value = value[part]
+        else:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+    return value
+
+
+class TableIndex:
+    def __init__(self, name: str, path: str) -> None:
+        if not INDEX_NAME.match(name):
+            raise ValueError(f"Invalid index name {name!r}")
+        self.name = name
+        self.path = path
+        self.parts = parse_path(path)
+        # The path is part of the column name so that changing it in the
+        # config creates a new column instead of silently reusing the old one.
+        self.column = f"ix_{name}_{zlib.crc32(path.encode()):08x}"
+
+    def extract(self, value: Json) -> Json:
+        return extract(self.parts, value)
+
+
+def parse_indexes(indexes: Mapping[str, str] | None) -> Dict[str, TableIndex]:
+    return {name: TableIndex(name, path) for name, path in (indexes or {}).items()}
+
+
+def check_filters(
+    indexes: Dict[str, TableIndex], filters: List[TableFilter]
+) -> List[TableFilter]:
+    for filter in filters:
+        if filter["index"] not in indexes:
+            raise ValueError(f"Unknown index {filter['index']}")
+        if filter["op"] not in SQL_OPERATORS:
+            raise ValueError(f"Unknown filter operator {filter['op']}")
+        if isinstance(filter["value"], (dict, list)):
+            raise ValueError(f"Filter value for {filter['index']} must be a scalar")
+    return filters
+
+
+def check_limit(limit: int | None) -> int:
+    if limit is None:
+        return DEFAULT_QUERY_LIMIT
+    return min(max(1, limit), MAX_QUERY_LIMIT)
+
+
+def matches(
+    indexes: Dict[str, TableIndex], filters: List[TableFilter], value: Json
+) -> bool:
+    for filter in filters:
+        field = indexes[filter["index"]].extract(value)
+        expected = filter["value"]
+        op = filter["op"]
+        if op == "eq":
+            if field != expected:
+                return False
+            continue
+        if op == "ne":
+            if field == expected:
+                return False
+            continue
+        # Like SQL, ordering comparisons never match missing values.
+        if field is None or expected is None:
+            return False
+        try:
+            if op == "lt" and not field < expected:  # type: ignore
+                return False
+            if op == "lte" and not field <= expected:  # type: ignore
+                return False
+            if op == "gt" and not field > expected:  # type: ignore
+                return False
+            if op == "gte" and not field >= expected:  # type: ignore
+                return False
+        except TypeError:
+            return False
+    return True
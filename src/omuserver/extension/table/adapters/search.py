@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import zlib
+from typing import Dict, List, Sequence, Tuple, TypedDict
+
+from omuserver.codec import Json
+
+from .query import check_limit, extract, parse_path
+
+
+class TableSearchResult(TypedDict):
+    items: Dict[str, Json]
+    offset: int | None
+
+
+class SearchFields:
+    def __init__(self, paths: Sequence[str]) -> None:
+        self.paths = list(paths)
+        self.parts = [parse_path(path) for path in self.paths]
+        checksum = zlib.crc32("\n".join(self.paths).encode())
+        self.table = f"fts_{checksum:08x}"
+
+    def text(self, value: Json) -> str:
+        texts: List[str] = []
+        for parts in self.parts:
+            collect_text(extract(parts, value), texts)
+        return "\n".join(texts)
+
+
+def collect_text(value: Json, texts: List[str]) -> None:
+    # Fields such as message content are component trees, so every string
+    # under the configured path is indexed, not just a scalar at the path.
+    if isinstance(value, str):
+        texts.append(value)
+    elif isinstance(value, list):
+        for item in value:
+            collect_text(item, texts)
+    elif isinstance(value, dict):
+        for item in value.values():
+            collect_text(item, texts)
+
+
+def search_terms(query: str) -> List[str]:
+    return [term for term in query.split() if term]
+
+
+def match_expression(terms: List[str]) -> str:
+    # Every term is quoted so user input can never be parsed as FTS5 syntax.
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def check_page(limit: int | None, offset: int | None) -> Tuple[int, int]:
+    return check_limit(limit), max(0, offset or 0)
@@ -1,133 +1,560 @@
 from __future__ import annotations
 
+import asyncio
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict
+from typing import AsyncIterator, Callable, Dict, List, Tuple
 
-from .tableadapter import Json, TableAdapter, json
+from loguru import logger
+
+from omuserver.codec import json
+
+from ..table_config import TableConfig
+from .query import (
+    SQL_OPERATORS,
+    TableFilter,
+    TableIndex,
+    check_filters,
+    check_limit,
+    parse_indexes,
+)
+from .search import (
+    SearchFields,
+    TableSearchResult,
+    check_page,
+    match_expression,
+    search_terms,
+)
+from .tableadapter import Json, TableAdapter
+
+PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA busy_timeout = 5000",
+)
+
+
+class SqliteConnections:
+    def __init__(self, path: Path, readers: int = 2) -> None:
+        self._path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._closed = False
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix=f"sqlite-w-{path}")
+        self._readers = ThreadPoolExecutor(
+            readers, thread_name_prefix=f"sqlite-r-{path}"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self._path), check_same_thread=False)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _write[R](self, fn: Callable[[sqlite3.Connection], R]) -> R:
+        conn = self._connection()
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        return result
+
+    def _read[R](self, fn: Callable[[sqlite3.Connection], R]) -> R:
+        return fn(self._connection())
+
+    async def write[R](self, fn: Callable[[sqlite3.Connection], R]) -> R:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._write, fn)
+
+    async def read[R](self, fn: Callable[[sqlite3.Connection], R]) -> R:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._read, fn)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self) -> None:
+        self._closed = True
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
 
 
 class SqliteTableAdapter(TableAdapter):
-    def __init__(self, path: Path) -> None:
+    def __init__(self, path: Path, config: TableConfig | None = None) -> None:
         self._path = path
-        self._conn = sqlite3.connect(str(path / "data.db"))
-        self._conn.execute(
-            # index, key, value
+        self._indexes = parse_indexes((config or {}).get("indexes"))
+        search = (config or {}).get("search")
+        self._search = SearchFields(search) if search else None
+        self._retention = (config or {}).get("retention")
+        self._db = SqliteConnections(path / "data.db")
+        self._size: int | None = None
+        # Payload bytes, only tracked when retention has a byte budget.
+        self._bytes: int | None = None
+        self._migrated = False
+
+    @classmethod
+    def create(cls, path: Path, config: TableConfig | None = None) -> TableAdapter:
+        return cls(path, config)
+
+    def _enable_incremental_vacuum(self, conn: sqlite3.Connection) -> None:
+        # auto_vacuum can only be switched on an existing database by
+        # rebuilding it, which is done once when retention is first enabled.
+        row = conn.execute("PRAGMA auto_vacuum").fetchone()
+        if row[0] == 2:
+            return
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        if self._retention:
+            self._enable_incremental_vacuum(conn)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(
+            # index, key, value, created_at
             "CREATE TABLE IF NOT EXISTS data ("
             "id INTEGER PRIMARY KEY AUTOINCREMENT,"
             "key TEXT UNIQUE,"
-            "value TEXT"
+            "value TEXT,"
+            "created_at REAL"
             ")"
         )
-        self._conn.commit()
+        self._migrate_created_at(conn)
+        self._migrate_indexes(conn)
+        self._migrate_search(conn)
 
-    @classmethod
-    def create(cls, path: Path) -> TableAdapter:
-        return cls(path)
+    def _migrate_created_at(self, conn: sqlite3.Connection) -> None:
+        columns = {
+            row[1] for row in conn.execute("PRAGMA table_xinfo(data)").fetchall()
+        }
+        if "created_at" not in columns:
+            # Rows written before timestamps existed start aging from now.
+            conn.execute("ALTER TABLE data ADD COLUMN created_at REAL")
+            conn.execute("UPDATE data SET created_at = ?", (time.time(),))
+        if self._retention and self._retention.get("max_age"):
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS data_created_at ON data (created_at)"
+            )
+
+    def _migrate_indexes(self, conn: sqlite3.Connection) -> None:
+        # Secondary indexes are virtual generated columns over the JSON value,
+        # each with an index on (column, id) so filtered pages stay in order.
+        columns = {
+            row[1] for row in conn.execute("PRAGMA table_xinfo(data)").fetchall()
+        }
+        wanted: Dict[str, TableIndex] = {
+            index.column: index for index in self._indexes.values()
+        }
+        for column in columns:
+            if column.startswith("ix_") and column not in wanted:
+                logger.info(f"Dropping index column {column} of {self._path}")
+                conn.execute(f'DROP INDEX IF EXISTS "{column}"')
+                conn.execute(f'ALTER TABLE data DROP COLUMN "{column}"')
+        for column, index in wanted.items():
+            if column not in columns:
+                conn.execute(
+                    f'ALTER TABLE data ADD COLUMN "{column}" '
+                    f"GENERATED ALWAYS AS (json_extract(value, '{index.path}')) VIRTUAL"
+                )
+            conn.execute(
+                f'CREATE INDEX IF NOT EXISTS "{column}" ON data ("{column}", id)'
+            )
+
+    def _migrate_search(self, conn: sqlite3.Connection) -> None:
+        tables = {
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' "
+                "AND name LIKE 'fts\\_%' ESCAPE '\\' "
+                "AND sql LIKE 'CREATE VIRTUAL TABLE%'"
+            ).fetchall()
+        }
+        wanted = self._search.table if self._search else None
+        for table in tables:
+            if table != wanted:
+                logger.info(f"Dropping search index {table} of {self._path}")
+                conn.execute(f'DROP TABLE "{table}"')
+        if self._search is None or wanted in tables:
+            return
+        conn.execute(f'CREATE VIRTUAL TABLE "{wanted}" USING fts5(text)')
+        cursor = conn.execute("SELECT id, value FROM data ORDER BY id")
+        while rows := cursor.fetchmany(1000):
+            conn.executemany(
+                f'INSERT INTO "{wanted}" (rowid, text) VALUES (?, ?)',
+                [(id, self._search.text(json.loads(value))) for id, value in rows],
+            )
+
+    def _remove_search(self, conn: sqlite3.Connection, keys: List[str]) -> None:
+        if self._search is None:
+            return
+        conn.execute(
+            f'DELETE FROM "{self._search.table}" WHERE rowid IN '
+            f"(SELECT id FROM data WHERE key IN ({','.join('?' for _ in keys)}))",
+            keys,
+        )
 
     async def store(self) -> None:
-        self._conn.commit()
+        # Every write is committed by the writer thread, so storing only
+        # has to fold the WAL back into the database file.
+        await self._db.write(
+            lambda conn: conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        )
 
     async def load(self) -> None:
-        pass
+        if self._db.closed:
+            self._db = SqliteConnections(self._path / "data.db")
+        if not self._migrated:
+            # Migrations can rewrite the whole table, so they run on the
+            # writer thread rather than blocking the loop in __init__.
+            await self._db.write(self._migrate)
+            self._migrated = True
+        self._size = await self._db.write(self._count)
+        if self._retention and self._retention.get("max_bytes") is not None:
+            self._bytes = await self._db.write(self._payload_bytes)
 
-    async def get(self, key: str) -> Json | None:
-        cursor = self._conn.execute("SELECT value FROM data WHERE key = ?", (key,))
-        row = cursor.fetchone()
+    def _count(self, conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT COUNT(*) FROM data").fetchone()
         if row is None:
-            return None
-        return json.loads(row[0])
+            return 0
+        return row[0]
+
+    def _payload_bytes(
+        self, conn: sqlite3.Connection, keys: List[str] | None = None
+    ) -> int:
+        # The byte budget covers the stored JSON values, like the dict
+        # adapter. Pages used by the search index and secondary indexes are
+        # not counted, since removing rows could never bring them under it.
+        query = "SELECT SUM(length(CAST(value AS BLOB))) FROM data"
+        if keys is None:
+            row = conn.execute(query).fetchone()
+        else:
+            row = conn.execute(
+                f"{query} WHERE key IN ({','.join('?' for _ in keys)})", keys
+            ).fetchone()
+        return row[0] or 0
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._db.close)
+        self._size = None
+        self._bytes = None
+
+    async def get(self, key: str) -> Json | None:
+        def _get(conn: sqlite3.Connection) -> Json | None:
+            cursor = conn.execute("SELECT value FROM data WHERE key = ?", (key,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return json.loads(row[0])
+
+        return await self._db.read(_get)
 
     async def get_all(self, keys: list[str]) -> Dict[str, Json]:
-        cursor = self._conn.execute(
-            f"SELECT key, value FROM data WHERE key IN ({','.join('?' for _ in keys)})",
-            keys,
-        )
-        rows = cursor.fetchall()
-        return {row[0]: json.loads(row[1]) for row in rows}
+        def _get_all(conn: sqlite3.Connection) -> Dict[str, Json]:
+            cursor = conn.execute(
+                "SELECT key, value FROM data "
+                f"WHERE key IN ({','.join('?' for _ in keys)})",
+                keys,
+            )
+            rows = cursor.fetchall()
+            return {row[0]: json.loads(row[1]) for row in rows}
+
+        return await self._db.read(_get_all)
 
     async def set(self, key: str, value: Json) -> None:
-        self._conn.execute(
-            "INSERT OR REPLACE INTO data (key, value) VALUES (?, ?)",
-            (key, json.dumps(value)),
-        )
+        await self.set_all({key: value})
 
     async def set_all(self, items: Dict[str, Json]) -> None:
-        self._conn.executemany(
-            "INSERT OR REPLACE INTO data (key, value) VALUES (?, ?)",
-            ((key, json.dumps(value)) for key, value in items.items()),
-        )
+        now = time.time()
+        rows = [(key, json.dumps(value), now) for key, value in items.items()]
+        keys = list(items.keys())
+        search = self._search
+        texts: Dict[str, str] = {}
+        if search is not None:
+            texts = {key: search.text(value) for key, value in items.items()}
+
+        tracked = self._bytes is not None
+        payload = sum(len(row[1].encode("utf-8")) for row in rows) if tracked else 0
+
+        def _set_all(conn: sqlite3.Connection) -> Tuple[int, int]:
+            replaced = self._payload_bytes(conn, keys) if tracked else 0
+            row = conn.execute(
+                "SELECT COUNT(*) FROM data "
+                f"WHERE key IN ({','.join('?' for _ in keys)})",
+                keys,
+            ).fetchone()
+            # Upsert rather than replace so updated rows keep their id and
+            # therefore their position in the table.
+            self._remove_search(conn, keys)
+            conn.executemany(
+                "INSERT INTO data (key, value, created_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                rows,
+            )
+            if search is not None:
+                ids = conn.execute(
+                    "SELECT id, key FROM data "
+                    f"WHERE key IN ({','.join('?' for _ in keys)})",
+                    keys,
+                ).fetchall()
+                conn.executemany(
+                    f'INSERT INTO "{search.table}" (rowid, text) VALUES (?, ?)',
+                    [(id, texts[key]) for id, key in ids],
+                )
+            return len(keys) - row[0], payload - replaced
+
+        added, delta = await self._db.write(_set_all)
+        if self._size is not None:
+            self._size += added
+        if self._bytes is not None:
+            self._bytes += delta
 
     async def remove(self, key: str) -> None:
-        self._conn.execute("DELETE FROM data WHERE key = ?", (key,))
+        await self.remove_all([key])
 
     async def remove_all(self, keys: list[str]) -> None:
-        self._conn.execute(
-            f"DELETE FROM data WHERE key IN ({','.join('?' for _ in keys)})",
-            keys,
-        )
+        tracked = self._bytes is not None
+
+        def _remove_all(conn: sqlite3.Connection) -> Tuple[int, int]:
+            payload = self._payload_bytes(conn, keys) if tracked else 0
+            self._remove_search(conn, keys)
+            removed = conn.execute(
+                f"DELETE FROM data WHERE key IN ({','.join('?' for _ in keys)})",
+                keys,
+            ).rowcount
+            return removed, payload
+
+        removed, payload = await self._db.write(_remove_all)
+        if self._size is not None:
+            self._size -= removed
+        if self._bytes is not None:
+            self._bytes -= payload
 
     async def fetch(
         self, before: int | None, after: int | None, cursor: str | None
     ) -> Dict[str, Json]:
+        return await self._db.read(
+            lambda conn: self._fetch(conn, before, after, cursor)
+        )
+
+    def _fetch(
+        self,
+        conn: sqlite3.Connection,
+        before: int | None,
+        after: int | None,
+        cursor: str | None,
+    ) -> Dict[str, Json]:
+        cursor_id: int | None = None
         if cursor is not None:
-            _cursor = self._conn.execute("SELECT id FROM data WHERE key = ?", (cursor,))
+            _cursor = conn.execute("SELECT id FROM data WHERE key = ?", (cursor,))
             row = _cursor.fetchone()
             if row is None:
                 raise ValueError(f"Cursor {cursor} not found")
-            cursor = row[0]
+            cursor_id = row[0]
 
         items = {}
         if before is not None:
-            if cursor is None:
-                _cursor = self._conn.execute(
+            if cursor_id is None:
+                _cursor = conn.execute(
                     "SELECT id, key, value FROM data ORDER BY id DESC LIMIT ?",
                     (before,),
                 )
             else:
-                _cursor = self._conn.execute(
-                    "SELECT id, key, value FROM data WHERE id <= ? ORDER BY id DESC LIMIT ?",
-                    (cursor, before),
+                _cursor = conn.execute(
+                    "SELECT id, key, value FROM data WHERE id <= ? "
+                    "ORDER BY id DESC LIMIT ?",
+                    (cursor_id, before),
                 )
             items.update(
                 {row[0]: (row[1], json.loads(row[2])) for row in _cursor.fetchall()}
             )
         if after is not None:
-            if cursor is None:
-                _cursor = self._conn.execute(
+            if cursor_id is None:
+                _cursor = conn.execute(
                     "SELECT id, key, value FROM data ORDER BY id LIMIT ?",
                     (after,),
                 )
             else:
-                _cursor = self._conn.execute(
+                _cursor = conn.execute(
                     "SELECT id, key, value FROM data WHERE id >= ? ORDER BY id LIMIT ?",
-                    (cursor, after),
+                    (cursor_id, after),
                 )
             items.update(
                 {row[0]: (row[1], json.loads(row[2])) for row in _cursor.fetchall()}
             )
         return {key: value for _, (key, value) in sorted(items.items(), reverse=True)}
 
+    async def iterate(self, batch_size: int = 256) -> AsyncIterator[Tuple[str, Json]]:
+        def _page(conn: sqlite3.Connection, last_id: int) -> List[Tuple[int, str, str]]:
+            return conn.execute(
+                "SELECT id, key, value FROM data WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size),
+            ).fetchall()
+
+        last_id = 0
+        while True:
+            rows = await self._db.read(
+                lambda conn, last_id=last_id: _page(conn, last_id)
+            )
+            if len(rows) == 0:
+                break
+            last_id = rows[-1][0]
+            for _, key, value in rows:
+                yield key, json.loads(value)
+            if len(rows) < batch_size:
+                break
+
+    async def query(
+        self, filters: List[TableFilter], limit: int | None, cursor: str | None
+    ) -> Dict[str, Json]:
+        check_filters(self._indexes, filters)
+        limit = check_limit(limit)
+
+        def _query(conn: sqlite3.Connection) -> Dict[str, Json]:
+            clauses: List[str] = []
+            params: List[Json] = []
+            for filter in filters:
+                column = self._indexes[filter["index"]].column
+                clauses.append(f'"{column}" {SQL_OPERATORS[filter["op"]]} ?')
+                params.append(filter["value"])
+            if cursor is not None:
+                row = conn.execute(
+                    "SELECT id FROM data WHERE key = ?", (cursor,)
+                ).fetchone()
+                if row is None:
+                    raise ValueError(f"Cursor {cursor} not found")
+                clauses.append("id > ?")
+                params.append(row[0])
+            where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+            rows = conn.execute(
+                f"SELECT key, value FROM data {where}ORDER BY id LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+            return {row[0]: json.loads(row[1]) for row in rows}
+
+        return await self._db.read(_query)
+
+    async def search(
+        self, query: str, limit: int | None, offset: int | None
+    ) -> TableSearchResult:
+        search = self._search
+        if search is None:
+            raise ValueError("Table has no search fields configured")
+        terms = search_terms(query)
+        limit, offset = check_page(limit, offset)
+        if len(terms) == 0:
+            return TableSearchResult(items={}, offset=None)
+
+        def _search(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
+            # One extra row tells whether there is a next page.
+            return conn.execute(
+                "SELECT data.key, data.value "
+                f'FROM "{search.table}" JOIN data ON data.id = "{search.table}".rowid '
+                f'WHERE "{search.table}" MATCH ? '
+                f'ORDER BY "{search.table}".rank, data.id DESC LIMIT ? OFFSET ?',
+                (match_expression(terms), limit + 1, offset),
+            ).fetchall()
+
+        rows = await self._db.read(_search)
+        return TableSearchResult(
+            items={key: json.loads(value) for key, value in rows[:limit]},
+            offset=offset + limit if len(rows) > limit else None,
+        )
+
+    async def expired(self, limit: int) -> List[str]:
+        retention = self._retention
+        if not retention:
+            return []
+        # Row and byte budgets use the tracked totals instead of counting
+        # the table again every round.
+        excess_rows = 0
+        max_rows = retention.get("max_rows")
+        if max_rows is not None:
+            excess_rows = await self.size() - max_rows
+        excess_bytes = 0
+        max_bytes = retention.get("max_bytes")
+        if max_bytes is not None and self._bytes is not None:
+            excess_bytes = self._bytes - max_bytes
+
+        def _expired(conn: sqlite3.Connection) -> List[str]:
+            keys: List[str] = []
+            if excess_rows > 0 or excess_bytes > 0:
+                remaining = excess_bytes
+                for key, size in conn.execute(
+                    "SELECT key, length(CAST(value AS BLOB)) FROM data "
+                    "ORDER BY id LIMIT ?",
+                    (limit,),
+                ):
+                    if len(keys) >= excess_rows and remaining <= 0:
+                        break
+                    keys.append(key)
+                    remaining -= size
+            max_age = retention.get("max_age")
+            if max_age is not None:
+                keys.extend(
+                    row[0]
+                    for row in conn.execute(
+                        "SELECT key FROM data WHERE created_at < ? "
+                        "ORDER BY id LIMIT ?",
+                        (time.time() - max_age, limit),
+                    ).fetchall()
+                )
+            return list(dict.fromkeys(keys))[:limit]
+
+        return await self._db.read(_expired)
+
+    async def compact(self) -> None:
+        await self._db.write(
+            lambda conn: conn.execute("PRAGMA incremental_vacuum").fetchall()
+        )
+
     async def first(self) -> str | None:
-        _cursor = self._conn.execute("SELECT key FROM data ORDER BY id LIMIT 1")
-        row = _cursor.fetchone()
-        if row is None:
-            return None
-        return row[0]
+        def _first(conn: sqlite3.Connection) -> str | None:
+            row = conn.execute("SELECT key FROM data ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            return row[0]
+
+        return await self._db.read(_first)
 
     async def last(self) -> str | None:
-        _cursor = self._conn.execute("SELECT key FROM data ORDER BY id DESC LIMIT 1")
-        row = _cursor.fetchone()
-        if row is None:
-            return None
-        return row[0]
+        def _last(conn: sqlite3.Connection) -> str | None:
+            row = conn.execute(
+                "SELECT key FROM data ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            return row[0]
+
+        return await self._db.read(_last)
 
     async def clear(self) -> None:
-        self._conn.execute("DELETE FROM data")
+        def _clear(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM data")
+            if self._search is not None:
+                conn.execute(f'DELETE FROM "{self._search.table}"')
+
+        await self._db.write(_clear)
+        self._size = 0
+        if self._bytes is not None:
+            self._bytes = 0
 
     async def size(self) -> int:
-        _cursor = self._conn.execute("SELECT COUNT(*) FROM data")
-        row = _cursor.fetchone()
-        if row is None:
-            return 0
-        return row[0]
+        if self._size is None:
+            self._size = await self._db.write(self._count)
+        return self._size
@@ -1,27 +1,21 @@
 from __future__ import annotations
 
 import abc
-import json as _json
 from pathlib import Path
-from typing import Dict, List
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Tuple
 
-type Json = str | int | float | bool | None | Dict[str, Json] | List[Json]
+from omuserver.codec import Json
 
-
-class json:
-    @staticmethod
-    def loads(data: str) -> Json:
-        return _json.loads(data)
-
-    @staticmethod
-    def dumps(data: Json) -> str:
-        return _json.dumps(data, ensure_ascii=False)
+if TYPE_CHECKING:
+    from ..table_config import TableConfig
+    from .query import TableFilter
+    from .search import TableSearchResult
 
 
 class TableAdapter(abc.ABC):
     @classmethod
     @abc.abstractmethod
-    def create(cls, path: Path) -> TableAdapter:
+    def create(cls, path: Path, config: TableConfig | None = None) -> TableAdapter:
         pass
 
     @abc.abstractmethod
@@ -32,6 +26,10 @@ class TableAdapter(abc.ABC):
     async def load(self):
         pass
 
+    @abc.abstractmethod
+    async def close(self) -> None:
+        pass
+
     @abc.abstractmethod
     async def get(self, key: str) -> Json | None:
         pass
@@ -62,6 +60,30 @@ class TableAdapter(abc.ABC):
     ) -> Dict[str, Json]:
         pass
 
+    @abc.abstractmethod
+    def iterate(self, batch_size: int = 256) -> AsyncIterator[Tuple[str, Json]]:
+        pass
+
+    @abc.abstractmethod
+    async def query(
+        self, filters: List[TableFilter], limit: int | None, cursor: str | None
+    ) -> Dict[str, Json]:
+        pass
+
+    @abc.abstractmethod
+    async def search(
+        self, query: str, limit: int | None, offset: int | None
+    ) -> TableSearchResult:
+        pass
+
+    @abc.abstractmethod
+    async def expired(self, limit: int) -> List[str]:
+        pass
+
+    @abc.abstractmethod
+    async def compact(self) -> None:
+        pass
+
     @abc.abstractmethod
     async def first(self) -> str | None:
         pass
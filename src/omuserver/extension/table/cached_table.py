@@ -1,16 +1,26 @@
 from __future__ import annotations
 
 import asyncio
-from typing import TYPE_CHECKING, AsyncIterator, Dict, List
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Tuple
 
+from loguru import logger
 from omu.extension.table.model import TableInfo
 from omu.extension.table.table_extension import TableProxyEvent, TableProxyEventData
 
+from omuserver.codec import json
 from omuserver.session import SessionListener
 
+from .adapters.query import TableFilter
 from .adapters.tableadapter import Json, TableAdapter
 from .server_table import ServerTable, TableListener
 from .session_table_handler import SessionTableListener
+from .table_batch import BatchOperation, TableBatch
+from .table_cache import CacheStatsJson, TableCache, create_cache
+from .table_config import TableConfig
+
+DEFAULT_IDLE_TIMEOUT = 300
 
 if TYPE_CHECKING:
     from omu.interface import Serializable
@@ -26,61 +36,166 @@ class CachedTable[T](ServerTable[T], SessionListener):
         info: TableInfo,
         serializer: Serializable[T, Json],
         table: TableAdapter,
+        config: TableConfig | None = None,
     ):
         self._server = server
         self._info = info
         self._serializer = serializer
         self._table = table
-        self._cache: Dict[str, T] = {}
+        self._config = config or TableConfig()
         self._use_cache = info.cache or False
-        self._cache: Dict[str, T] = {}
         self._cache_size = info.cache_size or 512
-        self._listeners: list[TableListener[T]] = []
-        self._sessions: Dict[Session, SessionTableListener] = {}
+        self._cache: TableCache[T] = create_cache(
+            self._config.get("cache_policy", "lru"),
+            self._cache_size,
+            self._sizeof,
+            self._config.get("cache_bytes"),
+        )
+        self._session_listener = SessionTableListener(info, serializer)
+        self._listeners: list[TableListener[T]] = [self._session_listener]
         self._proxy_sessions: List[Session] = []
         self._changed = False
         self._loaded = False
         self._key = 0
         self._save_task: asyncio.Task | None = None
+        self._retention_task: asyncio.Task | None = None
+        self._load_lock = asyncio.Lock()
+        self._users = 0
+        self._unloading = False
+        self._unloads = 0
+        self._last_used = time.monotonic()
+        self._batch: TableBatch[T | None] | None = None
+        if self._config.get("batch"):
+            self._batch = TableBatch(self._write_batch, self._config["batch"])
 
     async def store(self) -> None:
         if not self._loaded:
             raise Exception("Table not loaded")
+        await self.flush()
         if not self._changed:
             return
         self._changed = False
-        await self._table.store()
+        try:
+            await self._table.store()
+        except BaseException:
+            self._changed = True
+            raise
 
     async def load(self) -> None:
-        if self._changed:
-            raise Exception("Table not stored")
-        if self._loaded:
+        if self._loaded and not self._unloading:
             return
-        await self._table.load()
-        self._loaded = True
+        async with self._load_lock:
+            if self._loaded:
+                return
+            if self._changed:
+                raise Exception("Table not stored")
+            await self._table.load()
+            self._loaded = True
+            self._last_used = time.monotonic()
+        if self._config.get("retention") and self._retention_task is None:
+            self._retention_task = asyncio.create_task(self.retention_task())
+
+    async def close(self) -> None:
+        self._stop_retention()
+        try:
+            if self._batch is not None:
+                await self._batch.close()
+        finally:
+            if self._loaded:
+                await self.store()
+            await self._table.close()
+
+    async def unload_if_idle(self) -> bool:
+        timeout = self._config.get("idle_timeout", DEFAULT_IDLE_TIMEOUT)
+        if not timeout or not self._unloadable(timeout):
+            return False
+        async with self._load_lock:
+            if not self._unloadable(timeout):
+                return False
+            # Operations starting from here wait in load() for the lock and
+            # load the table again once it is unloaded.
+            self._unloading = True
+            try:
+                self._stop_retention()
+                await self.store()
+                await self._table.close()
+                self._cache.clear()
+                self._loaded = False
+                self._unloads += 1
+            finally:
+                self._unloading = False
+        logger.info(f"Unloaded idle table {self._info.key()}")
+        return True
+
+    def _unloadable(self, timeout: float) -> bool:
+        return (
+            self._loaded
+            and self._users == 0
+            and not self._session_listener.sessions
+            and not self._proxy_sessions
+            and time.monotonic() - self._last_used >= timeout
+        )
+
+    def _stop_retention(self) -> None:
+        if self._retention_task is not None:
+            self._retention_task.cancel()
+            self._retention_task = None
+
+    @asynccontextmanager
+    async def _use(self) -> AsyncIterator[None]:
+        # Tables are loaded on first access. Operations in progress count as
+        # users so the table is never unloaded underneath them.
+        self._users += 1
+        try:
+            self._last_used = time.monotonic()
+            await self.load()
+            yield
+        finally:
+            self._users -= 1
+            self._last_used = time.monotonic()
+
+    async def flush(self) -> None:
+        # Reads flush pending batched writes first so that they always see
+        # the writes made before them.
+        if self._batch is not None:
+            await self._batch.flush()
+
+    async def _write_batch(
+        self, operation: BatchOperation, items: Dict[str, T | None]
+    ) -> None:
+        if operation == "add":
+            await self._add(items)  # type: ignore
+        elif operation == "update":
+            await self._update(items)  # type: ignore
+        else:
+            await self._remove(list(items.keys()))
 
     @property
     def cache(self) -> Dict[str, T]:
-        return self._cache
+        return self._cache.items
+
+    @property
+    def cache_stats(self) -> CacheStatsJson:
+        return self._cache.to_json()
+
+    def _sizeof(self, item: T) -> int:
+        return len(json.dumps_bytes(self._serializer.serialize(item)))
 
     @property
     def serializer(self) -> Serializable[T, Json]:
         return self._serializer
 
     def attach_session(self, session: Session) -> None:
-        if session in self._sessions:
+        if session in self._session_listener.sessions:
             return
-        handler = SessionTableListener(self._info, session, self._serializer)
-        self._sessions[session] = handler
-        self.add_listener(handler)
+        self._session_listener.add_session(session)
         session.add_listener(self)
 
     def detach_session(self, session: Session) -> None:
         if session in self._proxy_sessions:
             self._proxy_sessions.remove(session)
-        if session in self._sessions:
-            handler = self._sessions.pop(session)
-            self.remove_listener(handler)
+        if session in self._session_listener.sessions:
+            self._session_listener.remove_session(session)
 
     async def on_disconnected(self, session: Session) -> None:
         self.detach_session(session)
@@ -89,31 +204,48 @@ class CachedTable[T](ServerTable[T], SessionListener):
         self._proxy_sessions.append(session)
 
     async def get(self, key: str) -> T | None:
-        if key in self._cache:
-            return self._cache[key]
-        data = await self._table.get(key)
-        if data is None:
-            return None
-        item = self._serializer.deserialize(data)
-        await self.update_cache({key: item})
-        return item
+        async with self._use():
+            await self.flush()
+            if self._use_cache:
+                item = self._cache.get(key)
+                if item is not None:
+                    return item
+            data = await self._table.get(key)
+            if data is None:
+                return None
+            item = self._serializer.deserialize(data)
+            await self.update_cache({key: item})
+            return item
 
     async def get_all(self, keys: List[str]) -> Dict[str, T]:
-        items = {}
-        for key in tuple(keys):
-            if key in self._cache:
-                items[key] = self._cache[key]
-                keys.remove(key)
-        if len(keys) == 0:
+        async with self._use():
+            await self.flush()
+            items: Dict[str, T] = {}
+            missing: List[str] = []
+            for key in keys:
+                item = self._cache.get(key) if self._use_cache else None
+                if item is None:
+                    missing.append(key)
+                else:
+                    items[key] = item
+            if len(missing) == 0:
+                return items
+            data = await self._table.get_all(missing)
+            fetched = {
+                key: self._serializer.deserialize(value) for key, value in data.items()
+            }
+            await self.update_cache(fetched)
+            items.update(fetched)
             return items
-        data = await self._table.get_all(keys)
-        for key, value in data.items():
-            item = self._serializer.deserialize(value)
-            items[key] = item
-        await self.update_cache(items)
-        return items
 
     async def add(self, items: Dict[str, T]) -> None:
+        async with self._use():
+            if self._batch is not None:
+                await self._batch.push("add", items)
+                return
+            await self._add(items)
+
+    async def _add(self, items: Dict[str, T]) -> None:
         if len(self._proxy_sessions) > 0:
             await self.send_proxy_event(items)
             return
@@ -141,32 +273,44 @@ class CachedTable[T](ServerTable[T], SessionListener):
         )
 
     async def proxy(self, session: Session, key: int, items: Dict[str, T]) -> int:
-        if key != self._key:
-            return 0
-        if session not in self._proxy_sessions:
-            raise ValueError("Session not in proxy sessions")
-        index = self._proxy_sessions.index(session)
-        if index == len(self._proxy_sessions) - 1:
-            await self._table.set_all(
-                {key: self._serializer.serialize(value) for key, value in items.items()}
+        async with self._use():
+            if key != self._key:
+                return 0
+            if session not in self._proxy_sessions:
+                raise ValueError("Session not in proxy sessions")
+            index = self._proxy_sessions.index(session)
+            if index == len(self._proxy_sessions) - 1:
+                await self.flush()
+                await self._table.set_all(
+                    {
+                        key: self._serializer.serialize(value)
+                        for key, value in items.items()
+                    }
+                )
+                for listener in self._listeners:
+                    await listener.on_add(items)
+                await self.update_cache(items)
+                self.mark_changed()
+                return 0
+            session = self._proxy_sessions[index + 1]
+            await session.send(
+                TableProxyEvent,
+                TableProxyEventData(
+                    items=items,
+                    type=self._info.key(),
+                    key=self._key,
+                ),
             )
-            for listener in self._listeners:
-                await listener.on_add(items)
-            await self.update_cache(items)
-            self.mark_changed()
-            return 0
-        session = self._proxy_sessions[index + 1]
-        await session.send(
-            TableProxyEvent,
-            TableProxyEventData(
-                items=items,
-                type=self._info.key(),
-                key=self._key,
-            ),
-        )
-        return self._key
+            return self._key
 
     async def update(self, items: Dict[str, T]) -> None:
+        async with self._use():
+            if self._batch is not None:
+                await self._batch.push("update", items)
+                return
+            await self._update(items)
+
+    async def _update(self, items: Dict[str, T]) -> None:
         await self._table.set_all(
             {key: self._serializer.serialize(value) for key, value in items.items()}
         )
@@ -176,24 +320,32 @@ class CachedTable[T](ServerTable[T], SessionListener):
         self.mark_changed()
 
     async def remove(self, items: list[str]) -> None:
+        async with self._use():
+            if self._batch is not None:
+                await self._batch.push("remove", dict.fromkeys(items))
+                return
+            await self._remove(items)
+
+    async def _remove(self, items: list[str]) -> None:
         data = await self._table.get_all(items)
         removed = {
             key: self._serializer.deserialize(value) for key, value in data.items()
         }
         await self._table.remove_all(items)
         for key in items:
-            if key in self._cache:
-                del self._cache[key]
+            self._cache.remove(key)
         for listener in self._listeners:
             await listener.on_remove(removed)
         self.mark_changed()
 
     async def clear(self) -> None:
-        await self._table.clear()
-        for listener in self._listeners:
-            await listener.on_clear()
-        self._cache.clear()
-        self.mark_changed()
+        async with self._use():
+            await self.flush()
+            await self._table.clear()
+            for listener in self._listeners:
+                await listener.on_clear()
+            self._cache.clear()
+            self.mark_changed()
 
     async def fetch(
         self,
@@ -201,23 +353,70 @@ class CachedTable[T](ServerTable[T], SessionListener):
         after: str | None = None,
         cursor: str | None = None,
     ) -> Dict[str, T]:
-        items = await self._table.fetch(before, after, cursor)
-        return {
-            key: self._serializer.deserialize(value) for key, value in items.items()
-        }
-
-    async def iterator(self) -> AsyncIterator[T]:
-        cursor: str | None = None
+        async with self._use():
+            await self.flush()
+            items = await self._table.fetch(before, after, cursor)
+            return {
+                key: self._serializer.deserialize(value) for key, value in items.items()
+            }
+
+    async def query(
+        self,
+        filters: List[TableFilter],
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> Dict[str, T]:
+        async with self._use():
+            await self.flush()
+            items = await self._table.query(filters, limit, cursor)
+            return {
+                key: self._serializer.deserialize(value) for key, value in items.items()
+            }
+
+    async def search(
+        self,
+        query: str,
+        limit: int | None = None,
+        offset: int | None = None,
+    ) -> Tuple[Dict[str, T], int | None]:
+        async with self._use():
+            await self.flush()
+            result = await self._table.search(query, limit, offset)
+            items = {
+                key: self._serializer.deserialize(value)
+                for key, value in result["items"].items()
+            }
+            return items, result["offset"]
+
+    async def iterator(self, batch_size: int | None = None) -> AsyncIterator[T]:
+        # Users are counted per batch rather than for the whole iteration, so
+        # a consumer that stops without closing the iterator does not keep
+        # the table loaded.
+        batch_size = batch_size or self._cache_size
+        async with self._use():
+            await self.flush()
+            unloads = self._unloads
+            rows = aiter(self._table.iterate(batch_size))
         while True:
-            items = await self.fetch(self._cache_size, cursor)
-            if len(items) == 0:
-                break
-            for item in items.values():
+            batch: List[T] = []
+            async with self._use():
+                if self._unloads != unloads:
+                    raise RuntimeError(
+                        f"Table {self._info.key()} was unloaded during iteration"
+                    )
+                async for _, value in rows:
+                    batch.append(self._serializer.deserialize(value))
+                    if len(batch) >= batch_size:
+                        break
+            if not batch:
+                return
+            for item in batch:
                 yield item
-            *_, cursor = items.keys()
 
     async def size(self) -> int:
-        return len(self._cache)
+        async with self._use():
+            await self.flush()
+            return await self._table.size()
 
     def add_listener(self, listener: TableListener[T]) -> None:
         self._listeners.append(listener)
@@ -226,9 +425,46 @@ class CachedTable[T](ServerTable[T], SessionListener):
         self._listeners.remove(listener)
 
     async def save_task(self) -> None:
-        while self._changed:
-            await self.store()
-            await asyncio.sleep(30)
+        try:
+            while self._changed:
+                try:
+                    await self.store()
+                except Exception as e:
+                    logger.opt(exception=e).error(
+                        f"Failed to store table {self._info.key()}"
+                    )
+                await asyncio.sleep(30)
+        finally:
+            self._save_task = None
+
+    async def retention_task(self) -> None:
+        interval = self._config.get("retention", {}).get("interval", 60)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.enforce_retention()
+            except Exception as e:
+                logger.opt(exception=e).error(
+                    f"Failed to enforce retention on {self._info.key()}"
+                )
+
+    async def enforce_retention(self) -> int:
+        if not self._loaded:
+            return 0
+        batch_size = self._config.get("retention", {}).get("batch_size", 500)
+        async with self._use():
+            await self.flush()
+            removed = 0
+            while True:
+                keys = await self._table.expired(batch_size)
+                if len(keys) == 0:
+                    break
+                await self._remove(keys)
+                removed += len(keys)
+            if removed > 0:
+                await self._table.compact()
+                logger.info(f"Removed {removed} expired items from {self._info.key()}")
+            return removed
 
     def mark_changed(self) -> None:
         self._changed = True
@@ -236,11 +472,9 @@ class CachedTable[T](ServerTable[T], SessionListener):
             self._save_task = asyncio.create_task(self.save_task())
 
     async def update_cache(self, items: Dict[str, T]) -> None:
-        if not self.cache:
+        if not self._use_cache:
             return
         for key, item in items.items():
-            self._cache[key] = item
-            if len(self._cache) > self._cache_size:
-                del self._cache[next(iter(self._cache))]
+            self._cache.put(key, item)
         for listener in self._listeners:
-            await listener.on_cache_update(self._cache)
+            await listener.on_cache_update(self._cache.items)
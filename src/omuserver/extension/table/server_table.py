@@ -1,13 +1,16 @@
 from __future__ import annotations
 
 import abc
-from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Union
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Tuple, Union
 
 if TYPE_CHECKING:
     from omu.interface import Serializable
 
     from omuserver.session import Session
 
+    from .adapters.query import TableFilter
+    from .table_cache import CacheStatsJson
+
 type Json = Union[str, int, float, bool, None, Dict[str, Json], List[Json]]
 
 
@@ -22,6 +25,11 @@ class ServerTable[T](abc.ABC):
     def cache(self) -> Dict[str, T]:
         ...
 
+    @property
+    @abc.abstractmethod
+    def cache_stats(self) -> CacheStatsJson:
+        ...
+
     @abc.abstractmethod
     def attach_session(self, session: Session) -> None:
         ...
@@ -46,6 +54,18 @@ class ServerTable[T](abc.ABC):
     async def load(self) -> None:
         ...
 
+    @abc.abstractmethod
+    async def close(self) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def unload_if_idle(self) -> bool:
+        ...
+
+    @abc.abstractmethod
+    async def flush(self) -> None:
+        ...
+
     @abc.abstractmethod
     async def get(self, key: str) -> T | None:
         ...
@@ -80,7 +100,25 @@ class ServerTable[T](abc.ABC):
         ...
 
     @abc.abstractmethod
-    async def iterator(self) -> AsyncIterator[T]:
+    async def query(
+        self,
+        filters: List[TableFilter],
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> Dict[str, T]:
+        ...
+
+    @abc.abstractmethod
+    async def search(
+        self,
+        query: str,
+        limit: int | None = None,
+        offset: int | None = None,
+    ) -> Tuple[Dict[str, T], int | None]:
+        ...
+
+    @abc.abstractmethod
+    def iterator(self, batch_size: int | None = None) -> AsyncIterator[T]:
         ...
 
     @abc.abstractmethod
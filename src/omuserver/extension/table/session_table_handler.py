@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Dict
+from typing import TYPE_CHECKING, Any, Dict, List
 
 from omu.extension.table.table_extension import (
     TableEventData,
@@ -11,9 +11,12 @@ from omu.extension.table.table_extension import (
     TableItemUpdateEvent,
 )
 
+from omuserver.session import EventFrame
+
 from .server_table import TableListener
 
 if TYPE_CHECKING:
+    from omu.event import EventType
     from omu.extension.table.model import TableInfo
     from omu.interface import Serializable
 
@@ -21,63 +24,58 @@ if TYPE_CHECKING:
 
 
 class SessionTableListener(TableListener):
-    def __init__(
-        self, info: TableInfo, session: Session, serializer: Serializable
-    ) -> None:
+    def __init__(self, info: TableInfo, serializer: Serializable) -> None:
         self._info = info
-        self._session = session
         self._serializer = serializer
+        self._sessions: List[Session] = []
+
+    @property
+    def sessions(self) -> List[Session]:
+        return self._sessions
+
+    def add_session(self, session: Session) -> None:
+        self._sessions.append(session)
+
+    def remove_session(self, session: Session) -> None:
+        self._sessions.remove(session)
+
+    async def broadcast[T](self, type: EventType[Any, T], data: T) -> None:
+        frame = EventFrame(type, data)
+        for session in tuple(self._sessions):
+            if session.closed:
+                continue
+            await session.send_frame(frame)
+
+    def _serialize_items(self, items: Dict[str, Any]) -> TableItemsEventData:
+        return TableItemsEventData(
+            items={
+                key: self._serializer.serialize(value) for key, value in items.items()
+            },
+            type=self._info.key(),
+        )
 
     async def on_add(self, items: Dict[str, Any]) -> None:
-        if self._session.closed:
+        if not self._sessions:
             return
-        await self._session.send(
-            TableItemAddEvent,
-            TableItemsEventData(
-                items={
-                    key: self._serializer.serialize(value)
-                    for key, value in items.items()
-                },
-                type=self._info.key(),
-            ),
-        )
+        await self.broadcast(TableItemAddEvent, self._serialize_items(items))
 
     async def on_update(self, items: Dict[str, Any]) -> None:
-        if self._session.closed:
+        if not self._sessions:
             return
-        await self._session.send(
-            TableItemUpdateEvent,
-            TableItemsEventData(
-                items={
-                    key: self._serializer.serialize(value)
-                    for key, value in items.items()
-                },
-                type=self._info.key(),
-            ),
-        )
+        await self.broadcast(TableItemUpdateEvent, self._serialize_items(items))
 
     async def on_remove(self, items: Dict[str, Any]) -> None:
-        if self._session.closed:
+        if not self._sessions:
             return
-        await self._session.send(
-            TableItemRemoveEvent,
-            TableItemsEventData(
-                items={
-                    key: self._serializer.serialize(value)
-                    for key, value in items.items()
-                },
-                type=self._info.key(),
-            ),
-        )
+        await self.broadcast(TableItemRemoveEvent, self._serialize_items(items))
 
     async def on_clear(self) -> None:
-        if self._session.closed:
+        if not self._sessions:
             return
-        await self._session.send(
-            TableItemClearEvent, TableEventData(type=self._info.key())
-        )
+        await self.broadcast(TableItemClearEvent, TableEventData(type=self._info.key()))
 
     def __repr__(self) -> str:
         return (
-            f"<SessionTableHandler info={self._info.key()} session={self._session.app}>"
+            f"<SessionTableHandler info={self._info.key()} "
+            f"sessions={len(self._sessions)}>"
         )
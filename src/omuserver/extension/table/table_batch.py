@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Literal, Tuple, TypedDict
+
+from loguru import logger
+
+type BatchOperation = Literal["add", "update", "remove"]
+
+DEFAULT_BATCH_WINDOW = 0.01
+DEFAULT_BATCH_MAX_ITEMS = 500
+
+
+class BatchPolicy(TypedDict, total=False):
+    window: float
+    max_items: int
+
+
+class TableBatch[T]:
+    """Collects writes for a short window and hands them to `write` as runs.
+
+    Consecutive operations of the same kind are merged into one run, so a
+    burst of adds becomes a single adapter write and a single event per
+    listener. A change of kind starts a new run, which keeps the order in
+    which adds, updates and removes were made.
+
+    A failed write is raised from `flush`. Writes flushed by the timer have
+    no caller waiting on them, so their failure is logged and raised from
+    the next `flush` instead.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[BatchOperation, Dict[str, T]], Awaitable[None]],
+        policy: BatchPolicy,
+    ) -> None:
+        self._write = write
+        self._window = policy.get("window", DEFAULT_BATCH_WINDOW)
+        self._max_items = policy.get("max_items", DEFAULT_BATCH_MAX_ITEMS)
+        self._runs: List[Tuple[BatchOperation, Dict[str, T]]] = []
+        self._pending = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self._error: Exception | None = None
+
+    async def push(self, operation: BatchOperation, items: Dict[str, T]) -> None:
+        if not items:
+            return
+        if self._runs and self._runs[-1][0] == operation:
+            self._runs[-1][1].update(items)
+        else:
+            self._runs.append((operation, dict(items)))
+        self._pending += len(items)
+        if self._pending >= self._max_items:
+            await self.flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self._window, self._schedule_flush)
+
+    def _schedule_flush(self) -> None:
+        self._timer = None
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_task())
+
+    async def _flush_task(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.opt(exception=e).error("Failed to write batched table changes")
+            self._error = e
+        finally:
+            self._task = None
+
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # With nothing pending a flush in progress is still waited for, so
+        # that reads see the writes made before them.
+        if not self._runs and self._error is None and not self._lock.locked():
+            return
+        async with self._lock:
+            runs, self._runs, self._pending = self._runs, [], 0
+            error, self._error = self._error, None
+            # The remaining runs are still written after a failure so that a
+            # single bad run does not lose the writes that came after it.
+            for operation, items in runs:
+                try:
+                    await self._write(operation, items)
+                except Exception as e:
+                    error = error or e
+            if error is not None:
+                raise error
+
+    async def close(self) -> None:
+        if self._task is not None:
+            await self._task
+        await self.flush()
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import abc
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Literal, Tuple, TypedDict
+
+type CachePolicy = Literal["lru", "lfu", "bytes"]
+
+
+class CacheStatsJson(TypedDict):
+    policy: CachePolicy
+    size: int
+    capacity: int
+    bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    rejections: int
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    rejections: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+
+class TableCache[T](abc.ABC):
+    policy: CachePolicy
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = max(1, capacity)
+        self._items: OrderedDict[str, T] = OrderedDict()
+        self.stats = CacheStats()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def items(self) -> Dict[str, T]:
+        return self._items
+
+    @property
+    def bytes(self) -> int:
+        return 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str) -> T | None:
+        item = self._items.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self._items.move_to_end(key)
+        self._on_hit(key)
+        return item
+
+    def put(self, key: str, item: T) -> None:
+        if key in self._items:
+            self._remove(key)
+        elif not self._admit(key):
+            self.stats.rejections += 1
+            return
+        self._items[key] = item
+        self._on_put(key, item)
+        while self._overflowing():
+            victim = next(iter(self._items))
+            self._remove(victim)
+            self.stats.evictions += 1
+            if victim == key:
+                break
+
+    def remove(self, key: str) -> None:
+        if key in self._items:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def to_json(self) -> CacheStatsJson:
+        return CacheStatsJson(
+            policy=self.policy,
+            size=len(self._items),
+            capacity=self._capacity,
+            bytes=self.bytes,
+            hits=self.stats.hits,
+            misses=self.stats.misses,
+            evictions=self.stats.evictions,
+            rejections=self.stats.rejections,
+        )
+
+    def _remove(self, key: str) -> None:
+        del self._items[key]
+
+    def _overflowing(self) -> bool:
+        return len(self._items) > self._capacity
+
+    def _admit(self, key: str) -> bool:
+        return True
+
+    def _on_hit(self, key: str) -> None:
+        ...
+
+    def _on_put(self, key: str, item: T) -> None:
+        ...
+
+
+class LRUCache[T](TableCache[T]):
+    policy = "lru"
+
+
+class FrequencySketch:
+    """Count-min sketch of 4-bit counters that halves itself periodically."""
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, capacity: int) -> None:
+        width = 16
+        while width < capacity * 4:
+            width <<= 1
+        self._mask = width - 1
+        self._rows: List[List[int]] = [[0] * width for _ in range(self.DEPTH)]
+        self._sample_size = capacity * 10
+        self._additions = 0
+
+    def _indexes(self, key: str) -> Iterator[Tuple[int, int]]:
+        hashed = hash(key)
+        for depth in range(self.DEPTH):
+            hashed = (hashed * 0x9E3779B1 + depth) & 0xFFFFFFFFFFFFFFFF
+            yield depth, (hashed >> 16) & self._mask
+
+    def increment(self, key: str) -> None:
+        for depth, index in self._indexes(key):
+            if self._rows[depth][index] < self.MAX_COUNT:
+                self._rows[depth][index] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._reset()
+
+    def frequency(self, key: str) -> int:
+        return min(self._rows[depth][index] for depth, index in self._indexes(key))
+
+    def _reset(self) -> None:
+        self._additions //= 2
+        for row in self._rows:
+            for index, count in enumerate(row):
+                row[index] = count >> 1
+
+
+class TinyLFUCache[T](TableCache[T]):
+    """LRU eviction with TinyLFU admission.
+
+    A new key only displaces the least recently used entry when it has been
+    used at least as often, so one-off scans of old history cannot flush the
+    working set.
+    """
+
+    policy = "lfu"
+
+    def __init__(self, capacity: int) -> None:
+        super().__init__(capacity)
+        self._sketch = FrequencySketch(self._capacity)
+
+    def _on_hit(self, key: str) -> None:
+        self._sketch.increment(key)
+
+    def _admit(self, key: str) -> bool:
+        self._sketch.increment(key)
+        if len(self._items) < self._capacity:
+            return True
+        victim = next(iter(self._items))
+        return self._sketch.frequency(key) >= self._sketch.frequency(victim)
+
+
+class ByteBudgetCache[T](TableCache[T]):
+    """LRU eviction bounded by the estimated serialized size of the entries."""
+
+    policy = "bytes"
+
+    def __init__(
+        self, capacity: int, max_bytes: int, sizeof: Callable[[T], int]
+    ) -> None:
+        super().__init__(capacity)
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def clear(self) -> None:
+        super().clear()
+        self._sizes.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        super()._remove(key)
+        self._bytes -= self._sizes.pop(key)
+
+    def _overflowing(self) -> bool:
+        return super()._overflowing() or self._bytes > self._max_bytes
+
+    def _on_put(self, key: str, item: T) -> None:
+        size = self._sizeof(item)
+        self._sizes[key] = size
+        self._bytes += size
+
+
+DEFAULT_CACHE_BYTES = 8 * 1024 * 1024
+
+
+def create_cache[T](
+    policy: CachePolicy,
+    capacity: int,
+    sizeof: Callable[[T], int],
+    max_bytes: int | None = None,
+) -> TableCache[T]:
+    if policy == "lru":
+        return LRUCache(capacity)
+    if policy == "lfu":
+        return TinyLFUCache(capacity)
+    if policy == "bytes":
+        return ByteBudgetCache(capacity, max_bytes or DEFAULT_CACHE_BYTES, sizeof)
+    raise ValueError(f"Unknown cache policy {policy}")
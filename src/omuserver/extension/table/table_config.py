@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List, TypedDict
+
+from loguru import logger
+
+from omuserver.codec import json
+
+from .table_batch import BatchPolicy
+from .table_cache import CachePolicy
+
+
+class RetentionPolicy(TypedDict, total=False):
+    max_rows: int
+    max_age: float
+    max_bytes: int
+    interval: float
+    batch_size: int
+
+
+class TableConfig(TypedDict, total=False):
+    cache_policy: CachePolicy
+    cache_bytes: int
+    indexes: Dict[str, str]
+    search: List[str]
+    retention: RetentionPolicy
+    idle_timeout: float | None
+    batch: BatchPolicy
+
+
+def load_table_config(path: Path, config: TableConfig | None = None) -> TableConfig:
+    merged = TableConfig(**(config or {}))
+    file = path / "config.json"
+    if not file.exists():
+        return merged
+    try:
+        data = json.loads(file.read_bytes())
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring invalid table config {file}: {e}")
+        return merged
+    if not isinstance(data, dict):
+        logger.warning(f"Ignoring invalid table config {file}: expected object")
+        return merged
+    merged.update(data)  # type: ignore
+    return merged
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from pathlib import Path
 from typing import Any, Dict
 
@@ -32,23 +33,55 @@ from omuserver.server import Server, ServerListener
 from omuserver.session import Session
 
 from .adapters import DictTableAdapter, SqliteTableAdapter
+from .adapters.search import TableSearchResult
 from .cached_table import CachedTable
 from .server_table import ServerTable
+from .table_cache import CacheStatsJson
+from .table_config import TableConfig, load_table_config
+from .table_stream import TableStreams
+from .table_types import (
+    TableCacheStatsEndpoint,
+    TableItemQueryEndpoint,
+    TableItemSearchEndpoint,
+    TableQueryReq,
+    TableSearchReq,
+    TableStreamAck,
+    TableStreamAckEvent,
+    TableStreamCancelEvent,
+    TableStreamEvent,
+    TableStreamReq,
+)
+
+UNLOAD_INTERVAL = 30
 
 
 class TableExtension(Extension, ServerListener):
+    startup_stage = "tables"
+
     def __init__(self, server: Server) -> None:
         self._server = server
         self._tables: Dict[str, ServerTable] = {}
+        self._streams = TableStreams()
+        self._unload_task: asyncio.Task | None = None
         server.events.register(
             TableRegisterEvent,
             TableListenEvent,
             TableProxyListenEvent,
+            ordering="strict",
+        )
+        server.events.register(
             TableProxyEvent,
             TableItemAddEvent,
             TableItemUpdateEvent,
             TableItemRemoveEvent,
             TableItemClearEvent,
+            lane="table:item",
+        )
+        server.events.register(
+            TableStreamEvent,
+            TableStreamAckEvent,
+            TableStreamCancelEvent,
+            lane="table:stream",
         )
         server.events.add_listener(TableRegisterEvent, self._on_table_register)
         server.events.add_listener(TableListenEvent, self._on_table_listen)
@@ -57,12 +90,24 @@ class TableExtension(Extension, ServerListener):
         server.events.add_listener(TableItemUpdateEvent, self._on_table_item_update)
         server.events.add_listener(TableItemRemoveEvent, self._on_table_item_remove)
         server.events.add_listener(TableItemClearEvent, self._on_table_item_clear)
+        server.events.add_listener(TableStreamEvent, self._on_table_stream)
+        server.events.add_listener(TableStreamAckEvent, self._on_table_stream_ack)
+        server.events.add_listener(TableStreamCancelEvent, self._on_table_stream_cancel)
         server.endpoints.bind_endpoint(TableItemGetEndpoint, self._on_table_item_get)
         server.endpoints.bind_endpoint(
             TableItemFetchEndpoint, self._on_table_item_fetch
         )
         server.endpoints.bind_endpoint(TableItemSizeEndpoint, self._on_table_item_size)
         server.endpoints.bind_endpoint(TableProxyEndpoint, self._on_table_proxy)
+        server.endpoints.bind_endpoint(
+            TableCacheStatsEndpoint, self._on_table_cache_stats
+        )
+        server.endpoints.bind_endpoint(
+            TableItemQueryEndpoint, self._on_table_item_query
+        )
+        server.endpoints.bind_endpoint(
+            TableItemSearchEndpoint, self._on_table_item_search
+        )
         server.add_listener(self)
 
     @classmethod
@@ -96,18 +141,70 @@ class TableExtension(Extension, ServerListener):
         )
         return {key: table.serializer.serialize(item) for key, item in items.items()}
 
+    async def _on_table_item_query(
+        self, session: Session, req: TableQueryReq
+    ) -> Dict[str, Any]:
+        table = self._tables.get(req["type"], None)
+        if table is None:
+            return {}
+        items = await table.query(
+            filters=req.get("filters", []),
+            limit=req.get("limit", None),
+            cursor=req.get("cursor", None),
+        )
+        return {key: table.serializer.serialize(item) for key, item in items.items()}
+
+    async def _on_table_item_search(
+        self, session: Session, req: TableSearchReq
+    ) -> TableSearchResult:
+        table = self._tables.get(req["type"], None)
+        if table is None:
+            return TableSearchResult(items={}, offset=None)
+        items, offset = await table.search(
+            req["query"],
+            limit=req.get("limit", None),
+            offset=req.get("offset", None),
+        )
+        return TableSearchResult(
+            items={
+                key: table.serializer.serialize(item) for key, item in items.items()
+            },
+            offset=offset,
+        )
+
+    async def _on_table_stream(self, session: Session, req: TableStreamReq) -> None:
+        table = self._tables.get(req["type"], None)
+        if table is None:
+            return
+        self._streams.start(session, table, req)
+
+    async def _on_table_stream_ack(
+        self, session: Session, event: TableStreamAck
+    ) -> None:
+        self._streams.ack(session, event["id"], event["credit"])
+
+    async def _on_table_stream_cancel(self, session: Session, id: int) -> None:
+        self._streams.cancel(session, id)
+
     async def _on_table_item_size(self, session: Session, req: TableEventData) -> int:
         table = self._tables.get(req["type"], None)
         if table is None:
             return 0
         return await table.size()
 
+    async def _on_table_cache_stats(
+        self, session: Session, req: TableEventData
+    ) -> CacheStatsJson | None:
+        table = self._tables.get(req["type"], None)
+        if table is None:
+            return None
+        return table.cache_stats
+
     async def _on_table_register(self, session: Session, info: TableInfo) -> None:
         if info.key() in self._tables:
             logger.warning(f"Skipping table {info.key()} already registered")
             return
-        table = self.create_table(info, Serializer.noop())
-        await table.load()
+        self.create_table(info, Serializer.noop())
 
     async def _on_table_listen(self, session: Session, type: str) -> None:
         table = self._tables.get(type, None)
@@ -162,22 +259,23 @@ class TableExtension(Extension, ServerListener):
             return
         await table.clear()
 
-    def create_table(self, info, serializer):
+    def create_table(self, info, serializer, config: TableConfig | None = None):
         path = self.get_table_path(info)
+        config = load_table_config(path, config)
         if info.use_database:
-            table = SqliteTableAdapter.create(path)
+            table = SqliteTableAdapter.create(path, config)
         else:
-            table = DictTableAdapter.create(path)
-        server_table = CachedTable(self._server, info, serializer, table)
+            table = DictTableAdapter.create(path, config)
+        server_table = CachedTable(self._server, info, serializer, table, config)
         self._tables[info.key()] = server_table
         return server_table
 
     def register_table[T: Keyable, D](
-        self, table_type: TableType[T, Any]
+        self, table_type: TableType[T, Any], config: TableConfig | None = None
     ) -> ServerTable[T]:
         if table_type.info.key() in self._tables:
             raise Exception(f"Table {table_type.info.key()} already registered")
-        table = self.create_table(table_type.info, table_type.serializer)
+        table = self.create_table(table_type.info, table_type.serializer, config)
         return table
 
     def get_table_path(self, info: TableInfo) -> Path:
@@ -186,9 +284,22 @@ class TableExtension(Extension, ServerListener):
         return path
 
     async def on_start(self) -> None:
-        for table in self._tables.values():
-            await table.load()
+        # Tables load on first access, so startup no longer reads every
+        # table from disk; idle ones are unloaded again in the background.
+        self._unload_task = asyncio.create_task(self._unload_idle_tables())
+
+    async def _unload_idle_tables(self) -> None:
+        while True:
+            await asyncio.sleep(UNLOAD_INTERVAL)
+            for table in tuple(self._tables.values()):
+                try:
+                    await table.unload_if_idle()
+                except Exception as e:
+                    logger.opt(exception=e).error(f"Failed to unload {table}")
 
     async def on_shutdown(self) -> None:
+        if self._unload_task is not None:
+            self._unload_task.cancel()
+            self._unload_task = None
         for table in self._tables.values():
-            await table.store()
+            await table.close()
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Set, Tuple
+
+from loguru import logger
+
+from omuserver.codec import Json, json
+from omuserver.session import SessionListener
+
+from .table_types import (
+    TableStreamChunk,
+    TableStreamChunkEvent,
+    TableStreamEnd,
+    TableStreamEndEvent,
+    TableStreamReq,
+)
+
+if TYPE_CHECKING:
+    from omuserver.session import Session
+
+    from .server_table import ServerTable
+
+DEFAULT_CHUNK_SIZE = 100
+MAX_CHUNK_SIZE = 1000
+MAX_CHUNK_BYTES = 256 * 1024
+DEFAULT_WINDOW = 4
+
+
+class TableStream:
+    """Sends a fetch window as bounded chunks, one per credit from the client."""
+
+    def __init__(
+        self, session: Session, table: ServerTable, req: TableStreamReq
+    ) -> None:
+        self._session = session
+        self._table = table
+        self._req = req
+        self._chunk_size = min(
+            max(1, req.get("chunk_size", DEFAULT_CHUNK_SIZE)), MAX_CHUNK_SIZE
+        )
+        self._credits = max(1, req.get("window", DEFAULT_WINDOW))
+        self._ready = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._cancelled = False
+
+    @property
+    def id(self) -> int:
+        return self._req["id"]
+
+    @property
+    def task(self) -> asyncio.Task | None:
+        return self._task
+
+    def start(self) -> asyncio.Task:
+        self._task = asyncio.create_task(self._run())
+        return self._task
+
+    def ack(self, credit: int) -> None:
+        self._credits += credit
+        self._ready.set()
+
+    def cancel(self) -> None:
+        self._cancelled = True
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self) -> None:
+        count = 0
+        index = 0
+        error: str | None = None
+        try:
+            chunk: Dict[str, Json] = {}
+            size = 0
+            async for key, value in self._items():
+                chunk[key] = value
+                size += len(json.dumps_bytes(value))
+                if len(chunk) >= self._chunk_size or size >= MAX_CHUNK_BYTES:
+                    await self._send_chunk(index, chunk)
+                    index += 1
+                    count += len(chunk)
+                    chunk = {}
+                    size = 0
+            if chunk:
+                await self._send_chunk(index, chunk)
+                count += len(chunk)
+        except asyncio.CancelledError:
+            if not self._cancelled:
+                raise
+        except ValueError as e:
+            error = str(e)
+        except Exception as e:
+            logger.opt(exception=e).error(f"Failed to stream {self._req['type']}")
+            error = f"Failed to stream table: {e}"
+        if self._session.closed:
+            return
+        await self._session.send(
+            TableStreamEndEvent,
+            TableStreamEnd(
+                id=self.id,
+                type=self._req["type"],
+                count=count,
+                cancelled=self._cancelled,
+                error=error,
+            ),
+        )
+
+    async def _send_chunk(self, index: int, items: Dict[str, Json]) -> None:
+        while self._credits <= 0:
+            self._ready.clear()
+            await self._ready.wait()
+        self._credits -= 1
+        await self._session.send(
+            TableStreamChunkEvent,
+            TableStreamChunk(
+                id=self.id,
+                type=self._req["type"],
+                index=index,
+                items=items,
+            ),
+        )
+
+    async def _items(self) -> AsyncIterator[Tuple[str, Json]]:
+        # Walks the same window as fetch, one page at a time: `before` goes
+        # backwards from the cursor (newest first), then `after` goes forwards.
+        # Each page after the first starts at the previous page's last key,
+        # which is dropped since it has already been sent.
+        serializer = self._table.serializer
+        cursor = self._req.get("cursor", None)
+        before = self._req.get("before", None)
+        after = self._req.get("after", None)
+        # Without a cursor both directions may overlap on a short table.
+        sent: Set[str] | None = (
+            set() if before is not None and after is not None else None
+        )
+        if before is not None:
+            remaining = before
+            page_cursor = cursor
+            while remaining > 0:
+                skip = page_cursor != cursor
+                limit = min(self._chunk_size, remaining)
+                items = await self._table.fetch(before=limit + skip, cursor=page_cursor)
+                keys = list(items.keys())[skip:]
+                for key in keys:
+                    if sent is not None:
+                        sent.add(key)
+                    yield key, serializer.serialize(items[key])
+                remaining -= len(keys)
+                if len(keys) < limit:
+                    break
+                page_cursor = keys[-1]
+        if after is not None:
+            remaining = after
+            page_cursor = cursor
+            while remaining > 0:
+                skip = page_cursor != cursor
+                limit = min(self._chunk_size, remaining)
+                items = await self._table.fetch(after=limit + skip, cursor=page_cursor)
+                keys = list(reversed(items.keys()))[skip:]
+                for key in keys:
+                    if sent is not None and key in sent:
+                        continue
+                    yield key, serializer.serialize(items[key])
+                remaining -= len(keys)
+                if len(keys) < limit:
+                    break
+                page_cursor = keys[-1]
+
+
+class TableStreams(SessionListener):
+    def __init__(self) -> None:
+        self._streams: Dict[Session, Dict[int, TableStream]] = {}
+
+    def start(self, session: Session, table: ServerTable, req: TableStreamReq) -> None:
+        streams = self._streams.get(session)
+        if streams is None:
+            streams = self._streams[session] = {}
+            session.add_listener(self)
+        previous = streams.get(req["id"])
+        if previous is not None:
+            logger.warning(f"{session.app.name} restarted table stream {req['id']}")
+            previous.cancel()
+        stream = TableStream(session, table, req)
+        streams[stream.id] = stream
+        task = stream.start()
+        task.add_done_callback(lambda _: self._on_done(session, stream))
+
+    def ack(self, session: Session, id: int, credit: int) -> None:
+        stream = self._streams.get(session, {}).get(id)
+        if stream is None:
+            return
+        stream.ack(credit)
+
+    def cancel(self, session: Session, id: int) -> None:
+        stream = self._streams.get(session, {}).get(id)
+        if stream is None:
+            return
+        stream.cancel()
+
+    def _on_done(self, session: Session, stream: TableStream) -> None:
+        streams = self._streams.get(session)
+        if streams is not None and streams.get(stream.id) is stream:
+            del streams[stream.id]
+        task = stream.task
+        if task is None or task.cancelled():
+            return
+        exception = task.exception()
+        if exception is not None:
+            logger.opt(exception=exception).error(
+                f"Table stream {stream.id} of {session.app.name} failed"
+            )
+
+    async def on_disconnected(self, session: Session) -> None:
+        streams = self._streams.pop(session, {})
+        for stream in tuple(streams.values()):
+            stream.cancel()
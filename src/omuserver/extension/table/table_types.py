@@ -0,0 +1,86 @@
+from typing import Dict, List, NotRequired, TypedDict
+
+from omu.event.event import JsonEventType
+from omu.extension.endpoint.endpoint import JsonEndpointType
+from omu.extension.table.table_extension import TableEventData, TableExtensionType
+
+from omuserver.codec import Json
+
+from .adapters.query import TableFilter
+from .adapters.search import TableSearchResult
+from .table_cache import CacheStatsJson
+
+TableCacheStatsEndpoint = JsonEndpointType[
+    TableEventData, CacheStatsJson | None
+].of_extension(TableExtensionType, "cache_stats")
+
+
+class TableQueryReq(TypedDict):
+    type: str
+    filters: List[TableFilter]
+    limit: NotRequired[int | None]
+    cursor: NotRequired[str | None]
+
+
+TableItemQueryEndpoint = JsonEndpointType[TableQueryReq, Dict[str, Json]].of_extension(
+    TableExtensionType, "item_query"
+)
+
+
+class TableSearchReq(TypedDict):
+    type: str
+    query: str
+    limit: NotRequired[int | None]
+    offset: NotRequired[int | None]
+
+
+TableItemSearchEndpoint = JsonEndpointType[
+    TableSearchReq, TableSearchResult
+].of_extension(TableExtensionType, "item_search")
+
+
+class TableStreamReq(TypedDict):
+    id: int
+    type: str
+    before: NotRequired[int | None]
+    after: NotRequired[int | None]
+    cursor: NotRequired[str | None]
+    chunk_size: NotRequired[int]
+    window: NotRequired[int]
+
+
+class TableStreamChunk(TypedDict):
+    id: int
+    type: str
+    index: int
+    items: Dict[str, Json]
+
+
+class TableStreamEnd(TypedDict):
+    id: int
+    type: str
+    count: int
+    cancelled: bool
+    error: str | None
+
+
+class TableStreamAck(TypedDict):
+    id: int
+    credit: int
+
+
+TableStreamEvent = JsonEventType[TableStreamReq].of_extension(
+    TableExtensionType, "item_stream"
+)
+TableStreamChunkEvent = JsonEventType[TableStreamChunk].of_extension(
+    TableExtensionType, "item_stream_chunk"
+)
+TableStreamEndEvent = JsonEventType[TableStreamEnd].of_extension(
+    TableExtensionType, "item_stream_end"
+)
+TableStreamAckEvent = JsonEventType[TableStreamAck].of_extension(
+    TableExtensionType, "item_stream_ack"
+)
+TableStreamCancelEvent = JsonEventType[int].of_extension(
+    TableExtensionType, "item_stream_cancel"
+)
@@ -1,15 +1,15 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Dict, List
+from typing import TYPE_CHECKING, Dict, List, Tuple
 
 from aiohttp import web
 from loguru import logger
 from omu import App
 from omu.event import EVENTS
 
-from omuserver.server import ServerListener
 from omuserver.session import SessionListener
 from omuserver.session.aiohttp_session import AiohttpSession
+from omuserver.session.send_queue import SendQueueConfig
 from omuserver.session.session import Session
 
 from .network import Coro, Network
@@ -20,25 +20,37 @@ if TYPE_CHECKING:
     from .network import NetworkListener
 
 
-class AiohttpNetwork(Network, ServerListener, SessionListener):
-    def __init__(self, server: Server) -> None:
+class AiohttpNetwork(Network, SessionListener):
+    def __init__(
+        self, server: Server, queue_config: SendQueueConfig | None = None
+    ) -> None:
         self._server = server
+        self._queue_config = queue_config
         self._listeners: List[NetworkListener] = []
         self._sessions: Dict[str, Session] = {}
         self._app = web.Application()
-        server.add_listener(self)
 
     def add_http_route(
-        self, path: str, handle: Coro[[web.Request], web.StreamResponse]
+        self,
+        path: str,
+        handle: Coro[[web.Request], web.StreamResponse],
+        methods: Tuple[str, ...] = ("GET",),
     ) -> None:
-        self._app.router.add_get(path, handle)
+        for method in methods:
+            if method == "GET":
+                self._app.router.add_get(path, handle)
+            else:
+                self._app.router.add_route(method, path, handle)
 
     def add_websocket_route(self, path: str) -> None:
         async def websocket_handler(request: web.Request) -> web.WebSocketResponse:
             ws = web.WebSocketResponse()
             await ws.prepare(request)
-            session = await AiohttpSession.create(self._server, ws)
+            session = await AiohttpSession.create(self._server, ws, self._queue_config)
+            if session is None:
+                return ws
             await self._handle_session(session)
+            await session.disconnect()
             return ws
 
         self._app.router.add_get(path, websocket_handler)
@@ -73,7 +85,7 @@ class AiohttpNetwork(Network, ServerListener, SessionListener):
         runner = web.AppRunner(self._app)
         await runner.setup()
         site = web.TCPSite(runner, self._server.address.host, self._server.address.port)
-        self._server.loop.create_task(site.start())
+        await site.start()
 
     def add_listener(self, listener: NetworkListener) -> None:
         self._listeners.append(listener)
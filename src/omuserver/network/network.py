@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import abc
-from typing import TYPE_CHECKING, Awaitable, Callable
+from typing import TYPE_CHECKING, Awaitable, Callable, Tuple
 
 if TYPE_CHECKING:
     from omuserver.session import Session
@@ -15,7 +15,9 @@ class Network(abc.ABC):
         ...
 
     @abc.abstractmethod
-    def add_http_route(self, path: str, handle) -> None:
+    def add_http_route(
+        self, path: str, handle, methods: Tuple[str, ...] = ("GET",)
+    ) -> None:
         ...
 
     @abc.abstractmethod
@@ -29,6 +29,16 @@ class Security(abc.ABC):
     async def add_permissions(self, token: Token, permissions: Permission) -> None:
         ...
 
+    @abc.abstractmethod
+    async def add_temporary_permissions(
+        self, token: Token, permissions: Permission
+    ) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def remove_permissions(self, token: Token) -> None:
+        ...
+
     @abc.abstractmethod
     async def get_permissions(self, token: Token) -> Permission:
         ...
@@ -40,12 +50,18 @@ class ServerSecurity(Security):
         self._permissions: Dict[Token, Permission] = sqlitedict.SqliteDict(
             server.directories.get("security") / "tokens.sqlite", autocommit=True
         )
+        # Tokens that must not outlive this process, such as the ones handed
+        # to plugin processes, are never written to disk.
+        self._temporary: Dict[Token, Permission] = {}
+
+    def _has_token(self, token: Token) -> bool:
+        return token in self._temporary or token in self._permissions
 
     async def get_token(self, app: App, token: Token | None = None) -> Token | None:
         if token is None:
             token = self._generate_token()
             self._permissions[token] = Permissions(app.key())
-        elif token not in self._permissions:
+        elif not self._has_token(token):
             return None
         return token
 
@@ -56,7 +72,7 @@ class ServerSecurity(Security):
             if token is None:
                 logger.warning(f"Failed to generate token for {app}")
                 raise ValueError("Failed to generate token")
-        elif token not in self._permissions:
+        elif not self._has_token(token):
             logger.warning(f"Invalid token {token} for {app}")
             token = await self.get_token(app)
             if token is None:
@@ -78,7 +94,18 @@ class ServerSecurity(Security):
     async def add_permissions(self, token: Token, permissions: Permission) -> None:
         self._permissions[token] = permissions
 
+    async def add_temporary_permissions(
+        self, token: Token, permissions: Permission
+    ) -> None:
+        self._temporary[token] = permissions
+
+    async def remove_permissions(self, token: Token) -> None:
+        self._temporary.pop(token, None)
+        self._permissions.pop(token, None)
+
     async def get_permissions(self, token: Token) -> Permission:
+        if token in self._temporary:
+            return self._temporary[token]
         return self._permissions[token]
 
     def _generate_token(self):
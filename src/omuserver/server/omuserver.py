@@ -1,14 +1,10 @@
 import asyncio
-import json
 from typing import List, Optional
 
-import aiohttp
-from aiohttp import web
 from loguru import logger
 from omu.connection import Address
 from omu.event import EVENTS
 
-from omuserver import __version__
 from omuserver.directories import Directories, get_directories
 from omuserver.event.event_registry import EventRegistry
 from omuserver.extension import ExtensionRegistry, ExtensionRegistryServer
@@ -22,23 +18,10 @@ from omuserver.extension.table import TableExtension
 from omuserver.network import Network
 from omuserver.network.aiohttp_network import AiohttpNetwork
 from omuserver.security.security import ServerSecurity
-from omuserver.utils.helper import safe_path_join
 
+from .proxy import HttpProxy
 from .server import Server, ServerListener
-
-client = aiohttp.ClientSession(
-    headers={
-        "User-Agent": json.dumps(
-            [
-                "omu",
-                {
-                    "name": "omuserver",
-                    "version": __version__,
-                },
-            ]
-        )
-    }
-)
+from .startup import StartupError, StartupGraph, StartupReport
 
 
 class OmuServer(Server):
@@ -57,10 +40,11 @@ class OmuServer(Server):
         self._directories.mkdir()
         self._network = network or AiohttpNetwork(self)
         self._events = EventRegistry(self)
-        self._events.register(EVENTS.Connect, EVENTS.Ready)
+        self._events.register(EVENTS.Connect, EVENTS.Ready, ordering="strict")
         self._extensions = extensions or ExtensionRegistryServer(self)
         self._security = ServerSecurity(self)
         self._running = False
+        self._startup: StartupReport | None = None
         self._endpoint = self.extensions.register(EndpointExtension)
         self._tables = self.extensions.register(TableExtension)
         self._server = self.extensions.register(ServerExtension)
@@ -70,55 +54,31 @@ class OmuServer(Server):
         self._assets = self.extensions.register(AssetExtension)
 
         self._network.add_websocket_route("/ws")
-        self._network.add_http_route("/proxy", self._handle_proxy)
-        self._network.add_http_route("/assets", self._handle_assets)
+        self._proxy = HttpProxy(
+            self._directories.get("proxy"), images=self._assets.images
+        )
+        self._network.add_http_route("/proxy", self._proxy.handle)
         self._session_tasks: List[asyncio.Task] = []
 
-    async def _handle_proxy(self, request: web.Request) -> web.StreamResponse:
-        url = request.query.get("url")
-        if not url:
-            return web.Response(status=400)
-        try:
-            async with client.get(url) as resp:
-                headers = {
-                    "Content-Type": resp.content_type,
-                }
-                resp.raise_for_status()
-                return web.Response(
-                    status=resp.status,
-                    headers=headers,
-                    body=await resp.read(),
-                )
-        except aiohttp.ClientResponseError as e:
-            return web.Response(status=e.status, text=e.message)
-        except Exception as e:
-            logger.error(e)
-            return web.Response(status=500)
-
-    async def _handle_assets(self, request: web.Request) -> web.StreamResponse:
-        path = request.query.get("path")
-        if not path:
-            return web.Response(status=400)
-        try:
-            path = safe_path_join(self._directories.assets, path)
-
-            if not path.exists():
-                return web.Response(status=404)
-            return web.FileResponse(path)
-        except Exception as e:
-            logger.error(e)
-            return web.Response(status=500)
-
     def run(self) -> None:
         loop = self.loop
+        start = loop.create_task(self.start())
+        start.add_done_callback(self._on_started)
 
         try:
             loop.set_exception_handler(self.handle_exception)
-            loop.create_task(self.start())
             loop.run_forever()
         finally:
             loop.close()
             asyncio.run(self.shutdown())
+        if not start.cancelled() and start.exception() is not None:
+            raise SystemExit(1)
+
+    def _on_started(self, task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is None:
+            return
+        logger.opt(exception=task.exception()).error("Server failed to start")
+        self.loop.stop()
 
     def handle_exception(self, loop: asyncio.AbstractEventLoop, context: dict) -> None:
         logger.error(context["message"])
@@ -128,14 +88,28 @@ class OmuServer(Server):
 
     async def start(self) -> None:
         self._running = True
-        await self._network.start()
+        graph = StartupGraph()
         for listener in self._listeners:
-            await listener.on_start()
+            name = listener.startup_stage or type(listener).__name__
+            graph.add(
+                name,
+                listener.on_start,
+                listener.startup_after,
+                listener.startup_required,
+            )
+        # Sessions must not connect before the apps table has been reset.
+        graph.add("network", self._network.start, after=("server", "endpoints"))
+        self._startup = await graph.run()
+        logger.info(self._startup.format())
+        if self._startup.failed:
+            raise StartupError(self._startup)
+        await self._registry.store("server:startup", self._startup.to_json())
 
     async def shutdown(self) -> None:
         self._running = False
         for listener in self._listeners:
             await listener.on_shutdown()
+        await self._proxy.close()
 
     def add_listener(self, listener: ServerListener) -> None:
         self._listeners.append(listener)
@@ -198,3 +172,7 @@ class OmuServer(Server):
     @property
     def running(self) -> bool:
         return self._running
+
+    @property
+    def startup(self) -> StartupReport | None:
+        return self._startup
@@ -0,0 +1,555 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, TypedDict
+
+import aiohttp
+from aiohttp import hdrs, web
+from aiohttp.helpers import ETAG_ANY
+from loguru import logger
+from multidict import CIMultiDictProxy
+
+from omuserver import __version__
+from omuserver.codec import json as codec
+from omuserver.extension.asset.asset_extension import (
+    AssetFileResponse,
+    precondition_failed,
+    range_allowed,
+)
+from omuserver.extension.asset.image_transform import ImageTransform, ImageVariants
+from omuserver.extension.table.table_cache import ByteBudgetCache
+
+USER_AGENT = json.dumps(["omu", {"name": "omuserver", "version": __version__}])
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class ProxyConfig:
+    limit: int = 100
+    limit_per_host: int = 8
+    timeout: float = 30
+    max_memory_bytes: int = 32 * 1024 * 1024
+    max_memory_item: int = 512 * 1024
+    max_disk_bytes: int = 256 * 1024 * 1024
+    max_disk_item: int = 16 * 1024 * 1024
+    # Freshness for responses that carry no Cache-Control or Expires.
+    default_ttl: float = 300
+
+
+class ProxyEntryJson(TypedDict):
+    url: str
+    content_type: str
+    digest: str
+    etag: str | None
+    last_modified: str | None
+    expires: float
+    size: int
+
+
+@dataclass
+class ProxyEntry:
+    key: str
+    url: str
+    content_type: str
+    digest: str
+    etag: str | None
+    last_modified: str | None
+    expires: float
+    size: int
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+
+    def to_json(self) -> ProxyEntryJson:
+        return ProxyEntryJson(
+            url=self.url,
+            content_type=self.content_type,
+            digest=self.digest,
+            etag=self.etag,
+            last_modified=self.last_modified,
+            expires=self.expires,
+            size=self.size,
+        )
+
+    @classmethod
+    def from_json(cls, key: str, json: ProxyEntryJson) -> ProxyEntry:
+        return cls(key=key, **json)
+
+
+def cache_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def parse_cache_control(value: str) -> Dict[str, str]:
+    directives: Dict[str, str] = {}
+    for directive in value.split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"')
+    return directives
+
+
+def freshness(headers: CIMultiDictProxy[str], default_ttl: float) -> float | None:
+    """Seconds the response may be served without revalidation, or None if
+    it must not be stored."""
+    directives = parse_cache_control(headers.get("Cache-Control", ""))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                return max(0, int(directives[name]))
+            except ValueError:
+                return 0
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            return max(0, parsedate_to_datetime(expires).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0
+    return default_ttl
+
+
+def conditional_headers(stale: ProxyEntry | None) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    if stale is not None and stale.etag:
+        headers["If-None-Match"] = stale.etag
+    if stale is not None and stale.last_modified:
+        headers["If-Modified-Since"] = stale.last_modified
+    return headers
+
+
+class ProxyCache:
+    """LRU cache of upstream bodies on disk, with small ones kept in memory."""
+
+    def __init__(self, path: Path, config: ProxyConfig) -> None:
+        self._path = path
+        self._config = config
+        self._entries: OrderedDict[str, ProxyEntry] = OrderedDict()
+        self._memory = ByteBudgetCache[bytes](
+            1 << 20, config.max_memory_bytes, lambda body: len(body)
+        )
+        self._disk_bytes = 0
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    def file(self, entry: ProxyEntry) -> Path:
+        return self._path / f"{entry.key}.body"
+
+    def body(self, entry: ProxyEntry) -> bytes | None:
+        return self._memory.get(entry.key)
+
+    async def get(self, key: str) -> ProxyEntry | None:
+        await self._load()
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    async def put(self, entry: ProxyEntry, body: bytes | None) -> None:
+        await asyncio.to_thread(
+            (self._path / f"{entry.key}.json").write_bytes,
+            codec.dumps_bytes(entry.to_json()),
+        )
+        old = self._entries.pop(entry.key, None)
+        if old is not None:
+            self._disk_bytes -= old.size
+        self._entries[entry.key] = entry
+        self._disk_bytes += entry.size
+        self._memory.remove(entry.key)
+        if body is not None:
+            self._memory.put(entry.key, body)
+        await self._evict()
+
+    async def refresh(self, entry: ProxyEntry) -> None:
+        await asyncio.to_thread(
+            (self._path / f"{entry.key}.json").write_bytes,
+            codec.dumps_bytes(entry.to_json()),
+        )
+
+    async def _evict(self) -> None:
+        victims: List[ProxyEntry] = []
+        while self._disk_bytes > self._config.max_disk_bytes and self._entries:
+            _, victim = self._entries.popitem(last=False)
+            self._disk_bytes -= victim.size
+            self._memory.remove(victim.key)
+            victims.append(victim)
+        if victims:
+            await asyncio.to_thread(self._remove_files, victims)
+
+    def _remove_files(self, entries: List[ProxyEntry]) -> None:
+        for entry in entries:
+            self.file(entry).unlink(missing_ok=True)
+            (self._path / f"{entry.key}.json").unlink(missing_ok=True)
+
+    async def _load(self) -> None:
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            entries = await asyncio.to_thread(self._scan)
+            for entry in entries:
+                self._entries[entry.key] = entry
+                self._disk_bytes += entry.size
+            self._loaded = True
+        await self._evict()
+
+    def _scan(self) -> List[ProxyEntry]:
+        self._path.mkdir(parents=True, exist_ok=True)
+        found: List[tuple[float, ProxyEntry]] = []
+        for file in self._path.glob("*.json"):
+            key = file.stem
+            body = self._path / f"{key}.body"
+            try:
+                entry = ProxyEntry.from_json(key, codec.loads(file.read_bytes()))
+                used = body.stat().st_mtime
+            except Exception:
+                file.unlink(missing_ok=True)
+                body.unlink(missing_ok=True)
+                continue
+            found.append((used, entry))
+        found.sort(key=lambda item: item[0])
+        return [entry for _, entry in found]
+
+    def writer(self, key: str) -> ProxyCacheWriter:
+        return ProxyCacheWriter(self, key, self._config)
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+
+class ProxyCacheWriter:
+    """Copies a streamed body into the cache as it passes through."""
+
+    def __init__(self, cache: ProxyCache, key: str, config: ProxyConfig) -> None:
+        self._cache = cache
+        self._key = key
+        self._config = config
+        self._digest = hashlib.blake2b(digest_size=16)
+        self._memory: bytearray | None = bytearray()
+        self._size = 0
+        self._temp = cache.path / f".{key}.{os.getpid()}.{id(self):x}.tmp"
+        self._file = None
+
+    async def write(self, chunk: bytes) -> bool:
+        self._size += len(chunk)
+        if self._size > self._config.max_disk_item:
+            await self.discard()
+            return False
+        if self._file is None:
+            self._file = await asyncio.to_thread(self._temp.open, "wb")
+        await asyncio.to_thread(self._file.write, chunk)
+        self._digest.update(chunk)
+        if self._memory is not None:
+            if self._size > self._config.max_memory_item:
+                self._memory = None
+            else:
+                self._memory.extend(chunk)
+        return True
+
+    async def commit(
+        self, url: str, headers: CIMultiDictProxy[str], ttl: float, content_type: str
+    ) -> ProxyEntry:
+        if self._file is None:
+            self._file = await asyncio.to_thread(self._temp.open, "wb")
+        await asyncio.to_thread(self._file.close)
+        entry = ProxyEntry(
+            key=self._key,
+            url=url,
+            content_type=content_type,
+            digest=self._digest.hexdigest(),
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            expires=time.time() + ttl,
+            size=self._size,
+        )
+        await asyncio.to_thread(os.replace, self._temp, self._cache.file(entry))
+        body = bytes(self._memory) if self._memory is not None else None
+        await self._cache.put(entry, body)
+        return entry
+
+    async def discard(self) -> None:
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+        await asyncio.to_thread(self._temp.unlink, True)
+
+
+class HttpProxy:
+    """Backs the /proxy route.
+
+    Upstream bodies are streamed to the client while being copied into the
+    cache. Concurrent requests for the same URL wait for the first one's
+    fetch instead of going upstream themselves.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        config: ProxyConfig | None = None,
+        images: ImageVariants | None = None,
+    ) -> None:
+        self._config = config or ProxyConfig()
+        self._cache = ProxyCache(path, self._config)
+        self._images = images
+        self._session: aiohttp.ClientSession | None = None
+        self._inflight: Dict[str, asyncio.Future[ProxyEntry | None]] = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created on first use, so that it binds to the running loop.
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers={"User-Agent": USER_AGENT},
+                connector=aiohttp.TCPConnector(
+                    limit=self._config.limit,
+                    limit_per_host=self._config.limit_per_host,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self._config.timeout),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        url = request.query.get("url")
+        if not url or not url.startswith(("http://", "https://")):
+            return web.Response(status=400)
+        try:
+            transform = ImageTransform.parse(request.query)
+        except ValueError as e:
+            return web.Response(status=400, text=str(e))
+        key = cache_key(url)
+        if transform is not None and self._images is not None:
+            response = await self._handle_image(request, url, key, transform)
+            if response is not None:
+                return response
+        entry = await self._cache.get(key)
+        if entry is not None and entry.fresh:
+            return self._serve(request, entry)
+        pending = self._inflight.get(key)
+        if pending is not None and not pending.done():
+            shared = await asyncio.shield(pending)
+            if shared is not None:
+                return self._serve(request, shared)
+            return await self._fetch(request, url, key, entry, None)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            return await self._fetch(request, url, key, entry, future)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if not future.done():
+                future.set_result(None)
+
+    async def _fetch(
+        self,
+        request: web.Request,
+        url: str,
+        key: str,
+        stale: ProxyEntry | None,
+        future: asyncio.Future[ProxyEntry | None] | None,
+    ) -> web.StreamResponse:
+        headers = conditional_headers(stale)
+        try:
+            async with self._get_session().get(url, headers=headers) as upstream:
+                if upstream.status == 304 and stale is not None:
+                    await self._revalidated(stale, upstream)
+                    if future is not None:
+                        future.set_result(stale)
+                    return self._serve(request, stale)
+                if upstream.status != 200:
+                    return web.Response(
+                        status=upstream.status, text=upstream.reason or ""
+                    )
+                return await self._stream(request, url, key, upstream, future)
+        except (aiohttp.ClientError, TimeoutError) as e:
+            if stale is not None:
+                logger.warning(f"Serving stale {url}: {e!r}")
+                return self._serve(request, stale)
+            logger.warning(f"Failed to proxy {url}: {e!r}")
+            return web.Response(status=502)
+
+    async def _revalidated(
+        self, stale: ProxyEntry, upstream: aiohttp.ClientResponse
+    ) -> None:
+        ttl = freshness(upstream.headers, self._config.default_ttl)
+        stale.expires = time.time() + (ttl or 0)
+        await self._cache.refresh(stale)
+
+    async def _handle_image(
+        self, request: web.Request, url: str, key: str, transform: ImageTransform
+    ) -> web.StreamResponse | None:
+        # Transforms need the whole source, so it is fetched into the cache
+        # first instead of being streamed through.
+        assert self._images is not None
+        entry = await self._cached(url, key)
+        if entry is None:
+            return None
+        variant = await self._images.get(
+            self._cache.file(entry), entry.digest, transform
+        )
+        if variant is None:
+            return self._serve(request, entry)
+        path, content_type = variant
+        remaining = max(0, int(entry.expires - time.time()))
+        headers = {"Cache-Control": f"max-age={remaining}"}
+        if_none_match = request.if_none_match
+        if if_none_match and any(
+            tag.value in (path.stem, ETAG_ANY) for tag in if_none_match
+        ):
+            response = web.Response(status=304, headers=headers)
+            response.etag = path.stem
+            return response
+        failed = precondition_failed(request, path.stem)
+        if failed is not None:
+            return failed
+        headers["Content-Type"] = content_type
+        return AssetFileResponse(
+            path,
+            path.stem,
+            ranged=range_allowed(request, path.stem),
+            headers=headers,
+        )
+
+    async def _cached(self, url: str, key: str) -> ProxyEntry | None:
+        entry = await self._cache.get(key)
+        if entry is not None and entry.fresh:
+            return entry
+        pending = self._inflight.get(key)
+        if pending is not None and not pending.done():
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        result = None
+        try:
+            result = await self._download(url, key, entry)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if not future.done():
+                future.set_result(result)
+
+    async def _download(
+        self, url: str, key: str, stale: ProxyEntry | None
+    ) -> ProxyEntry | None:
+        headers = conditional_headers(stale)
+        try:
+            async with self._get_session().get(url, headers=headers) as upstream:
+                if upstream.status == 304 and stale is not None:
+                    await self._revalidated(stale, upstream)
+                    return stale
+                if upstream.status != 200:
+                    return None
+                ttl = freshness(upstream.headers, self._config.default_ttl)
+                if ttl is None:
+                    return None
+                return await self._store(url, upstream, ttl, self._cache.writer(key))
+        except (aiohttp.ClientError, TimeoutError) as e:
+            logger.warning(f"Failed to fetch {url}: {e!r}")
+            return stale
+
+    async def _stream(
+        self,
+        request: web.Request,
+        url: str,
+        key: str,
+        upstream: aiohttp.ClientResponse,
+        future: asyncio.Future[ProxyEntry | None] | None,
+    ) -> web.StreamResponse:
+        ttl = freshness(upstream.headers, self._config.default_ttl)
+        length = upstream.content_length
+        if hdrs.CONTENT_ENCODING in upstream.headers:
+            # The session decompresses the body, so the declared length is
+            # the compressed size and the response is sent chunked instead.
+            length = None
+        writer = None
+        if ttl is not None and (length is None or length <= self._config.max_disk_item):
+            writer = self._cache.writer(key)
+        response = web.StreamResponse(status=200)
+        response.content_type = upstream.content_type
+        if length is not None:
+            response.content_length = length
+        response.headers["Cache-Control"] = "no-cache"
+        await response.prepare(request)
+        entry = await self._store(url, upstream, ttl, writer, response.write)
+        # The entry is committed before the response ends, so a request made
+        # once this one completes is served from the cache.
+        if entry is not None and future is not None:
+            future.set_result(entry)
+        await response.write_eof()
+        return response
+
+    async def _store(
+        self,
+        url: str,
+        upstream: aiohttp.ClientResponse,
+        ttl: float | None,
+        writer: ProxyCacheWriter | None,
+        write: Callable[[bytes], Awaitable[None]] | None = None,
+    ) -> ProxyEntry | None:
+        """Reads the body into the cache and, if given, passes each chunk to
+        `write`. Returns the committed entry, or None if it was not stored."""
+        try:
+            async for chunk in upstream.content.iter_chunked(CHUNK_SIZE):
+                if write is not None:
+                    await write(chunk)
+                if writer is not None and not await writer.write(chunk):
+                    writer = None
+                    if write is None:
+                        return None
+            if writer is None:
+                return None
+            assert ttl is not None
+            entry = await writer.commit(
+                url, upstream.headers, ttl, upstream.content_type
+            )
+            writer = None
+            return entry
+        finally:
+            if writer is not None:
+                await writer.discard()
+
+    def _serve(self, request: web.Request, entry: ProxyEntry) -> web.StreamResponse:
+        remaining = max(0, int(entry.expires - time.time()))
+        headers = {"Cache-Control": f"max-age={remaining}"}
+        if_none_match = request.if_none_match
+        if if_none_match and any(
+            tag.value in (entry.digest, ETAG_ANY) for tag in if_none_match
+        ):
+            response = web.Response(status=304, headers=headers)
+            response.etag = entry.digest
+            return response
+        failed = precondition_failed(request, entry.digest)
+        if failed is not None:
+            return failed
+        body = self._cache.body(entry)
+        if body is None:
+            headers["Content-Type"] = entry.content_type
+            return AssetFileResponse(
+                self._cache.file(entry),
+                entry.digest,
+                ranged=range_allowed(request, entry.digest),
+                headers=headers,
+            )
+        response = web.Response(
+            body=body, content_type=entry.content_type, headers=headers
+        )
+        response.etag = entry.digest
+        return response
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import abc
 import asyncio
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Tuple
 
 if TYPE_CHECKING:
     from omu.connection import Address
@@ -21,6 +21,14 @@ if TYPE_CHECKING:
 
 
 class ServerListener:
+    # on_start runs as a startup stage named startup_stage (the class name by
+    # default) once every stage in startup_after has finished. Stages without
+    # dependencies run concurrently. The server fails to start if a required
+    # stage fails or is skipped.
+    startup_stage: str | None = None
+    startup_after: Tuple[str, ...] = ()
+    startup_required: bool = True
+
     async def on_start(self) -> None:
         ...
 
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Tuple, TypedDict
+
+from loguru import logger
+
+
+class StartupStageJson(TypedDict):
+    name: str
+    after: List[str]
+    required: bool
+    started: float
+    duration: float
+    skipped: bool
+    error: str | None
+
+
+class StartupReportJson(TypedDict):
+    duration: float
+    stages: List[StartupStageJson]
+
+
+@dataclass
+class StartupStage:
+    name: str
+    start: Callable[[], Awaitable[None]]
+    after: Tuple[str, ...] = ()
+    required: bool = True
+    started: float = 0.0
+    duration: float = 0.0
+    skipped: bool = False
+    error: BaseException | None = None
+
+    def to_json(self) -> StartupStageJson:
+        return StartupStageJson(
+            name=self.name,
+            after=list(self.after),
+            required=self.required,
+            started=self.started,
+            duration=self.duration,
+            skipped=self.skipped,
+            error=repr(self.error) if self.error else None,
+        )
+
+
+@dataclass
+class StartupReport:
+    duration: float = 0.0
+    stages: List[StartupStage] = field(default_factory=list)
+
+    @property
+    def failed(self) -> List[StartupStage]:
+        return [
+            stage
+            for stage in self.stages
+            if stage.required and (stage.error is not None or stage.skipped)
+        ]
+
+    def to_json(self) -> StartupReportJson:
+        return StartupReportJson(
+            duration=self.duration,
+            stages=[stage.to_json() for stage in self.stages],
+        )
+
+    def format(self) -> str:
+        lines = [f"Started in {self.duration * 1000:.1f}ms"]
+        for stage in sorted(self.stages, key=lambda stage: stage.started):
+            status = ""
+            if stage.skipped:
+                status = " (skipped)"
+            elif stage.error:
+                status = " (failed)"
+            lines.append(
+                f"  {stage.name:<20} +{stage.started * 1000:8.1f}ms"
+                f" {stage.duration * 1000:8.1f}ms{status}"
+            )
+        return "\n".join(lines)
+
+
+class StartupError(Exception):
+    def __init__(self, report: StartupReport) -> None:
+        names = ", ".join(stage.name for stage in report.failed)
+        super().__init__(f"Required startup stages did not start: {names}")
+        self.report = report
+
+
+class StartupGraph:
+    """Runs startup stages concurrently, each once its dependencies are done."""
+
+    def __init__(self) -> None:
+        self._stages: Dict[str, StartupStage] = {}
+
+    def add(
+        self,
+        name: str,
+        start: Callable[[], Awaitable[None]],
+        after: Tuple[str, ...] = (),
+        required: bool = True,
+    ) -> StartupStage:
+        if name in self._stages:
+            raise ValueError(f"Startup stage {name} already added")
+        stage = StartupStage(name, start, tuple(after), required)
+        self._stages[name] = stage
+        return stage
+
+    def _validate(self) -> None:
+        for stage in self._stages.values():
+            for dependency in stage.after:
+                if dependency not in self._stages:
+                    raise ValueError(
+                        f"Startup stage {stage.name} depends on unknown {dependency}"
+                    )
+        visiting: set[str] = set()
+        visited: set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Startup stage {name} has a dependency cycle")
+            visiting.add(name)
+            for dependency in self._stages[name].after:
+                visit(dependency)
+            visiting.remove(name)
+            visited.add(name)
+
+        for name in self._stages:
+            visit(name)
+
+    async def run(self) -> StartupReport:
+        self._validate()
+        origin = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: StartupStage) -> None:
+            try:
+                await asyncio.gather(*(tasks[name] for name in stage.after))
+            except BaseException:
+                # Dependents of a failed stage never run.
+                stage.skipped = True
+                raise
+            stage.started = time.perf_counter() - origin
+            try:
+                await stage.start()
+            except BaseException as e:
+                stage.error = e
+                raise
+            finally:
+                stage.duration = time.perf_counter() - origin - stage.started
+
+        for stage in self._stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage))
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        report = StartupReport(
+            duration=time.perf_counter() - origin,
+            stages=list(self._stages.values()),
+        )
+        for stage in report.stages:
+            if stage.error is not None:
+                logger.opt(exception=stage.error).error(
+                    f"Startup stage {stage.name} failed"
+                )
+        return report
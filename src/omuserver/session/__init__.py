@@ -1,6 +1,8 @@
+from .event_frame import EventFrame
 from .session import Session, SessionListener
 
 __all__ = [
+    "EventFrame",
     "Session",
     "SessionListener",
 ]
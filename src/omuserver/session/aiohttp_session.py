@@ -1,25 +1,41 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Any, List
 
-from aiohttp import web
+from aiohttp import WSCloseCode, web
 from loguru import logger
 from omu.event import EVENTS, EventJson, EventType
 from omu.extension.server.model.app import App
 
+from omuserver.codec import JSON_FRAME_CODEC, FrameCodec, get_frame_codec
 from omuserver.security import Permission
 from omuserver.server import Server
-from omuserver.session import Session, SessionListener
+from omuserver.session import EventFrame, Session, SessionListener
+
+from .send_queue import SendQueue, SendQueueConfig, SendQueueOverflow
+
+FLUSH_TIMEOUT = 5
 
 
 class AiohttpSession(Session):
     def __init__(
-        self, socket: web.WebSocketResponse, app: App, permissions: Permission
+        self,
+        socket: web.WebSocketResponse,
+        app: App,
+        permissions: Permission,
+        queue_config: SendQueueConfig | None = None,
+        codec: FrameCodec = JSON_FRAME_CODEC,
     ) -> None:
         self.socket = socket
         self._app = app
         self._permissions = permissions
+        self._codec = codec
         self._listeners: List[SessionListener] = []
+        self._queue = SendQueue(queue_config)
+        self._writer = asyncio.create_task(self._write())
+        self._disconnect_task: asyncio.Task | None = None
+        self._disconnected = False
 
     @property
     def app(self) -> App:
@@ -27,22 +43,71 @@ class AiohttpSession(Session):
 
     @property
     def closed(self) -> bool:
-        return self.socket.closed
+        return self._disconnected or self.socket.closed
 
     @property
     def permissions(self) -> Permission:
         return self.permissions
 
+    @property
+    def queue(self) -> SendQueue:
+        return self._queue
+
+    @property
+    def codec(self) -> FrameCodec:
+        return self._codec
+
     @classmethod
     async def create(
-        cls, server: Server, socket: web.WebSocketResponse
-    ) -> AiohttpSession:
-        event = EventJson.from_json_as(EVENTS.Connect, await socket.receive_json())
+        cls,
+        server: Server,
+        socket: web.WebSocketResponse,
+        queue_config: SendQueueConfig | None = None,
+    ) -> AiohttpSession | None:
+        msg = await socket.receive()
+        if msg.type == web.WSMsgType.BINARY:
+            codec = get_frame_codec("msgpack")
+            if codec is None:
+                await cls._reject(socket, "Binary protocol is not available")
+                return None
+            data = codec.decode(msg.data)
+        elif msg.type == web.WSMsgType.TEXT:
+            data = JSON_FRAME_CODEC.decode(msg.data)
+            codec = cls._negotiate_codec(data)
+        else:
+            await cls._reject(socket, f"Expected handshake but received {msg.type}")
+            return None
+        event = EventJson.from_json_as(EVENTS.Connect, data)
         permissions, token = await server.security.auth_app(event.app, event.token)
-        self = cls(socket, app=event.app, permissions=permissions)
+        self = cls(
+            socket,
+            app=event.app,
+            permissions=permissions,
+            queue_config=queue_config,
+            codec=codec,
+        )
         await self.send(EVENTS.Token, token)
         return self
 
+    @staticmethod
+    async def _reject(socket: web.WebSocketResponse, reason: str) -> None:
+        logger.warning(f"Rejecting session: {reason}")
+        await socket.close(
+            code=WSCloseCode.PROTOCOL_ERROR, message=reason.encode("utf-8")
+        )
+
+    @staticmethod
+    def _negotiate_codec(data: Any) -> FrameCodec:
+        connect = data.get("data") if isinstance(data, dict) else None
+        name = connect.get("protocol") if isinstance(connect, dict) else None
+        if name is None:
+            return JSON_FRAME_CODEC
+        codec = get_frame_codec(name)
+        if codec is None:
+            logger.warning(f"Protocol {name} is not available, falling back to json")
+            return JSON_FRAME_CODEC
+        return codec
+
     async def listen(self) -> None:
         try:
             while True:
@@ -59,8 +124,11 @@ class AiohttpSession(Session):
                     if msg.data is None:
                         logger.warning(f"Received empty message {msg}")
                         continue
-                    json = msg.json()
-                    event = EventJson.from_json(json)
+                    if msg.type == web.WSMsgType.BINARY:
+                        data = self._codec.decode(msg.data)
+                    else:
+                        data = JSON_FRAME_CODEC.decode(msg.data)
+                    event = EventJson.from_json(data)
                     for listener in self._listeners:
                         await listener.on_event(self, event)
                 except RuntimeError:
@@ -68,7 +136,48 @@ class AiohttpSession(Session):
         finally:
             await self.disconnect()
 
+    async def _write(self) -> None:
+        try:
+            while True:
+                batch = await self._queue.get_batch()
+                if not batch:
+                    break
+                # The protocol is one event per message, so frames are still
+                # sent one by one. aiohttp only waits on the transport when
+                # it is paused, so a batch is buffered without yielding.
+                for _, payload in batch:
+                    if isinstance(payload, bytes):
+                        await self.socket.send_bytes(payload)
+                    else:
+                        await self.socket.send_str(payload)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to write to {self}: {e}")
+            self._schedule_disconnect()
+
+    async def _flush(self) -> None:
+        if self.socket.closed:
+            self._writer.cancel()
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._writer), FLUSH_TIMEOUT)
+        except TimeoutError:
+            logger.warning(f"Timed out flushing {len(self._queue)} frames to {self}")
+            self._writer.cancel()
+
+    def _schedule_disconnect(self) -> None:
+        if self._disconnect_task is not None:
+            return
+        self._disconnect_task = asyncio.create_task(self.disconnect())
+
     async def disconnect(self) -> None:
+        if self._disconnected:
+            return
+        self._disconnected = True
+        self._queue.close()
+        if self._writer is not asyncio.current_task():
+            await self._flush()
         try:
             await self.socket.close()
         except Exception:
@@ -77,14 +186,16 @@ class AiohttpSession(Session):
             await listener.on_disconnected(self)
 
     async def send[T](self, type: EventType[Any, T], data: T) -> None:
+        await self.send_frame(EventFrame(type, data))
+
+    async def send_frame(self, frame: EventFrame) -> None:
         if self.closed:
             raise ValueError("Socket is closed")
-        await self.socket.send_json(
-            {
-                "type": type.type,
-                "data": type.serializer.serialize(data),
-            }
-        )
+        try:
+            self._queue.put(frame.type, frame.encode(self._codec))
+        except SendQueueOverflow as e:
+            logger.warning(f"Disconnecting {self}: {e}")
+            self._schedule_disconnect()
 
     def add_listener(self, listener: SessionListener) -> None:
         self._listeners.append(listener)
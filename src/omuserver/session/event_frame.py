@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict
+
+from omuserver.codec import JSON_FRAME_CODEC, FrameCodec
+
+if TYPE_CHECKING:
+    from omu.event import EventType
+
+
+class EventFrame[T]:
+    def __init__(self, type: EventType[Any, T], data: T) -> None:
+        self.type = type.type
+        self.data = type.serializer.serialize(data)
+        self._encoded: Dict[str, str | bytes] = {}
+
+    def encode(self, codec: FrameCodec) -> str | bytes:
+        encoded = self._encoded.get(codec.name)
+        if encoded is None:
+            encoded = codec.encode({"type": self.type, "data": self.data})
+            self._encoded[codec.name] = encoded
+        return encoded
+
+    @property
+    def text(self) -> str:
+        text = self.encode(JSON_FRAME_CODEC)
+        assert isinstance(text, str)
+        return text
+
+    def __repr__(self) -> str:
+        return f"EventFrame({self.type})"
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, List, Literal, Set, Tuple
+
+type OverflowPolicy = Literal["drop_oldest", "drop_type", "disconnect"]
+type Frame = Tuple[str, str | bytes]
+
+
+@dataclass
+class SendQueueConfig:
+    max_size: int = 1024
+    max_batch: int = 64
+    overflow: OverflowPolicy = "disconnect"
+    droppable: Set[str] = field(default_factory=set)
+
+
+class SendQueueOverflow(Exception):
+    pass
+
+
+class SendQueue:
+    def __init__(self, config: SendQueueConfig | None = None) -> None:
+        self._config = config or SendQueueConfig()
+        self._frames: Deque[Frame] = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+        self.dropped = 0
+
+    @property
+    def config(self) -> SendQueueConfig:
+        return self._config
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def put(self, type: str, payload: str | bytes) -> None:
+        if self._closed:
+            raise SendQueueOverflow("Send queue is closed")
+        if len(self._frames) >= self._config.max_size:
+            if not self._make_room(type):
+                self.dropped += 1
+                return
+        self._frames.append((type, payload))
+        self._ready.set()
+
+    def _make_room(self, type: str) -> bool:
+        policy = self._config.overflow
+        if policy == "drop_oldest":
+            self._frames.popleft()
+            self.dropped += 1
+            return True
+        if policy == "drop_type":
+            droppable = self._config.droppable
+            for index, (queued_type, _) in enumerate(self._frames):
+                if queued_type in droppable:
+                    del self._frames[index]
+                    self.dropped += 1
+                    return True
+            if type in droppable:
+                return False
+        self.close(discard=True)
+        raise SendQueueOverflow(
+            f"Send queue overflowed with {len(self._frames)} pending frames"
+        )
+
+    async def get_batch(self) -> List[Frame]:
+        while not self._frames:
+            if self._closed:
+                return []
+            self._ready.clear()
+            await self._ready.wait()
+        batch: List[Frame] = []
+        while self._frames and len(batch) < self._config.max_batch:
+            batch.append(self._frames.popleft())
+        return batch
+
+    def close(self, discard: bool = False) -> None:
+        # Frames already queued are still handed out by get_batch unless
+        # they are discarded, so a graceful close delivers them.
+        self._closed = True
+        if discard:
+            self._frames.clear()
+        self._ready.set()
@@ -9,6 +9,8 @@ if TYPE_CHECKING:
 
     from omuserver.security import Permission
 
+    from .event_frame import EventFrame
+
 
 class Session(abc.ABC):
     @property
@@ -38,6 +40,10 @@ class Session(abc.ABC):
     async def send[T](self, type: EventType[Any, T], data: T) -> None:
         ...
 
+    @abc.abstractmethod
+    async def send_frame(self, frame: EventFrame) -> None:
+        ...
+
     @abc.abstractmethod
     def add_listener(self, listener: SessionListener) -> None:
         ...
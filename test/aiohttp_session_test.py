@@ -0,0 +1,109 @@
+import asyncio
+import json
+from typing import List
+
+from aiohttp import WSCloseCode, WSMsgType, web
+from aiohttp.test_utils import TestClient, TestServer
+
+from omuserver.codec import JsonFrameCodec
+
+APP = {"name": "test", "group": "test", "version": "1"}
+
+
+class BinaryJsonCodec(JsonFrameCodec):
+    @property
+    def name(self) -> str:
+        return "msgpack"
+
+    @property
+    def binary(self) -> bool:
+        return True
+
+    def encode(self, data) -> bytes:
+        return super().encode(data).encode("utf-8")
+
+
+class FakeSecurity:
+    async def auth_app(self, app, token):
+        return None, "token"
+
+
+class FakeServer:
+    security = FakeSecurity()
+
+
+def connect(messages, sessions: List):
+    from omuserver.session.aiohttp_session import AiohttpSession
+
+    async def handler(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        session = await AiohttpSession.create(FakeServer(), ws)  # type: ignore
+        sessions.append(session)
+        if session is not None:
+            await session.disconnect()
+        return ws
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/ws", handler)
+        async with TestClient(TestServer(app)) as client:
+            ws = await client.ws_connect("/ws")
+            for message in messages:
+                if isinstance(message, bytes):
+                    await ws.send_bytes(message)
+                else:
+                    await ws.send_str(json.dumps(message))
+            received = [await ws.receive() for _ in range(2)]
+            await ws.close()
+            return received
+
+    return asyncio.run(run())
+
+
+def handshake(protocol: str | None):
+    data = {"app": APP, "token": None}
+    if protocol is not None:
+        data["protocol"] = protocol
+    return {"type": ":connect", "data": data}
+
+
+def test_handshake_json():
+    sessions = []
+    received = connect([handshake(None)], sessions)
+    assert sessions[0].codec.name == "json"
+    assert received[0].type == WSMsgType.TEXT
+    assert json.loads(received[0].data) == {"type": ":token", "data": "token"}
+
+
+def test_handshake_negotiates_codec(monkeypatch):
+    from omuserver.session import aiohttp_session
+
+    codec = BinaryJsonCodec()
+    monkeypatch.setattr(
+        aiohttp_session,
+        "get_frame_codec",
+        lambda name: codec if name == "msgpack" else None,
+    )
+    sessions = []
+    received = connect([handshake("msgpack")], sessions)
+    assert sessions[0].codec is codec
+    assert received[0].type == WSMsgType.BINARY
+    assert json.loads(received[0].data) == {"type": ":token", "data": "token"}
+
+    # Unknown protocols fall back to json.
+    sessions = []
+    received = connect([handshake("unknown")], sessions)
+    assert sessions[0].codec.name == "json"
+    assert received[0].type == WSMsgType.TEXT
+
+
+def test_handshake_binary_unavailable(monkeypatch):
+    from omuserver.session import aiohttp_session
+
+    monkeypatch.setattr(aiohttp_session, "get_frame_codec", lambda name: None)
+    sessions = []
+    received = connect([b"\x82"], sessions)
+    assert sessions == [None]
+    assert received[0].type == WSMsgType.CLOSE
+    assert received[0].data == WSCloseCode.PROTOCOL_ERROR
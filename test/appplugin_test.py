@@ -0,0 +1,68 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from loguru import logger
+from omu.connection import Address
+
+from omuserver.extension.plugin.plugin.appplugin import AppPlugin, PluginProcessError
+
+
+class FakeSecurity:
+    def __init__(self) -> None:
+        self.tokens = {}
+
+    async def add_temporary_permissions(self, token, permissions) -> None:
+        self.tokens[token] = permissions
+
+    async def remove_permissions(self, token) -> None:
+        self.tokens.pop(token, None)
+
+
+class FakeServer:
+    def __init__(self) -> None:
+        self.address = Address("0.0.0.0", 26423)
+        self.security = FakeSecurity()
+
+
+def test_appplugin_process(tmp_path: Path):
+    (tmp_path / "main.py").write_text(
+        "import os, sys\n"
+        "print(os.environ['OMU_SERVER_HOST'], os.environ['OMU_SERVER_PORT'])\n"
+        "print('token' if os.environ['OMU_TOKEN'] else 'none')\n"
+        "print('oops', file=sys.stderr)\n"
+    )
+    server = FakeServer()
+    messages = []
+    sink = logger.add(lambda message: messages.append(message.record["message"]))
+
+    async def run():
+        plugin = await AppPlugin.create(tmp_path, server)  # type: ignore
+        await plugin.start()
+
+    try:
+        asyncio.run(run())
+    finally:
+        logger.remove(sink)
+    name = tmp_path.name
+    assert f"[{name}] 127.0.0.1 26423" in messages
+    assert f"[{name}] token" in messages
+    assert f"[{name}] oops" in messages
+    assert server.security.tokens == {}
+
+
+def test_appplugin_exit_code(tmp_path: Path):
+    (tmp_path / "main.py").write_text("import sys\nsys.exit(3)\n")
+    server = FakeServer()
+
+    async def run():
+        plugin = await AppPlugin.create(tmp_path, server)  # type: ignore
+        await plugin.start()
+
+    with pytest.raises(PluginProcessError):
+        asyncio.run(run())
+
+
+def test_appplugin_requires_main(tmp_path: Path):
+    with pytest.raises(ValueError):
+        asyncio.run(AppPlugin.create(tmp_path, FakeServer()))  # type: ignore
@@ -0,0 +1,237 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from omuserver.extension.asset.asset_extension import AssetExtension
+
+
+class FakeSecurity:
+    async def get_permissions(self, token):
+        if token != "secret":
+            raise KeyError(token)
+        return object()
+
+
+class FakeEndpoints:
+    def bind_endpoint(self, type, callback) -> None:
+        pass
+
+
+class FakeNetwork:
+    def __init__(self) -> None:
+        self.app = web.Application()
+
+    def add_http_route(self, path, handle, methods=("GET",)) -> None:
+        for method in methods:
+            self.app.router.add_route(method, path, handle)
+
+
+class FakeDirectories:
+    def __init__(self, assets: Path) -> None:
+        self.assets = assets
+
+    def get(self, name: str) -> Path:
+        path = self.assets.parent / f"{self.assets.name}-{name}"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+
+class FakeServer:
+    def __init__(self, assets: Path) -> None:
+        self.security = FakeSecurity()
+        self.endpoints = FakeEndpoints()
+        self.network = FakeNetwork()
+        self.directories = FakeDirectories(assets)
+
+    def add_listener(self, listener) -> None:
+        pass
+
+
+def test_asset_upload(tmp_path: Path):
+    server = FakeServer(tmp_path)
+    AssetExtension(server)  # type: ignore
+    data = bytes(range(256)) * 4096
+
+    async def run():
+        async with TestClient(TestServer(server.network.app)) as client:
+            resp = await client.put("/assets", params={"path": "a/b.bin"}, data=data)
+            assert resp.status == 401
+            resp = await client.put(
+                "/assets", params={"path": "a/b.bin", "token": "secret"}, data=data
+            )
+            assert resp.status == 401
+            resp = await client.put(
+                "/assets",
+                params={"path": "a/b.bin"},
+                headers={"Authorization": "Bearer secret"},
+                data=data,
+            )
+            assert resp.status == 200
+            assert await resp.json() == {"path": "a/b.bin", "size": len(data)}
+            resp = await client.post(
+                "/assets",
+                params={"path": "../escape.bin"},
+                headers={"Authorization": "Bearer secret"},
+                data=data,
+            )
+            assert resp.status == 400
+
+    asyncio.run(run())
+    assert (tmp_path / "a" / "b.bin").read_bytes() == data
+    # The temporary file is renamed into place, nothing is left behind.
+    assert [path.name for path in (tmp_path / "a").iterdir()] == ["b.bin"]
+    assert not (tmp_path.parent / "escape.bin").exists()
+
+
+def test_asset_upload_endpoint(tmp_path: Path):
+    server = FakeServer(tmp_path)
+    extension = AssetExtension(server)  # type: ignore
+
+    async def run():
+        return await extension._on_upload(
+            None,  # type: ignore
+            {"x.txt": "aGVsbG8=", "y.txt": b"world"},
+        )
+
+    assert asyncio.run(run()) == ["x.txt", "y.txt"]
+    assert (tmp_path / "x.txt").read_bytes() == b"hello"
+    assert (tmp_path / "y.txt").read_bytes() == b"world"
+
+
+def test_asset_download(tmp_path: Path):
+    server = FakeServer(tmp_path)
+    AssetExtension(server)  # type: ignore
+    (tmp_path / "image.png").write_bytes(b"0123456789")
+
+    async def run():
+        async with TestClient(TestServer(server.network.app)) as client:
+            resp = await client.get("/assets", params={"path": "image.png"})
+            assert resp.status == 200
+            assert await resp.read() == b"0123456789"
+            assert resp.headers["Cache-Control"] == "no-cache"
+            etag = resp.headers["ETag"]
+            version = etag.strip('"')
+
+            resp = await client.get(
+                "/assets",
+                params={"path": "image.png"},
+                headers={"If-None-Match": etag},
+            )
+            assert resp.status == 304
+            assert resp.headers["ETag"] == etag
+
+            resp = await client.get(
+                "/assets",
+                params={"path": "image.png"},
+                headers={"Range": "bytes=2-4"},
+            )
+            assert resp.status == 206
+            assert await resp.read() == b"234"
+            assert resp.headers["ETag"] == etag
+
+            resp = await client.get(
+                "/assets", params={"path": "image.png", "v": version}
+            )
+            assert "immutable" in resp.headers["Cache-Control"]
+
+            resp = await client.get("/assets", params={"path": "missing.png"})
+            assert resp.status == 404
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("size", [16, 300 * 1024])
+def test_asset_preconditions(tmp_path: Path, size: int):
+    # Small files are served from memory, large ones through FileResponse.
+    server = FakeServer(tmp_path)
+    AssetExtension(server)  # type: ignore
+    (tmp_path / "clip.bin").write_bytes(b"a" * size)
+
+    async def run():
+        async with TestClient(TestServer(server.network.app)) as client:
+
+            async def get(**headers):
+                resp = await client.get(
+                    "/assets", params={"path": "clip.bin"}, headers=headers
+                )
+                return resp, await resp.read()
+
+            resp, _ = await get()
+            stale = resp.headers["ETag"]
+            await client.put(
+                "/assets",
+                params={"path": "clip.bin"},
+                headers={"Authorization": "Bearer secret"},
+                data=b"b" * size,
+            )
+            resp, _ = await get(**{"If-Match": stale})
+            assert resp.status == 412
+
+            # A stale If-Range must not splice ranges of the new content onto
+            # what the client already has.
+            resp, body = await get(Range="bytes=0-3", **{"If-Range": stale})
+            assert resp.status == 200
+            assert body == b"b" * size
+            current = resp.headers["ETag"]
+            resp, body = await get(Range="bytes=0-3", **{"If-Range": current})
+            assert resp.status == 206
+            assert body == b"bbbb"
+
+            resp, body = await get(**{"If-Match": current})
+            assert resp.status == 200
+            assert body == b"b" * size
+
+    asyncio.run(run())
+
+
+def test_asset_hot_cache(tmp_path: Path):
+    server = FakeServer(tmp_path)
+    extension = AssetExtension(server)  # type: ignore
+    (tmp_path / "badge.png").write_bytes(b"old")
+
+    async def run():
+        async with TestClient(TestServer(server.network.app)) as client:
+            for _ in range(3):
+                resp = await client.get("/assets", params={"path": "badge.png"})
+                assert await resp.read() == b"old"
+            resp = await client.put(
+                "/assets",
+                params={"path": "badge.png"},
+                headers={"Authorization": "Bearer secret"},
+                data=b"new",
+            )
+            assert resp.status == 200
+            resp = await client.get("/assets", params={"path": "badge.png"})
+            assert await resp.read() == b"new"
+
+    asyncio.run(run())
+    stats = extension._cache.to_json()
+    assert stats["files"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["bytes_from_memory"] == 12
+    assert stats["bytes_from_disk"] == 0
+
+
+def test_asset_image_without_pillow(tmp_path: Path):
+    server = FakeServer(tmp_path)
+    extension = AssetExtension(server)  # type: ignore
+    extension.images._available = False
+    (tmp_path / "emote.png").write_bytes(b"not really a png")
+
+    async def run():
+        async with TestClient(TestServer(server.network.app)) as client:
+            resp = await client.get(
+                "/assets", params={"path": "emote.png", "width": "24"}
+            )
+            assert resp.status == 200
+            assert await resp.read() == b"not really a png"
+            resp = await client.get(
+                "/assets", params={"path": "emote.png", "width": "-1"}
+            )
+            assert resp.status == 400
+
+    asyncio.run(run())
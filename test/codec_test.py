@@ -0,0 +1,46 @@
+def test_json_codecs_roundtrip():
+    from omuserver.codec.json_codec import CODECS
+
+    data = {
+        "id": "message-1",
+        "content": {"type": "text", "text": "こんにちは 👋"},
+        "amount": 2**70,
+        "paid": None,
+        "tags": [1, 2.5, True],
+    }
+    for name, codec_type in CODECS.items():
+        try:
+            codec = codec_type()
+        except ImportError:
+            continue
+        assert codec.loads(codec.dumps(data)) == data, name
+        assert codec.loads(codec.dumps_bytes(data)) == data, name
+
+
+def test_create_json_codec_unknown():
+    from omuserver.codec import create_json_codec
+
+    try:
+        create_json_codec("unknown")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError")
+
+
+def test_frame_codecs():
+    from omuserver.codec import JSON_FRAME_CODEC, get_frame_codec
+
+    frame = {"type": "asset:upload", "data": {"image.png": "aGVsbG8="}}
+    encoded = JSON_FRAME_CODEC.encode(frame)
+    assert isinstance(encoded, str)
+    assert JSON_FRAME_CODEC.decode(encoded) == frame
+    assert get_frame_codec("cbor") is None
+
+    msgpack = get_frame_codec("msgpack")
+    if msgpack is None:
+        return
+    frame = {"type": "asset:upload", "data": {"image.png": b"\x89PNG"}}
+    encoded = msgpack.encode(frame)
+    assert isinstance(encoded, bytes)
+    assert msgpack.decode(encoded) == frame
@@ -0,0 +1,29 @@
+from pathlib import Path
+from typing import Callable, Dict
+
+import pytest
+
+from omuserver.extension.table.cached_table import CachedTable
+
+type TableFactory = Callable[[str, Dict], CachedTable]
+
+
+@pytest.fixture(params=[False, True], ids=["dict", "sqlite"])
+def create_table(request: pytest.FixtureRequest, tmp_path: Path) -> TableFactory:
+    """Creates a CachedTable named `name` with `config`, backed by each of the
+    dict and sqlite adapters in turn."""
+    from omu.extension.table.model import TableInfo
+    from omu.interface import Serializer
+
+    from omuserver.extension.table.adapters import (
+        DictTableAdapter,
+        SqliteTableAdapter,
+    )
+
+    def create(name: str, config: Dict) -> CachedTable:
+        info = TableInfo(owner="test", name=name)
+        cls = SqliteTableAdapter if request.param else DictTableAdapter
+        adapter = cls.create(tmp_path, config)  # type: ignore
+        return CachedTable(None, info, Serializer.noop(), adapter, config)  # type: ignore
+
+    return create
@@ -0,0 +1,168 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+
+def test_dict_table_journal(tmp_path: Path):
+    from omuserver.extension.table.adapters import DictTableAdapter
+
+    async def run():
+        table = DictTableAdapter.create(tmp_path)
+        await table.load()
+        await table.set_all({"a": 1, "b": 2, "c": 3})
+        await table.store()
+        await table.remove_all(["b"])
+        await table.set_all({"a": 10})
+        await table.store()
+        assert not (tmp_path / "data.json").exists()
+
+        table = DictTableAdapter.create(tmp_path)
+        await table.load()
+        assert await table.get_all(["a", "b", "c"]) == {"a": 10, "c": 3}
+
+        await table.clear()
+        await table.set_all({"d": 4})
+        await table.store()
+        table = DictTableAdapter.create(tmp_path)
+        await table.load()
+        assert await table.size() == 1
+
+    asyncio.run(run())
+
+
+def test_dict_table_journal_compaction(tmp_path: Path, monkeypatch):
+    from omuserver.extension.table.adapters import DictTableAdapter, journal
+
+    monkeypatch.setattr(journal, "COMPACT_MIN_BYTES", 64)
+
+    async def run():
+        table = DictTableAdapter.create(tmp_path)
+        await table.load()
+        for i in range(20):
+            await table.set_all({f"key{i}": {"value": i}})
+            await table.store()
+        assert (tmp_path / "data.json").exists()
+        assert (tmp_path / "data.journal").stat().st_size < 200
+
+        with (tmp_path / "data.journal").open("ab") as file:
+            file.write(b'["set", {"trunc')
+        table = DictTableAdapter.create(tmp_path)
+        await table.load()
+        assert await table.size() == 20
+        assert await table.get("key19") == {"value": 19}
+        await table.set_all({"key20": {"value": 20}})
+        await table.store()
+        table = DictTableAdapter.create(tmp_path)
+        await table.load()
+        assert await table.size() == 21
+
+    asyncio.run(run())
+
+
+def test_dict_table_fetch(tmp_path: Path):
+    from omuserver.extension.table.adapters import DictTableAdapter
+
+    async def run():
+        table = DictTableAdapter.create(tmp_path)
+        await table.load()
+        await table.set_all({f"key{i}": i for i in range(10)})
+        await table.remove_all(["key0", "key5", "key9"])
+        assert await table.first() == "key1"
+        assert await table.last() == "key8"
+        items = await table.fetch(before=3, after=None, cursor=None)
+        assert list(items.keys()) == ["key8", "key7", "key6"]
+        items = await table.fetch(before=3, after=None, cursor="key6")
+        assert list(items.keys()) == ["key6", "key4", "key3"]
+        items = await table.fetch(before=None, after=2, cursor="key4")
+        assert list(items.keys()) == ["key6", "key4"]
+        items = await table.fetch(before=None, after=2, cursor=None)
+        assert list(items.keys()) == ["key2", "key1"]
+
+    asyncio.run(run())
+
+
+def test_dict_table_index_compaction(monkeypatch):
+    from omuserver.extension.table.adapters import dicttable
+
+    monkeypatch.setattr(dicttable, "COMPACT_MIN_TOMBSTONES", 2)
+    index = dicttable.OrderedIndex(["a", "b", "c", "d"])
+    index.remove("a")
+    index.remove("b")
+    index.remove("c")
+    assert index.end == 1
+    assert index.first() == "d"
+    index.remove("d")
+    assert index.first() is None
+    index.add("e")
+    assert index.first() == "e"
+    assert index.last() == "e"
+
+
+def test_dict_table_iterate(tmp_path: Path, monkeypatch):
+    from omuserver.extension.table.adapters import DictTableAdapter, dicttable
+
+    monkeypatch.setattr(dicttable, "COMPACT_MIN_TOMBSTONES", 2)
+
+    async def run():
+        table = DictTableAdapter.create(tmp_path)
+        await table.load()
+        await table.set_all({f"key{i}": i for i in range(10)})
+        keys = []
+        async for key, _ in table.iterate(batch_size=3):
+            keys.append(key)
+            if key == "key3":
+                # compacts the index while the iterator is suspended
+                await table.remove_all(["key0", "key1", "key2", "key5", "key6", "key8"])
+        assert keys == ["key0", "key1", "key2", "key3", "key4", "key7", "key9"]
+        assert table._index.end == 4
+
+    asyncio.run(run())
+
+
+def test_journal_encodes_on_change(tmp_path: Path):
+    from omuserver.extension.table.adapters.journal import TableJournal
+
+    async def run():
+        journal = TableJournal(tmp_path / "data.json", tmp_path / "data.journal")
+        item = {"text": "before"}
+        journal.set({"a": item})
+        item["text"] = "after"
+        await journal.flush({"a": item})
+        return await TableJournal(
+            tmp_path / "data.json", tmp_path / "data.journal"
+        ).load()
+
+    assert asyncio.run(run()) == {"a": {"text": "before"}}
+
+
+def test_journal_append_failure(tmp_path: Path, monkeypatch):
+    from omuserver.extension.table.adapters.journal import TableJournal
+
+    def torn_append(self, lines: bytes, size: int) -> None:
+        with self._journal.open("ab") as file:
+            file.write(lines[: len(lines) // 2])
+        raise OSError("No space left on device")
+
+    async def run():
+        journal = TableJournal(tmp_path / "data.json", tmp_path / "data.journal")
+        journal.set({"a": 1})
+        await journal.flush({"a": 1})
+
+        # A failed append keeps its records and its torn tail is cut off by
+        # the next one.
+        append = TableJournal._append
+        monkeypatch.setattr(TableJournal, "_append", torn_append)
+        journal.set({"b": 2})
+        with pytest.raises(OSError):
+            await journal.flush({"a": 1, "b": 2})
+        assert journal.pending == 1
+        monkeypatch.setattr(TableJournal, "_append", append)
+        journal.set({"c": 3})
+        await journal.flush({"a": 1, "b": 2, "c": 3})
+        assert journal.pending == 0
+        return await TableJournal(
+            tmp_path / "data.json", tmp_path / "data.journal"
+        ).load()
+
+    assert asyncio.run(run()) == {"a": 1, "b": 2, "c": 3}
@@ -0,0 +1,135 @@
+import asyncio
+
+from conftest import TableFactory
+
+
+def test_dispatcher_orders_lanes():
+    from omuserver.event.event_dispatcher import DispatchConfig, SessionDispatcher
+
+    async def run():
+        dispatcher = SessionDispatcher(DispatchConfig(max_in_flight=8))
+        log = []
+        slow = asyncio.Event()
+
+        def handler(name, wait=None):
+            async def handle():
+                if wait is not None:
+                    await wait.wait()
+                log.append(name)
+
+            return handle
+
+        await dispatcher.dispatch("a", "ordered", handler("a1", slow))
+        await dispatcher.dispatch("a", "ordered", handler("a2"))
+        await dispatcher.dispatch("b", "ordered", handler("b1"))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert log == ["b1"]
+        slow.set()
+        await dispatcher.dispatch("c", "strict", handler("c1"))
+        assert log == ["b1", "a1", "a2", "c1"]
+        assert dispatcher.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_dispatcher_sequential():
+    from omuserver.event.event_dispatcher import DispatchConfig, SessionDispatcher
+
+    async def run():
+        dispatcher = SessionDispatcher(DispatchConfig(mode="sequential"))
+        log = []
+
+        async def handle():
+            await asyncio.sleep(0)
+            log.append(1)
+
+        await dispatcher.dispatch("a", "unordered", handle)
+        assert log == [1]
+
+    asyncio.run(run())
+
+
+def test_dispatcher_causal():
+    from omuserver.event.event_dispatcher import DispatchConfig, SessionDispatcher
+
+    async def run():
+        dispatcher = SessionDispatcher(DispatchConfig(max_in_flight=8))
+        log = []
+        write = asyncio.Event()
+
+        def handler(name, wait=None):
+            async def handle():
+                if wait is not None:
+                    await wait.wait()
+                log.append(name)
+
+            return handle
+
+        # A read waits for the write sent before it, but not for later events.
+        await dispatcher.dispatch("table:item", "ordered", handler("add", write))
+        await dispatcher.dispatch("endpoint", "causal", handler("fetch"))
+        await dispatcher.dispatch("registry", "ordered", handler("set"))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert log == ["set"]
+        write.set()
+        await dispatcher.join()
+        assert log == ["set", "add", "fetch"]
+
+        # Closing finishes pending writes and drops reads not yet started.
+        write.clear()
+        await dispatcher.dispatch("table:item", "ordered", handler("add2", write))
+        await dispatcher.dispatch("endpoint", "causal", handler("fetch2"))
+        close = asyncio.create_task(dispatcher.close())
+        await asyncio.sleep(0)
+        assert not close.done()
+        write.set()
+        await close
+        await dispatcher.join()
+        assert log == ["set", "add", "fetch", "add2"]
+        assert dispatcher.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_registry_disconnect_keeps_writes(create_table: TableFactory):
+    from omu.event import EventJson, JsonEventType
+    from omu.interface import Serializer
+
+    from omuserver.event.event_registry import EventRegistry
+
+    class FakeNetwork:
+        def add_listener(self, listener) -> None:
+            pass
+
+    class FakeServer:
+        network = FakeNetwork()
+
+    class FakeSession:
+        def add_listener(self, listener) -> None:
+            pass
+
+    async def run():
+        table = create_table("events", {})
+        registry = EventRegistry(FakeServer())  # type: ignore
+        event_type = JsonEventType("test", "add", Serializer.noop())
+        registry.register(event_type)
+        written = asyncio.Event()
+
+        async def on_add(session, items) -> None:
+            await asyncio.sleep(0.01)
+            await table.add(items)
+            written.set()
+
+        registry.add_listener(event_type, on_add)
+        session = FakeSession()
+        await registry.on_connected(session)  # type: ignore
+        # The client sends an add and closes its socket right after.
+        await registry.on_event(session, EventJson(event_type.type, {"a": 1}))  # type: ignore
+        await registry.on_disconnected(session)  # type: ignore
+        assert written.is_set()
+        assert await table.get("a") == 1
+        await table.close()
+
+    asyncio.run(run())
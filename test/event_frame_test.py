@@ -0,0 +1,71 @@
+import asyncio
+from typing import List
+
+
+def test_event_frame_broadcast_encodes_once():
+    from omu.extension.table.model import TableInfo
+    from omu.extension.table.table_extension import TableItemAddEvent
+    from omu.interface import Serializer
+
+    from omuserver.codec import JsonFrameCodec
+    from omuserver.extension.table.session_table_handler import (
+        SessionTableListener,
+    )
+    from omuserver.session import EventFrame, Session
+
+    class CountingCodec(JsonFrameCodec):
+        def __init__(self) -> None:
+            self.encoded = 0
+
+        def encode(self, data):
+            self.encoded += 1
+            return super().encode(data)
+
+    codec = CountingCodec()
+
+    class FakeSession(Session):
+        def __init__(self) -> None:
+            self.written: List[str | bytes] = []
+
+        @property
+        def app(self):
+            raise NotImplementedError
+
+        @property
+        def closed(self) -> bool:
+            return False
+
+        @property
+        def permissions(self):
+            raise NotImplementedError
+
+        async def disconnect(self) -> None:
+            pass
+
+        async def listen(self) -> None:
+            pass
+
+        async def send(self, type, data) -> None:
+            await self.send_frame(EventFrame(type, data))
+
+        async def send_frame(self, frame: EventFrame) -> None:
+            self.written.append(frame.encode(codec))
+
+        def add_listener(self, listener) -> None:
+            pass
+
+        def remove_listener(self, listener) -> None:
+            pass
+
+    info = TableInfo(owner="test", name="chat")
+    listener = SessionTableListener(info, Serializer.noop())
+    sessions = [FakeSession() for _ in range(8)]
+    for session in sessions:
+        listener.add_session(session)
+
+    asyncio.run(listener.on_add({"a": {"text": "hello"}}))
+    assert codec.encoded == 1
+    payloads = [session.written for session in sessions]
+    assert all(payload == payloads[0] for payload in payloads)
+    assert len(payloads[0]) == 1
+    assert TableItemAddEvent.type in payloads[0][0]
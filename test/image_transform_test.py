@@ -0,0 +1,109 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from omuserver.extension.asset.image_transform import (
+    ImageTransform,
+    ImageVariants,
+    fit,
+)
+
+
+def test_image_transform_parse():
+    assert ImageTransform.parse({}) is None
+    assert ImageTransform.parse({"width": "24"}) == ImageTransform(width=24)
+    assert ImageTransform.parse({"height": "24", "format": "JPG"}) == ImageTransform(
+        height=24, format="jpeg"
+    )
+    for query in ({"width": "0"}, {"width": "x"}, {"format": "bmp"}):
+        with pytest.raises(ValueError):
+            ImageTransform.parse(query)
+
+
+def test_image_fit():
+    assert fit((112, 56), 24, None) == (24, 12)
+    assert fit((112, 56), 24, 6) == (12, 6)
+    # Images are never upscaled.
+    assert fit((16, 16), 24, 24) == (16, 16)
+
+
+def test_image_variants(tmp_path: Path):
+    Image = pytest.importorskip("PIL.Image")
+    source = tmp_path / "emote.png"
+    Image.new("RGBA", (112, 112), (255, 0, 0, 255)).save(source)
+
+    async def run():
+        variants = ImageVariants(tmp_path / "variants", workers=1)
+        try:
+            transform = ImageTransform(width=28, format="webp")
+            first = await variants.get(source, "digest", transform)
+            second = await variants.get(source, "digest", transform)
+            return first, second
+        finally:
+            variants.close()
+
+    first, second = asyncio.run(run())
+    assert first is not None and first == second
+    path, content_type = first
+    assert content_type == "image/webp"
+    with Image.open(path) as image:
+        assert image.size == (28, 28)
+
+
+def test_image_variants_failure(tmp_path: Path):
+    source = tmp_path / "emote.png"
+    source.write_bytes(b"not an image")
+
+    async def run():
+        variants = ImageVariants(tmp_path / "variants", workers=1)
+        # Runs the worker even without Pillow, where it fails to import.
+        variants._available = True
+        try:
+            transform = ImageTransform(width=28)
+            assert await variants.get(source, "digest", transform) is None
+            pool = variants._pool
+            # Failures are remembered instead of starting a new transform.
+            variants._pool = None
+            assert await variants.get(source, "digest", transform) is None
+            assert variants._pool is None
+            variants._pool = pool
+        finally:
+            variants.close()
+
+    asyncio.run(run())
+
+
+def test_image_variants_frame_limit(tmp_path: Path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    from omuserver.extension.asset import image_transform
+
+    source = tmp_path / "spam.gif"
+    frames = [Image.new("RGB", (8, 8), (i, 0, 0)) for i in range(8)]
+    frames[0].save(source, save_all=True, append_images=frames[1:])
+    monkeypatch.setattr(image_transform, "MAX_FRAMES", 4)
+
+    with pytest.raises(ValueError):
+        image_transform.transform_image(
+            str(source), str(tmp_path / "out.gif"), ImageTransform(width=4)
+        )
+
+
+def test_image_variants_concurrent_load(tmp_path: Path):
+    path = tmp_path / "variants"
+    path.mkdir()
+    (path / "cached.webp").write_bytes(b"x" * 16)
+
+    async def run():
+        variants = ImageVariants(path, workers=1)
+
+        async def load():
+            # Every caller sees the index of what is already on disk.
+            await variants._load()
+            return list(variants._variants)
+
+        return variants, await asyncio.gather(load(), load())
+
+    variants, indexes = asyncio.run(run())
+    assert indexes == [["cached"], ["cached"]]
+    assert variants._bytes == 16
@@ -0,0 +1,93 @@
+import asyncio
+from pathlib import Path
+
+from omuserver.extension.plugin.plugin import Plugin
+from omuserver.extension.plugin.plugin_supervisor import PluginBudget, PluginSupervisor
+
+
+class FakePlugin(Plugin):
+    def __init__(self, main) -> None:
+        self._main = main
+
+    @classmethod
+    async def create(cls, path, server):
+        raise NotImplementedError
+
+    async def load(self) -> None:
+        pass
+
+    async def start(self) -> None:
+        await self._main()
+
+
+BUDGET = PluginBudget(init_timeout=0.05, max_restarts=2, backoff=0.01)
+
+
+def test_plugin_supervisor_restarts():
+    runs = []
+
+    async def main():
+        runs.append(len(runs))
+        if len(runs) < 2:
+            raise RuntimeError("crash")
+
+    async def load(path: Path) -> Plugin:
+        return FakePlugin(main)
+
+    async def run():
+        supervisor = PluginSupervisor(Path("crashy"), load, BUDGET)
+        supervisor.start()
+        await supervisor.wait_started()
+        for _ in range(100):
+            if supervisor.state == "stopped":
+                break
+            await asyncio.sleep(0.01)
+        return supervisor
+
+    supervisor = asyncio.run(run())
+    assert runs == [0, 1]
+    assert supervisor.restarts == 1
+    assert supervisor.state == "stopped"
+    assert supervisor.import_time is not None
+
+
+def test_plugin_supervisor_gives_up():
+    async def main():
+        raise RuntimeError("crash")
+
+    async def load(path: Path) -> Plugin:
+        return FakePlugin(main)
+
+    async def run():
+        supervisor = PluginSupervisor(Path("broken"), load, BUDGET)
+        supervisor.start()
+        for _ in range(100):
+            if supervisor.state == "failed":
+                break
+            await asyncio.sleep(0.01)
+        return supervisor
+
+    supervisor = asyncio.run(run())
+    assert supervisor.state == "failed"
+    assert supervisor.restarts == 2
+    assert isinstance(supervisor.error, RuntimeError)
+
+
+def test_plugin_supervisor_long_running():
+    async def main():
+        await asyncio.sleep(60)
+
+    async def load(path: Path) -> Plugin:
+        return FakePlugin(main)
+
+    async def run():
+        supervisor = PluginSupervisor(Path("service"), load, BUDGET)
+        supervisor.start()
+        # Startup only waits for the init budget, not for main() to return.
+        await asyncio.wait_for(supervisor.wait_started(), 1)
+        assert supervisor.state == "running"
+        await supervisor.stop()
+        return supervisor
+
+    supervisor = asyncio.run(run())
+    assert supervisor.state == "stopped"
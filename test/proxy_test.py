@@ -0,0 +1,120 @@
+import asyncio
+from pathlib import Path
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from omuserver.server.proxy import HttpProxy, ProxyConfig, freshness
+
+
+def create_upstream(hits: dict):
+    async def avatar(request: web.Request) -> web.Response:
+        hits["avatar"] = hits.get("avatar", 0) + 1
+        await asyncio.sleep(0.05)
+        return web.Response(
+            body=b"avatar",
+            content_type="image/png",
+            headers={"Cache-Control": "max-age=60"},
+        )
+
+    async def nostore(request: web.Request) -> web.Response:
+        hits["nostore"] = hits.get("nostore", 0) + 1
+        return web.Response(body=b"x", headers={"Cache-Control": "no-store"})
+
+    async def revalidate(request: web.Request) -> web.Response:
+        hits["revalidate"] = hits.get("revalidate", 0) + 1
+        headers = {"Cache-Control": "no-cache", "ETag": '"v1"'}
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=b"x" * 1024 * 1024, headers=headers)
+
+    async def compressed(request: web.Request) -> web.Response:
+        response = web.Response(body=b"hello " * 4096, content_type="text/plain")
+        response.enable_compression()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/compressed", compressed)
+    app.router.add_get("/avatar.png", avatar)
+    app.router.add_get("/nostore", nostore)
+    app.router.add_get("/revalidate", revalidate)
+    return app
+
+
+def test_proxy(tmp_path: Path):
+    hits = {}
+
+    async def run():
+        async with TestServer(create_upstream(hits)) as upstream:
+            proxy = HttpProxy(tmp_path, ProxyConfig(max_memory_item=1024))
+            app = web.Application()
+            app.router.add_get("/proxy", proxy.handle)
+            async with TestClient(TestServer(app)) as client:
+
+                async def get(path: str, **kwargs):
+                    url = str(upstream.make_url(path))
+                    resp = await client.get("/proxy", params={"url": url}, **kwargs)
+                    return resp, await resp.read()
+
+                # Concurrent requests share a single upstream fetch.
+                results = await asyncio.gather(*(get("/avatar.png") for _ in range(5)))
+                assert [body for _, body in results] == [b"avatar"] * 5
+                assert hits["avatar"] == 1
+                resp, body = await get("/avatar.png")
+                assert body == b"avatar"
+                assert resp.content_type == "image/png"
+                assert hits["avatar"] == 1
+                resp, _ = await get(
+                    "/avatar.png", headers={"If-None-Match": resp.headers["ETag"]}
+                )
+                assert resp.status == 304
+
+                await get("/nostore")
+                await get("/nostore")
+                assert hits["nostore"] == 2
+
+                # Stale entries are revalidated, large ones are served from disk.
+                _, first = await get("/revalidate")
+                # Let the first fetch finish, a request made while it is still
+                # in flight would share its result.
+                await asyncio.sleep(0.05)
+                _, second = await get("/revalidate")
+                assert first == second == b"x" * 1024 * 1024
+                assert hits["revalidate"] == 2
+
+                # Ranges of a disk entry are only served for its current ETag.
+                resp, body = await get(
+                    "/revalidate", headers={"Range": "bytes=0-1", "If-Range": '"a"'}
+                )
+                assert resp.status == 200 and len(body) == 1024 * 1024
+                etag = resp.headers["ETag"]
+                resp, body = await get(
+                    "/revalidate", headers={"Range": "bytes=0-1", "If-Range": etag}
+                )
+                assert resp.status == 206 and body == b"xx"
+                resp, _ = await get("/revalidate", headers={"If-Match": '"a"'})
+                assert resp.status == 412
+
+                # Bodies are decompressed, so the compressed length is not sent.
+                resp, body = await get("/compressed")
+                assert body == b"hello " * 4096
+                resp, body = await get("/compressed")
+                assert body == b"hello " * 4096
+            await proxy.close()
+
+    asyncio.run(run())
+    bodies = sorted(path.stat().st_size for path in tmp_path.glob("*.body"))
+    assert bodies == [len(b"avatar"), 6 * 4096, 1024 * 1024]
+
+
+def test_freshness():
+    from multidict import CIMultiDict, CIMultiDictProxy
+
+    def headers(**values):
+        return CIMultiDictProxy(CIMultiDict(values))
+
+    assert freshness(headers(**{"Cache-Control": "max-age=10"}), 300) == 10
+    assert freshness(headers(**{"Cache-Control": "no-store"}), 300) is None
+    assert freshness(headers(**{"Cache-Control": "no-cache"}), 300) == 0
+    assert freshness(headers(), 300) == 300
+    assert freshness(headers(Expires="Thu, 01 Jan 1970 00:00:00 GMT"), 300) == 0
@@ -0,0 +1,31 @@
+import asyncio
+from pathlib import Path
+
+
+class FakeServer:
+    def __init__(self, path: Path) -> None:
+        from omuserver.directories import Directories
+
+        self.directories = Directories(
+            data=path / "data", assets=path / "assets", plugins=path / "plugins"
+        )
+
+
+def test_temporary_permissions_not_persisted(tmp_path: Path):
+    from omuserver.security.permission import AdminPermissions
+    from omuserver.security.security import ServerSecurity
+
+    async def run():
+        security = ServerSecurity(FakeServer(tmp_path))  # type: ignore
+        permissions = AdminPermissions("plugin:test")
+        await security.add_temporary_permissions("token", permissions)
+        assert await security.get_permissions("token") is permissions
+
+        # A restarted server does not know the token.
+        restarted = ServerSecurity(FakeServer(tmp_path))  # type: ignore
+        assert "token" not in restarted._permissions
+
+        await security.remove_permissions("token")
+        assert "token" not in security._temporary
+
+    asyncio.run(run())
@@ -0,0 +1,73 @@
+import asyncio
+
+
+def test_send_queue_drop_oldest():
+    from omuserver.session.send_queue import SendQueue, SendQueueConfig
+
+    async def run():
+        queue = SendQueue(SendQueueConfig(max_size=2, overflow="drop_oldest"))
+        queue.put("a", "1")
+        queue.put("a", "2")
+        queue.put("a", "3")
+        assert queue.dropped == 1
+        assert await queue.get_batch() == [("a", "2"), ("a", "3")]
+
+    asyncio.run(run())
+
+
+def test_send_queue_drop_type():
+    from omuserver.session.send_queue import SendQueue, SendQueueConfig
+
+    async def run():
+        queue = SendQueue(
+            SendQueueConfig(max_size=2, overflow="drop_type", droppable={"chat"})
+        )
+        queue.put("table", "1")
+        queue.put("chat", "2")
+        queue.put("table", "3")
+        queue.put("chat", "4")
+        assert queue.dropped == 2
+        assert await queue.get_batch() == [("table", "1"), ("table", "3")]
+
+    asyncio.run(run())
+
+
+def test_send_queue_disconnect():
+    from omuserver.session.send_queue import (
+        SendQueue,
+        SendQueueConfig,
+        SendQueueOverflow,
+    )
+
+    async def run():
+        queue = SendQueue(SendQueueConfig(max_size=1, overflow="disconnect"))
+        queue.put("a", "1")
+        try:
+            queue.put("a", "2")
+        except SendQueueOverflow:
+            pass
+        else:
+            raise AssertionError("Expected SendQueueOverflow")
+        assert queue.closed
+        assert await queue.get_batch() == []
+
+    asyncio.run(run())
+
+
+def test_send_queue_close():
+    from omuserver.session.send_queue import SendQueue
+
+    async def run():
+        queue = SendQueue()
+        assert queue.config.overflow == "disconnect"
+        queue.put("a", "1")
+        queue.close()
+        assert await queue.get_batch() == [("a", "1")]
+        assert await queue.get_batch() == []
+
+        queue = SendQueue()
+        queue.put("a", "1")
+        queue.close(discard=True)
+        assert await queue.get_batch() == []
+
+    asyncio.run(run())
@@ -0,0 +1,24 @@
+import asyncio
+from pathlib import Path
+
+
+def test_server_plugin_imports_on_loop(tmp_path: Path):
+    from omuserver.extension.plugin.plugin.serverplugin import ServerPlugin
+
+    # Plugins commonly build a client at import time, which needs the loop.
+    (tmp_path / "run.py").write_text(
+        "import asyncio\n"
+        "loop = asyncio.get_event_loop()\n"
+        "started = []\n"
+        "async def main():\n"
+        "    started.append(asyncio.get_running_loop() is loop)\n"
+    )
+
+    async def run():
+        plugin = await ServerPlugin.create(tmp_path, None)  # type: ignore
+        await plugin.load()
+        await plugin.start()
+        return plugin._module
+
+    module = asyncio.run(run())
+    assert module.started == [True]  # type: ignore
@@ -0,0 +1,60 @@
+import asyncio
+from pathlib import Path
+
+
+def test_sqlite_table_adapter(tmp_path: Path):
+    from omuserver.extension.table.adapters import SqliteTableAdapter
+
+    async def run():
+        table = SqliteTableAdapter.create(tmp_path)
+        await table.load()
+        await table.set_all({f"key{i}": {"index": i} for i in range(10)})
+        assert await table.get("key3") == {"index": 3}
+        assert await table.size() == 10
+        await table.remove_all(["key0", "key1"])
+        assert await table.first() == "key2"
+        assert await table.last() == "key9"
+        items = await table.fetch(before=3, after=None, cursor=None)
+        assert list(items.keys()) == ["key9", "key8", "key7"]
+        await table.store()
+        await table.close()
+
+        table = SqliteTableAdapter.create(tmp_path)
+        assert await table.size() == 8
+        await table.close()
+
+    asyncio.run(run())
+
+
+def test_sqlite_table_adapter_size(tmp_path: Path):
+    from omuserver.extension.table.adapters import SqliteTableAdapter
+
+    async def run():
+        table = SqliteTableAdapter.create(tmp_path)
+        await table.load()
+        await table.set_all({"a": 1, "b": 2})
+        await table.set_all({"a": 3, "c": 4})
+        assert await table.size() == 3
+        assert await table.first() == "a"
+        await table.remove_all(["b", "missing"])
+        assert await table.size() == 2
+        await table.clear()
+        assert await table.size() == 0
+        await table.close()
+
+    asyncio.run(run())
+
+
+def test_sqlite_table_adapter_iterate(tmp_path: Path):
+    from omuserver.extension.table.adapters import SqliteTableAdapter
+
+    async def run():
+        table = SqliteTableAdapter.create(tmp_path)
+        await table.load()
+        await table.set_all({f"key{i}": i for i in range(10)})
+        await table.remove_all(["key4"])
+        items = [item async for item in table.iterate(batch_size=3)]
+        assert items == [(f"key{i}", i) for i in range(10) if i != 4]
+        await table.close()
+
+    asyncio.run(run())
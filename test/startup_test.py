@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from omuserver.server.startup import StartupGraph
+
+
+def test_startup_graph_order():
+    order = []
+
+    def stage(name: str):
+        async def start():
+            order.append(f"{name}:start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name}:end")
+
+        return start
+
+    async def run():
+        graph = StartupGraph()
+        graph.add("network", stage("network"), after=("server",))
+        graph.add("server", stage("server"))
+        graph.add("tables", stage("tables"))
+        graph.add("plugins", stage("plugins"), after=("network",))
+        return await graph.run()
+
+    report = asyncio.run(run())
+    # Independent stages start together, dependents wait for their dependencies.
+    assert order[:2] == ["server:start", "tables:start"]
+    assert order.index("network:start") > order.index("server:end")
+    assert order.index("plugins:start") > order.index("network:end")
+    assert [stage["name"] for stage in report.to_json()["stages"]] == [
+        "network",
+        "server",
+        "tables",
+        "plugins",
+    ]
+
+
+def test_startup_graph_failure():
+    async def fail():
+        raise RuntimeError("fail")
+
+    async def noop():
+        pass
+
+    async def run():
+        graph = StartupGraph()
+        graph.add("a", fail)
+        graph.add("b", noop, after=("a",))
+        graph.add("c", noop)
+        return await graph.run()
+
+    stages = {stage.name: stage for stage in asyncio.run(run()).stages}
+    assert isinstance(stages["a"].error, RuntimeError)
+    assert stages["b"].skipped
+    assert stages["c"].error is None and not stages["c"].skipped
+
+
+def test_startup_graph_validate():
+    async def noop():
+        pass
+
+    graph = StartupGraph()
+    graph.add("a", noop, after=("b",))
+    graph.add("b", noop, after=("a",))
+    with pytest.raises(ValueError):
+        asyncio.run(graph.run())
+
+    graph = StartupGraph()
+    graph.add("a", noop, after=("missing",))
+    with pytest.raises(ValueError):
+        asyncio.run(graph.run())
+
+
+def test_startup_graph_required():
+    from omuserver.server.startup import StartupError
+
+    async def fail():
+        raise RuntimeError("fail")
+
+    async def noop():
+        pass
+
+    async def run():
+        graph = StartupGraph()
+        graph.add("network", fail)
+        graph.add("plugins", noop, after=("network",), required=False)
+        graph.add("tables", noop)
+        return await graph.run()
+
+    report = asyncio.run(run())
+    assert [stage.name for stage in report.failed] == ["network"]
+    assert "network" in str(StartupError(report))
+
+
+def test_server_start_fails_without_network(tmp_path):
+    from omu import Address
+
+    from omuserver.directories import Directories
+    from omuserver.server.omuserver import OmuServer
+    from omuserver.server.startup import StartupError
+
+    async def listen():
+        raise OSError("address already in use")
+
+    async def run():
+        directories = Directories(
+            data=tmp_path / "data",
+            assets=tmp_path / "assets",
+            plugins=tmp_path / "plugins",
+        )
+        address = Address(host="127.0.0.1", port=0, secure=False)
+        server = OmuServer(address, directories=directories)
+        server._network.start = listen  # type: ignore
+        try:
+            with pytest.raises(StartupError) as error:
+                await server.start()
+        finally:
+            await server.shutdown()
+        return error.value.report
+
+    report = asyncio.run(run())
+    assert [stage.name for stage in report.failed] == ["network"]
+    stages = {stage.name: stage for stage in report.stages}
+    assert stages["plugins"].skipped and not stages["plugins"].required
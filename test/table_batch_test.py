@@ -0,0 +1,86 @@
+import asyncio
+from typing import Dict, List, Tuple
+
+import pytest
+from conftest import TableFactory
+
+from omuserver.extension.table.server_table import TableListener
+
+
+class RecordingListener(TableListener):
+    def __init__(self) -> None:
+        self.events: List[Tuple[str, Dict]] = []
+
+    async def on_add(self, items: Dict) -> None:
+        self.events.append(("add", items))
+
+    async def on_update(self, items: Dict) -> None:
+        self.events.append(("update", items))
+
+    async def on_remove(self, items: Dict) -> None:
+        self.events.append(("remove", items))
+
+
+def test_table_batch(create_table: TableFactory):
+    async def run():
+        config = {"batch": {"window": 0.01, "max_items": 100}}
+        table = create_table("batch", config)
+        listener = RecordingListener()
+        table.add_listener(listener)
+
+        for i in range(10):
+            await table.add({str(i): i})
+        await table.update({"1": 10})
+        await table.remove(["2"])
+        await table.add({"a": 1})
+        assert listener.events == []
+        await asyncio.sleep(0.05)
+        assert listener.events == [
+            ("add", {str(i): i for i in range(10)}),
+            ("update", {"1": 10}),
+            ("remove", {"2": 2}),
+            ("add", {"a": 1}),
+        ]
+
+        # Reads see pending writes.
+        await table.add({"b": 2})
+        assert await table.get("b") == 2
+
+        # A full batch is written without waiting for the window.
+        listener.events.clear()
+        await table.add({f"x{i}": i for i in range(100)})
+        assert len(listener.events) == 1
+        await table.close()
+
+    asyncio.run(run())
+
+
+def test_table_batch_write_error(create_table: TableFactory):
+    class FailingListener(TableListener):
+        async def on_add(self, items: Dict) -> None:
+            if "bad" in items:
+                raise RuntimeError("write failed")
+
+    async def run():
+        table = create_table("batch", {"batch": {"window": 0.01}})
+        listener = RecordingListener()
+        table.add_listener(FailingListener())
+        table.add_listener(listener)
+
+        # A failure of the timer flush is raised by the next flush.
+        await table.add({"bad": 1})
+        await asyncio.sleep(0.05)
+        with pytest.raises(RuntimeError):
+            await table.flush()
+        await table.flush()
+
+        # A failed run is raised to the read that flushes it, after the runs
+        # following it have been written.
+        await table.add({"bad": 2})
+        await table.update({"bad": 3})
+        with pytest.raises(RuntimeError):
+            await table.get("bad")
+        assert listener.events == [("update", {"bad": 3})]
+        await table.close()
+
+    asyncio.run(run())
@@ -0,0 +1,45 @@
+def test_lru_cache_refreshes_on_hit():
+    from omuserver.extension.table.table_cache import LRUCache
+
+    cache = LRUCache[int](2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.get("b") is None
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.evictions == 1
+
+
+def test_lfu_cache_rejects_scans():
+    from omuserver.extension.table.table_cache import TinyLFUCache
+
+    cache = TinyLFUCache[int](2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    for _ in range(4):
+        cache.get("a")
+        cache.get("b")
+    for index in range(10):
+        cache.put(f"scan-{index}", index)
+    assert "a" in cache
+    assert "b" in cache
+    assert cache.stats.rejections == 10
+
+
+def test_byte_budget_cache():
+    from omuserver.extension.table.table_cache import ByteBudgetCache
+
+    cache = ByteBudgetCache[str](100, max_bytes=10, sizeof=len)
+    cache.put("a", "12345")
+    cache.put("b", "12345")
+    assert cache.bytes == 10
+    cache.put("c", "123")
+    assert "a" not in cache
+    assert cache.bytes == 8
+    cache.remove("b")
+    assert cache.bytes == 3
+    assert cache.to_json()["evictions"] == 1
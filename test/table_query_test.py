@@ -0,0 +1,65 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+ITEMS = {
+    "a": {"author": {"id": "x"}, "paid": True, "amount": 500},
+    "b": {"author": {"id": "y"}, "paid": False},
+    "c": {"author": {"id": "x"}, "paid": False, "amount": 100},
+    "d": {"author": {"id": "x"}, "paid": True, "amount": 1000},
+}
+CONFIG = {"indexes": {"author": "$.author.id", "paid": "$.paid", "amount": "$.amount"}}
+
+
+@pytest.mark.parametrize("adapter", ["dict", "sqlite"])
+def test_table_query(tmp_path: Path, adapter: str):
+    from omuserver.extension.table.adapters import (
+        DictTableAdapter,
+        SqliteTableAdapter,
+    )
+
+    async def run():
+        cls = DictTableAdapter if adapter == "dict" else SqliteTableAdapter
+        table = cls.create(tmp_path, CONFIG)  # type: ignore
+        await table.load()
+        await table.set_all(ITEMS)
+
+        async def keys(filters, limit=None, cursor=None):
+            return list(await table.query(filters, limit, cursor))
+
+        author = {"index": "author", "op": "eq", "value": "x"}
+        assert await keys([author]) == ["a", "c", "d"]
+        assert await keys([author], limit=1, cursor="a") == ["c"]
+        paid = {"index": "paid", "op": "eq", "value": True}
+        assert await keys([author, paid]) == ["a", "d"]
+        assert await keys([{"index": "amount", "op": "gte", "value": 500}]) == [
+            "a",
+            "d",
+        ]
+        assert await keys([{"index": "amount", "op": "eq", "value": None}]) == ["b"]
+        with pytest.raises(ValueError):
+            await keys([{"index": "missing", "op": "eq", "value": 1}])
+        await table.close()
+
+    asyncio.run(run())
+
+
+def test_sqlite_index_migration(tmp_path: Path):
+    from omuserver.extension.table.adapters import SqliteTableAdapter
+
+    async def run():
+        table = SqliteTableAdapter.create(tmp_path, CONFIG)  # type: ignore
+        await table.load()
+        await table.set_all(ITEMS)
+        await table.close()
+
+        config = {"indexes": {"author": "$.author.name"}}
+        table = SqliteTableAdapter.create(tmp_path, config)  # type: ignore
+        await table.load()
+        filters = [{"index": "author", "op": "eq", "value": "x"}]
+        assert await table.query(filters, None, None) == {}  # type: ignore
+        assert await table.size() == 4
+        await table.close()
+
+    asyncio.run(run())
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+from conftest import TableFactory
+
+
+def test_table_retention(create_table: TableFactory):
+    from omuserver.extension.table.server_table import TableListener
+
+    class RemoveListener(TableListener):
+        def __init__(self):
+            self.removed = []
+
+        async def on_remove(self, items):
+            self.removed.append(list(items))
+
+    async def run():
+        config = {"retention": {"max_rows": 5, "batch_size": 2}}
+        table = create_table("retention", config)
+        listener = RemoveListener()
+        table.add_listener(listener)
+        await table.load()
+        await table.add({f"key{i}": i for i in range(10)})
+
+        assert await table.enforce_retention() == 5
+        assert listener.removed == [
+            ["key0", "key1"],
+            ["key2", "key3"],
+            ["key4"],
+        ]
+        assert await table.size() == 5
+        assert await table.enforce_retention() == 0
+
+        retention = config["retention"]
+        del retention["max_rows"]
+        retention["max_age"] = 0
+        assert await table.enforce_retention() == 5
+        assert await table.size() == 0
+        await table.close()
+
+    asyncio.run(run())
+
+
+def test_table_retention_max_bytes(create_table: TableFactory):
+    async def run():
+        # The budget counts the stored values only, so the search index does
+        # not keep the table over it after old rows are removed.
+        value = {"text": "hello " * 15}
+        item_bytes = len(json.dumps(value, separators=(",", ":")))
+        config = {
+            "search": ["$.text"],
+            "retention": {"max_bytes": item_bytes * 5, "batch_size": 3},
+        }
+        table = create_table("retention", config)
+        await table.load()
+        await table.add({f"key{i}": value for i in range(10)})
+
+        assert await table.enforce_retention() == 5
+        assert await table.size() == 5
+        assert await table.get("key5") == value
+        await table.close()
+
+    asyncio.run(run())
@@ -0,0 +1,64 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+ITEMS = {
+    "1": {"content": {"type": "text", "text": "hello world"}, "author": "alice"},
+    "2": {"content": {"type": "text", "text": "good morning"}, "author": "bob"},
+    "3": {"content": {"children": [{"text": "Hello again"}]}, "author": "carol"},
+    "4": {"content": {"text": "hello hello hello"}, "author": "dave"},
+}
+CONFIG = {"search": ["$.content", "$.author"]}
+
+
+@pytest.mark.parametrize("adapter", ["dict", "sqlite"])
+def test_table_search(tmp_path: Path, adapter: str):
+    from omuserver.extension.table.adapters import (
+        DictTableAdapter,
+        SqliteTableAdapter,
+    )
+
+    async def run():
+        cls = DictTableAdapter if adapter == "dict" else SqliteTableAdapter
+        table = cls.create(tmp_path, CONFIG)  # type: ignore
+        await table.load()
+        await table.set_all(ITEMS)
+
+        result = await table.search("hello", None, None)
+        assert set(result["items"]) == {"1", "3", "4"}
+        assert result["offset"] is None
+        result = await table.search("hello", 2, None)
+        assert len(result["items"]) == 2 and result["offset"] == 2
+        result = await table.search("hello", 2, 2)
+        assert len(result["items"]) == 1 and result["offset"] is None
+        assert list((await table.search("bob OR (x", None, None))["items"]) == []
+        assert list((await table.search("bob", None, None))["items"]) == ["2"]
+
+        await table.set_all({"2": {"content": {"text": "hello"}, "author": "bob"}})
+        await table.remove_all(["1"])
+        result = await table.search("hello", None, None)
+        assert set(result["items"]) == {"2", "3", "4"}
+        await table.clear()
+        assert (await table.search("hello", None, None))["items"] == {}
+        await table.close()
+
+    asyncio.run(run())
+
+
+def test_sqlite_search_rebuild(tmp_path: Path):
+    from omuserver.extension.table.adapters import SqliteTableAdapter
+
+    async def run():
+        table = SqliteTableAdapter.create(tmp_path)
+        await table.load()
+        await table.set_all(ITEMS)
+        await table.close()
+
+        table = SqliteTableAdapter.create(tmp_path, CONFIG)  # type: ignore
+        await table.load()
+        result = await table.search("hello", None, None)
+        assert list(result["items"])[0] == "4"
+        await table.close()
+
+    asyncio.run(run())
@@ -0,0 +1,78 @@
+import asyncio
+from pathlib import Path
+
+
+class FakeSession:
+    closed = False
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, type, data):
+        self.sent.append((type.type, data))
+
+    def add_listener(self, listener):
+        pass
+
+
+def test_table_stream_flow_control(tmp_path: Path):
+    from omu.extension.table.model import TableInfo
+    from omu.interface import Serializer
+
+    from omuserver.extension.table.adapters import DictTableAdapter
+    from omuserver.extension.table.cached_table import CachedTable
+    from omuserver.extension.table.table_stream import TableStreams
+
+    async def run():
+        info = TableInfo(owner="test", name="stream")
+        adapter = DictTableAdapter.create(tmp_path)
+        table = CachedTable(None, info, Serializer.noop(), adapter)  # type: ignore
+        await table.load()
+        await adapter.set_all({f"key{i:02}": i for i in range(25)})
+
+        session = FakeSession()
+        streams = TableStreams()
+        req = {"id": 1, "type": info.key(), "before": 25, "chunk_size": 10}
+        streams.start(session, table, {**req, "window": 2})  # type: ignore
+        await asyncio.sleep(0.05)
+        assert [data["index"] for _, data in session.sent] == [0, 1]
+        streams.ack(session, 1, 1)
+        await asyncio.sleep(0.05)
+        chunks = [data for type, data in session.sent if type.endswith("_chunk")]
+        keys = [key for chunk in chunks for key in chunk["items"]]
+        assert keys == [f"key{i:02}" for i in reversed(range(25))]
+        type, end = session.sent[-1]
+        assert type.endswith("item_stream_end")
+        assert end["count"] == 25 and not end["cancelled"]
+
+        session.sent.clear()
+        streams.start(session, table, {**req, "id": 2, "window": 1})  # type: ignore
+        await asyncio.sleep(0.05)
+        streams.cancel(session, 2)
+        await asyncio.sleep(0.05)
+        assert session.sent[-1][1]["cancelled"]
+        assert session.sent[-1][1]["count"] == 10
+
+    asyncio.run(run())
+
+
+def test_table_stream_error():
+    from omuserver.extension.table.table_stream import TableStreams
+
+    class BrokenTable:
+        serializer = None
+
+        async def fetch(self, before=None, after=None, cursor=None):
+            raise RuntimeError("adapter closed")
+
+    async def run():
+        session = FakeSession()
+        streams = TableStreams()
+        req = {"id": 1, "type": "test:broken", "before": 10}
+        streams.start(session, BrokenTable(), req)  # type: ignore
+        await asyncio.sleep(0.05)
+        return session.sent
+
+    [(type, end)] = asyncio.run(run())
+    assert type.endswith("item_stream_end")
+    assert "adapter closed" in end["error"]
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from conftest import TableFactory
+
+
+def test_table_unload_if_idle(create_table: TableFactory):
+    async def run():
+        config = {"idle_timeout": 60}
+        table = create_table("unload", config)
+
+        assert not await table.unload_if_idle()
+        await table.add({"a": 1, "b": 2})
+        assert not await table.unload_if_idle()
+
+        table._last_used -= 60
+        assert await table.unload_if_idle()
+        assert not table._loaded
+
+        assert await table.get("a") == 1
+        assert await table.size() == 2
+        assert table._loaded
+
+        table._last_used -= 60
+        table._users += 1
+        assert not await table.unload_if_idle()
+        await table.close()
+
+    asyncio.run(run())
+
+
+def test_table_unload_concurrent_writes(create_table: TableFactory):
+    async def run():
+        config = {"idle_timeout": 60}
+        table = create_table("unload", config)
+        await table.add({"a": 1})
+
+        # A write made while the table is unloading waits and reloads it.
+        table._last_used -= 60
+        unload = asyncio.create_task(table.unload_if_idle())
+        await asyncio.sleep(0)
+        await table.add({"b": 2})
+        assert await unload
+        assert await table.get("b") == 2
+
+        # A write in progress keeps the table loaded.
+        table._last_used -= 60
+        write = asyncio.create_task(table.add({"c": 3}))
+        await asyncio.sleep(0)
+        assert not await table.unload_if_idle()
+        await write
+        assert await table.size() == 3
+
+        table._last_used -= 60
+        assert await table.unload_if_idle()
+        assert not table._changed
+        assert await table.get_all(["a", "b", "c"]) == {"a": 1, "b": 2, "c": 3}
+        await table.close()
+
+    asyncio.run(run())
+
+
+def test_table_unload_abandoned_iterator(create_table: TableFactory):
+    async def run():
+        table = create_table("unload", {"idle_timeout": 60})
+        await table.add({str(i): i for i in range(10)})
+
+        # An iterator left open between batches does not keep the table
+        # loaded, and fails instead of reading from the unloaded adapter.
+        items = table.iterator(batch_size=4)
+        assert [await anext(items) for _ in range(5)] == [0, 1, 2, 3, 4]
+        table._last_used -= 60
+        assert await table.unload_if_idle()
+        with pytest.raises(RuntimeError):
+            [item async for item in items]
+
+        assert [item async for item in table.iterator(batch_size=4)] == list(range(10))
+        await table.close()
+
+    asyncio.run(run())